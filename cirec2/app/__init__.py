@@ -26,16 +26,31 @@ def create_app(config_class=Config):
     login_manager.login_message = 'Please log in to access this page.'
     login_manager.login_message_category = 'info'
     
+    # Cross-worker cache invalidation; its listener hook must run before the page cache's
+    from app.services.invalidation import invalidation_bus
+    invalidation_bus.init_app(app)
+    
     from app.routes.auth import auth_bp
     from app.routes.admin import admin_bp
     from app.routes.articles import articles_bp
     from app.routes.search import search_bp
     from app.routes.main import main_bp
+    from app.routes.files import files_bp
     
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(admin_bp, url_prefix='/admin')
     app.register_blueprint(articles_bp, url_prefix='/articles')
     app.register_blueprint(search_bp, url_prefix='/search')
+    app.register_blueprint(files_bp, url_prefix='/files')
+    
+    # Counters, analytics events, unique-reader sketches and search heavy hitters are buffered in memory and flushed in batches
+    from app.services.counters import article_counters
+    from app.services.analytics import event_buffer, unique_views
+    from app.services.search_stats import search_queries
+    article_counters.init_app(app)
+    event_buffer.init_app(app)
+    unique_views.init_app(app)
+    search_queries.init_app(app)
     
     return app
\ No newline at end of file
@@ -15,6 +15,17 @@ class Config:
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'uploads')
     MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB max file size
     
+    # PDF text extraction
+    PDF_EXTRACTION_WORKERS = int(os.environ.get('PDF_EXTRACTION_WORKERS') or min(4, os.cpu_count() or 1))
+    PDF_PARALLEL_MIN_PAGES = 50  # Smaller documents are extracted serially
+    PDF_PAGE_TIMEOUT = 10  # Seconds allowed per page before it is skipped
+    PDF_ANALYSIS_CACHE_DIR = os.path.join(UPLOAD_FOLDER, 'analysis')  # Parsed PDFs keyed by file hash
+    # Bounds on that cache: least recently used analyses go first, unused ones after MAX_AGE seconds
+    PDF_ANALYSIS_CACHE_MAX_BYTES = int(os.environ.get('PDF_ANALYSIS_CACHE_MAX_BYTES') or 1024 ** 3)
+    PDF_ANALYSIS_CACHE_MAX_AGE = int(os.environ.get('PDF_ANALYSIS_CACHE_MAX_AGE') or 30 * 86400)
+    PDF_BUILD_DERIVATIVES = os.environ.get('PDF_BUILD_DERIVATIVES', '1') != '0'  # Compressed copy and page fragments at ingest
+    PDF_FRAGMENT_PAGES = 10  # Pages per viewer fragment
+    
     # Mail settings
     MAIL_SERVER = os.environ.get('MAIL_SERVER') or 'smtp.gmail.com'
     MAIL_PORT = int(os.environ.get('MAIL_PORT') or 587)
@@ -23,9 +34,103 @@ class Config:
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER') or 'support@cirec.net'
     
-    # Redis for Celery
-    CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL') or 'redis://localhost:6379/0'
-    CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND') or 'redis://localhost:6379/0'
+    # Background ingestion (text extraction and embeddings after upload)
+    INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS') or 2)
+    
+    # Background jobs: 'local' runs tasks in an in-process pool, 'database'
+    # queues them in the jobs table for `flask worker` processes
+    TASK_BACKEND = os.environ.get('TASK_BACKEND') or 'local'
+    JOB_MAX_ATTEMPTS = 5
+    JOB_BACKOFF_BASE = 5  # Seconds before the first retry, doubled on each attempt
+    JOB_BACKOFF_MAX = 3600
+    JOB_VISIBILITY_TIMEOUT = 600  # Seconds before a silent worker's job is reclaimed
+    JOB_POLL_INTERVAL = 1.0
+    
+    # Write-behind view/download counters: flush every N seconds or after N increments
+    COUNTER_FLUSH_INTERVAL = float(os.environ.get('COUNTER_FLUSH_INTERVAL') or 5.0)
+    COUNTER_FLUSH_EVENTS = int(os.environ.get('COUNTER_FLUSH_EVENTS') or 500)
+    
+    # Article event log (views, downloads, previews, search clicks) and its rollups
+    EVENT_FLUSH_INTERVAL = float(os.environ.get('EVENT_FLUSH_INTERVAL') or 5.0)
+    EVENT_FLUSH_EVENTS = int(os.environ.get('EVENT_FLUSH_EVENTS') or 1000)
+    EVENT_PARTITION_DAYS_AHEAD = 3  # Daily partitions created ahead of time
+    EVENT_RETENTION_DAYS = int(os.environ.get('EVENT_RETENTION_DAYS') or 90)  # Raw events; rollups are kept
+    EVENT_ROLLUP_INTERVAL = 300  # Seconds between scheduled rollup jobs
+    EVENT_ROLLUP_LOOKBACK_HOURS = 2  # Hours recomputed by each rollup run
+    
+    # Trending score: views/downloads decayed exponentially with this half-life
+    TRENDING_HALF_LIFE_HOURS = float(os.environ.get('TRENDING_HALF_LIFE_HOURS') or 24)
+    TRENDING_DOWNLOAD_WEIGHT = 3.0  # A download counts as this many views
+    
+    # Precomputed popular/trending/featured/recent lists; rebuilt on writes and
+    # score changes, and at least this often to pick up other processes' writes
+    LEADERBOARD_SIZE = 50
+    LEADERBOARD_MAX_AGE = int(os.environ.get('LEADERBOARD_MAX_AGE') or 300)
+    LEADERBOARD_MAX_BOARDS = 256  # Boards kept per process (one per list and category)
+    
+    # Conditional GET: Cache-Control max-age (seconds) for anonymous pages, JSON APIs,
+    # event statistics and PDFs (always private); logged-in pages revalidate every time
+    HTTP_CACHE_MAX_AGE = 60
+    HTTP_CACHE_API_MAX_AGE = 60
+    HTTP_CACHE_STATS_MAX_AGE = 300
+    HTTP_CACHE_PDF_MAX_AGE = 3600
+    
+    # Who sends PDF bytes: 'flask' (the worker), 'x-sendfile' (Apache/lighttpd) or
+    # 'x-accel' (nginx internal location PDF_ACCEL_PREFIX aliased to PDF_STORAGE_ROOT)
+    PDF_SERVE_MODE = os.environ.get('PDF_SERVE_MODE') or 'flask'
+    PDF_STORAGE_ROOT = os.path.join(UPLOAD_FOLDER, 'pdfs')
+    PDF_ACCEL_PREFIX = os.environ.get('PDF_ACCEL_PREFIX') or '/protected-pdfs/'
+    
+    # Signed PDF URLs issued to entitled readers; valid for one to two TTLs
+    PDF_URL_TTL = int(os.environ.get('PDF_URL_TTL') or 3600)
+    PDF_URL_SECRET = os.environ.get('PDF_URL_SECRET')  # Defaults to a key derived from SECRET_KEY
+    
+    # Response/object cache: 'memory' (per process), 'filesystem' (CACHE_DIR) or
+    # 'shm' (tmpfs, shared by workers on the host); bump CACHE_KEY_VERSION to drop everything
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND') or 'memory'
+    CACHE_DIR = os.environ.get('CACHE_DIR') or os.path.join(UPLOAD_FOLDER, 'cache')
+    CACHE_SHM_DIR = os.environ.get('CACHE_SHM_DIR') or '/dev/shm/cirec-cache'
+    CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES') or 64 * 1024 * 1024)
+    CACHE_MAX_COUNTERS = int(os.environ.get('CACHE_MAX_COUNTERS') or 100000)  # Tag versions kept by the memory backend
+    CACHE_DEFAULT_TTL = 300
+    CACHE_KEY_VERSION = os.environ.get('CACHE_KEY_VERSION') or '1'
+    CACHE_STALE_TTL = 60  # Seconds an expired entry is still served while one caller recomputes it
+    
+    # Stampede protection: concurrent misses on a key share one computation. Across
+    # workers the leader also holds a lock: 'file' (under CACHE_DIR), 'advisory'
+    # (Postgres, across hosts), 'none', or 'auto' (a lock file for shared backends)
+    SINGLE_FLIGHT_LOCK = os.environ.get('SINGLE_FLIGHT_LOCK') or 'auto'
+    SINGLE_FLIGHT_TIMEOUT = 30  # Seconds a waiter gives the leader before computing itself
+    
+    # Change events from admin writes and background processing, sent with
+    # NOTIFY and applied by a listener thread in every serving worker
+    INVALIDATION_LISTEN = os.environ.get('INVALIDATION_LISTEN', 'true').lower() in ['true', 'on', '1']
+    INVALIDATION_CHANNEL = os.environ.get('INVALIDATION_CHANNEL') or 'cirec_invalidation'
+    INVALIDATION_PING_INTERVAL = 30  # Idle seconds before the listener checks its connection
+    INVALIDATION_MAX_BACKOFF = 60  # Longest wait between reconnection attempts
+    
+    # site_stats and categories.article_count are kept by triggers; a job recounts them to repair drift
+    SITE_STATS_RECONCILE_INTERVAL = 3600
+    
+    # Categories are cached per process and reloaded on change events; the TTL covers missed ones
+    CATEGORY_CACHE_TTL = 300
+    
+    # Rendered pages for anonymous visitors, purged by surrogate key on admin writes
+    PAGE_CACHE_MAX_BYTES = int(os.environ.get('PAGE_CACHE_MAX_BYTES') or 64 * 1024 * 1024)
+    PAGE_CACHE_TTL = int(os.environ.get('PAGE_CACHE_TTL') or 300)
+    PAGE_CACHE_STALE_TTL = int(os.environ.get('PAGE_CACHE_STALE_TTL') or 60)
+    
+    # Search query heavy hitters (Space-Saving + Count-Min) and top-query cache warming
+    SEARCH_STATS_FLUSH_INTERVAL = 30.0
+    SEARCH_STATS_FLUSH_EVENTS = 1000
+    SEARCH_STATS_CAPACITY = 200  # Queries tracked per process between flushes
+    SEARCH_STATS_KEEP = 5000  # Persisted queries kept when pruning
+    SEARCH_WARM_TOP = 50  # Top queries whose embeddings and rankings are precomputed
+    SEARCH_WARM_INTERVAL = 600
+    SEARCH_RESULT_CACHE_TTL = 900  # Seconds a precomputed ranking is served
+    SEARCH_RESULT_CACHE_SIZE = 240  # Ranked article ids kept per query
+    SEARCH_EMBEDDING_CACHE_SIZE = 1024  # Query embeddings cached per process
+    SEARCH_RANKING_TTL = 300  # Seconds a ranking computed on demand is reused
     
     # Pagination
     POSTS_PER_PAGE = 12
@@ -34,5 +139,11 @@ class Config:
     ELASTICSEARCH_URL = os.environ.get('ELASTICSEARCH_URL')
     
     # ML Model settings
-    EMBEDDING_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
-    EMBEDDING_DIMENSION = 384
\ No newline at end of file
+    EMBEDDING_MODEL = os.environ.get('EMBEDDING_MODEL') or 'sentence-transformers/all-MiniLM-L6-v2'
+    EMBEDDING_DIMENSION = 384
+    
+    # Embeddings from an older model or older input text are down-ranked in search
+    EMBEDDING_STALE_PENALTY = 0.8
+    EMBEDDING_MIGRATION_BATCH_SIZE = 32
+    EMBEDDING_MIGRATION_PAUSE = 1.0  # Seconds to sleep between batches
+    EMBEDDING_CHECKPOINT_FILE = os.path.join(UPLOAD_FOLDER, 'embedding_checkpoint.json')
\ No newline at end of file
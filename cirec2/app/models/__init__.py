@@ -1,4 +1,9 @@
 from .user import User
-from .article import Article, Category
+from .article import Article, Category, SiteStat
+from .job import Job
+from .event import ArticleEvent, ArticleEventRollup, ArticleDailyUniques, SearchQueryStat
 
-__all__ = ['User', 'Article', 'Category']
\ No newline at end of file
+__all__ = [
+    'User', 'Article', 'Category', 'SiteStat', 'Job',
+    'ArticleEvent', 'ArticleEventRollup', 'ArticleDailyUniques', 'SearchQueryStat'
+]
@@ -1,8 +1,12 @@
 from datetime import datetime
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm.attributes import set_committed_value
 from pgvector.sqlalchemy import Vector  # Re-enabled
 from app import db
+import hashlib
 import uuid
+import os
 
 class Article(db.Model):
     __tablename__ = 'articles'
@@ -19,6 +23,7 @@ class Article(db.Model):
     pdf_filename = db.Column(db.String(255), nullable=False)
     pdf_path = db.Column(db.String(500), nullable=False)
     pdf_size = db.Column(db.Integer)  # File size in bytes
+    pdf_derivatives = db.Column(db.JSON)  # Compressed copy and page-range fragments for the viewer
     
     # Extracted content
     full_text_content = db.Column(db.Text)
@@ -29,12 +34,31 @@ class Article(db.Model):
     title_embedding = db.Column(Vector(384))
     content_embedding = db.Column(Vector(384))
     
+    # Embedding provenance (model id and hash of the input text per vector)
+    title_embedding_model = db.Column(db.String(255))
+    title_embedding_hash = db.Column(db.String(64))
+    content_embedding_model = db.Column(db.String(255))
+    content_embedding_hash = db.Column(db.String(64))
+    
+    # Ingestion job state: pending -> processing -> ready | failed
+    processing_status = db.Column(db.String(20), default='ready', index=True)
+    processing_error = db.Column(db.Text)
+    processing_timings = db.Column(db.JSON)  # Seconds spent per ingest stage
+    
     # Status and metadata
     is_published = db.Column(db.Boolean, default=False)
     is_featured = db.Column(db.Boolean, default=False)
     view_count = db.Column(db.Integer, default=0)
     download_count = db.Column(db.Integer, default=0)
     
+    # Distinct readers: all-time HyperLogLog sketch (merged from the daily ones)
+    # and its estimate, which drives popularity ordering
+    unique_view_count = db.Column(db.Integer, default=0, index=True)
+    unique_view_sketch = db.deferred(db.Column(db.LargeBinary))
+    
+    # log of the exponentially decayed view/download weight (see services.trending)
+    trending_score = db.Column(db.Float, nullable=False, default=0.0)
+    
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -46,9 +70,24 @@ class Article(db.Model):
     # Relationships
     creator = db.relationship('User', backref=db.backref('articles', lazy=True))
     
+    __table_args__ = (
+        db.Index('ix_articles_published_trending', 'is_published', 'trending_score'),
+        db.Index('ix_articles_category_trending', 'category', 'is_published', 'trending_score'),
+    )
+    
     def __repr__(self):
         return f'<Article {self.title}>'
     
+    @staticmethod
+    def popularity_order():
+        """ORDER BY terms for popularity: unique readers, then raw views to break ties"""
+        return (Article.unique_view_count.desc(), Article.view_count.desc())
+    
+    @staticmethod
+    def trending_order():
+        """ORDER BY terms for 'trending'; a backward scan of the (..., trending_score) indexes"""
+        return (Article.trending_score.desc(),)
+    
     @property
     def tag_list(self):
         if self.tags:
@@ -59,15 +98,93 @@ class Article(db.Model):
     def tag_list(self, tags):
         self.tags = ', '.join(tags)
     
+    # Embedding inputs, in Python and as SQL (for finding stale embeddings); keep the two in step
+    @hybrid_property
+    def title_embedding_text(self):
+        """Input text used for the title embedding; a missing description counts as empty"""
+        return f"{self.title} {self.description or ''}"
+    
+    @title_embedding_text.expression
+    def title_embedding_text(cls):
+        return cls.title + ' ' + db.func.coalesce(cls.description, '')
+    
+    @hybrid_property
+    def content_embedding_text(self):
+        """Input text used for the content embedding (first 2000 characters)"""
+        if self.full_text_content:
+            return self.full_text_content[:2000]
+        return ''
+    
+    @content_embedding_text.expression
+    def content_embedding_text(cls):
+        return db.func.coalesce(db.func.substr(cls.full_text_content, 1, 2000), '')
+    
+    @staticmethod
+    def embedding_input_hash(text):
+        return hashlib.sha256((text or '').encode('utf-8')).hexdigest()
+    
+    def embedding_state(self, field, model_name):
+        """Return 'missing', 'unknown', 'stale_model', 'stale_input' or 'current' for an embedding field"""
+        if getattr(self, f'{field}_embedding') is None:
+            return 'missing'
+        if getattr(self, f'{field}_embedding_model') is None:
+            # Vectors written before provenance tracking
+            return 'unknown'
+        if getattr(self, f'{field}_embedding_model') != model_name:
+            return 'stale_model'
+        text = getattr(self, f'{field}_embedding_text')
+        if getattr(self, f'{field}_embedding_hash') != self.embedding_input_hash(text):
+            return 'stale_input'
+        return 'current'
+    
+    @property
+    def is_processing(self):
+        return self.processing_status in ('pending', 'processing')
+    
+    def processing_state(self):
+        return {
+            'id': self.id,
+            'status': self.processing_status,
+            'error': self.processing_error,
+            'timings': self.processing_timings or {},
+            'page_count': self.page_count,
+            'bytes_saved': (self.pdf_derivatives or {}).get('bytes_saved')
+        }
+    
+    @property
+    def viewer_pdf_path(self):
+        """Smallest full copy of the PDF for inline viewing"""
+        derivatives = self.pdf_derivatives or {}
+        if derivatives.get('optimized_file'):
+            return os.path.join(derivatives['directory'], derivatives['optimized_file'])
+        return self.pdf_path
+    
+    def page_fragments(self):
+        """Page-range fragments as dicts with first_page, last_page, size and path"""
+        derivatives = self.pdf_derivatives or {}
+        return [
+            dict(fragment, path=os.path.join(derivatives['directory'], fragment['file']))
+            for fragment in derivatives.get('fragments', [])
+        ]
+    
     def increment_view_count(self):
-        self.view_count = (self.view_count or 0) + 1
-        db.session.commit()
+        self._buffer_increment('view_count')
     
     def increment_download_count(self):
-        self.download_count = (self.download_count or 0) + 1
-        db.session.commit()
+        self._buffer_increment('download_count')
+    
+    def _buffer_increment(self, field):
+        """Queue a counter increment for the write-behind buffer
+        
+        The loaded value is bumped without marking the row dirty, so this
+        request shows the new count but never writes an absolute value back.
+        """
+        from app.services.counters import article_counters
+        article_counters.increment(self.id, field)
+        set_committed_value(self, field, (getattr(self, field) or 0) + 1)
     
     def to_dict(self):
+        from app.services.trending import Trending
         return {
             'id': self.id,
             'uuid': str(self.uuid),
@@ -80,6 +197,8 @@ class Article(db.Model):
             'is_published': self.is_published,
             'is_featured': self.is_featured,
             'view_count': self.view_count,
+            'unique_view_count': self.unique_view_count,
+            'trending': round(Trending.current_value(self.trending_score), 2),
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'published_at': self.published_at.isoformat() if self.published_at else None
         }
@@ -92,8 +211,22 @@ class Category(db.Model):
     slug = db.Column(db.String(80), unique=True, nullable=False, index=True)
     description = db.Column(db.Text)
     is_active = db.Column(db.Boolean, default=True)
-    article_count = db.Column(db.Integer, default=0)
+    article_count = db.Column(db.Integer, default=0)  # Published articles; kept current by a trigger on articles
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def __repr__(self):
-        return f'<Category {self.name}>'
\ No newline at end of file
+        return f'<Category {self.name}>'
+
+class SiteStat(db.Model):
+    """One site-wide count, kept current by triggers on articles and users
+    
+    Rows: 'articles', 'published_articles', 'featured_articles' (published
+    and featured) and 'users'. SiteStats.reconcile() repairs any drift.
+    """
+    __tablename__ = 'site_stats'
+    
+    name = db.Column(db.String(40), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<SiteStat {self.name}={self.value}>'
@@ -0,0 +1,90 @@
+from datetime import datetime
+from pgvector.sqlalchemy import Vector
+from app import db
+
+# Compact codes stored in article_events.event_type
+EVENT_TYPES = {
+    'view': 1,
+    'download': 2,
+    'preview': 3,
+    'search_click': 4
+}
+EVENT_NAMES = {code: name for name, code in EVENT_TYPES.items()}
+
+class ArticleEvent(db.Model):
+    """Append-only raw event, one row per view/download/preview/search click
+    
+    The table is range-partitioned by day on occurred_at (see the migration
+    and analytics.ensure_event_partitions), so old days are dropped whole
+    instead of deleted row by row.
+    """
+    __tablename__ = 'article_events'
+    
+    id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    occurred_at = db.Column(db.DateTime, primary_key=True, default=datetime.utcnow)
+    article_id = db.Column(db.Integer, nullable=False)
+    event_type = db.Column(db.SmallInteger, nullable=False)
+    user_id = db.Column(db.Integer)
+    
+    def __repr__(self):
+        return f'<ArticleEvent {EVENT_NAMES.get(self.event_type)} article={self.article_id}>'
+
+class ArticleEventRollup(db.Model):
+    """Event counts per article, event type and hour or day bucket"""
+    __tablename__ = 'article_event_rollups'
+    
+    id = db.Column(db.BigInteger, primary_key=True)
+    granularity = db.Column(db.String(5), nullable=False)  # 'hour' or 'day'
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    article_id = db.Column(db.Integer, db.ForeignKey('articles.id', ondelete='CASCADE'), nullable=False)
+    event_type = db.Column(db.SmallInteger, nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('granularity', 'bucket_start', 'article_id', 'event_type',
+                            name='uq_article_event_rollups_bucket'),
+        db.Index('ix_article_event_rollups_article', 'article_id', 'granularity', 'bucket_start'),
+    )
+    
+    def __repr__(self):
+        return f'<ArticleEventRollup {self.granularity} {self.bucket_start} article={self.article_id}>'
+
+class ArticleDailyUniques(db.Model):
+    """HyperLogLog sketch of the distinct visitors who viewed an article on one day"""
+    __tablename__ = 'article_daily_uniques'
+    
+    article_id = db.Column(db.Integer, db.ForeignKey('articles.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    sketch = db.Column(db.LargeBinary, nullable=False)  # HyperLogLog.to_bytes(), 4 KB
+    unique_visitors = db.Column(db.Integer, nullable=False, default=0)  # Estimate from the sketch
+    
+    def __repr__(self):
+        return f'<ArticleDailyUniques article={self.article_id} {self.day} ~{self.unique_visitors}>'
+
+class SearchQueryStat(db.Model):
+    """Persisted heavy-hitter search queries, plus their warmed embedding and results"""
+    __tablename__ = 'search_query_stats'
+    
+    # Not `query`, which would hide Model.query; the column keeps its name
+    query_text = db.Column('query', db.String(200), primary_key=True)  # Normalized query text
+    count = db.Column(db.BigInteger, nullable=False, default=0, index=True)
+    first_seen = db.Column(db.DateTime, default=datetime.utcnow)
+    last_seen = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Filled by the warm_search_cache job for the top queries
+    embedding = db.Column(Vector(384))
+    embedding_model = db.Column(db.String(255))
+    result_ranking = db.Column(db.JSON)  # [[article_id, similarity], ...] for semantic search
+    results_computed_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<SearchQueryStat {self.query_text!r} {self.count}>'
+    
+    def to_dict(self):
+        return {
+            'query': self.query_text,
+            'count': self.count,
+            'last_seen': self.last_seen.isoformat() if self.last_seen else None,
+            'embedding_cached': self.embedding is not None,
+            'results_cached_at': self.results_computed_at.isoformat() if self.results_computed_at else None
+        }
@@ -0,0 +1,49 @@
+from datetime import datetime
+from app import db
+
+class Job(db.Model):
+    """Durable background job, claimed by workers with SELECT ... FOR UPDATE SKIP LOCKED"""
+    __tablename__ = 'jobs'
+    
+    id = db.Column(db.BigInteger, primary_key=True)
+    task = db.Column(db.String(100), nullable=False, index=True)
+    payload = db.Column(db.JSON, default=dict)
+    
+    # queued -> running -> done, or back to queued with backoff; dead after max_attempts
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    priority = db.Column(db.Integer, nullable=False, default=0)  # Higher runs first
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    last_error = db.Column(db.Text)
+    
+    # Scheduling and visibility timeout
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(120))
+    locked_until = db.Column(db.DateTime)
+    
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_jobs_claim', 'status', 'priority', 'run_at'),
+    )
+    
+    def __repr__(self):
+        return f'<Job {self.id} {self.task} {self.status}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'task': self.task,
+            'payload': self.payload,
+            'status': self.status,
+            'priority': self.priority,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'last_error': self.last_error,
+            'run_at': self.run_at.isoformat() if self.run_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
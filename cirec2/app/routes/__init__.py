@@ -3,5 +3,6 @@ from .auth import auth_bp
 from .admin import admin_bp
 from .articles import articles_bp
 from .search import search_bp
+from .files import files_bp
 
-__all__ = ['main_bp', 'auth_bp', 'admin_bp', 'articles_bp', 'search_bp']
\ No newline at end of file
+__all__ = ['main_bp', 'auth_bp', 'admin_bp', 'articles_bp', 'search_bp', 'files_bp']
\ No newline at end of file
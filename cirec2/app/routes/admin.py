@@ -5,8 +5,16 @@ from app import db
 from app.models import Article, Category, User
 from app.services.pdf_processor import PDFProcessor
 from app.services.embedding_service import EmbeddingService
+from app.services.background import process_article_async
+from app.services.search_stats import SearchStats
+from app.services.site_stats import SiteStats
+from app.services.invalidation import ARTICLE_CREATED, ARTICLE_DELETED, ARTICLE_UPDATED, CATEGORY_CREATED, invalidation_bus
+from app.services.cache import cache_stats
+from app.services.category_cache import CategoryCache
 from werkzeug.utils import secure_filename
 import os
+import json
+import shutil
 from datetime import datetime
 
 admin_bp = Blueprint('admin', __name__)
@@ -24,13 +32,14 @@ def admin_required(f):
 @login_required
 @admin_required
 def dashboard():
-    # Get statistics
+    # Get statistics, maintained by triggers rather than counted here
+    counts = SiteStats.counts()
     stats = {
-        'total_articles': Article.query.count(),
-        'published_articles': Article.query.filter_by(is_published=True).count(),
-        'draft_articles': Article.query.filter_by(is_published=False).count(),
-        'total_users': User.query.count(),
-        'total_categories': Category.query.count()
+        'total_articles': counts['articles'],
+        'published_articles': counts['published_articles'],
+        'draft_articles': counts['articles'] - counts['published_articles'],
+        'total_users': counts['users'],
+        'total_categories': len(CategoryCache.all())
     }
     
     # Get recent articles
@@ -39,10 +48,14 @@ def dashboard():
     # Get recent users
     recent_users = User.query.order_by(User.created_at.desc()).limit(5).all()
     
+    # Most frequent search queries
+    top_queries = SearchStats.top_queries(10)
+    
     return render_template('admin/dashboard.html',
                          stats=stats,
                          recent_articles=recent_articles,
-                         recent_users=recent_users)
+                         recent_users=recent_users,
+                         top_queries=top_queries)
 
 @admin_bp.route('/articles')
 @login_required
@@ -70,7 +83,7 @@ def articles():
     )
     
     # Get categories for filter
-    categories = Category.query.all()
+    categories = CategoryCache.all()
     
     return render_template('admin/articles.html',
                          articles=articles,
@@ -117,7 +130,7 @@ def add_article():
         if errors:
             for error in errors:
                 flash(error, 'error')
-            categories = Category.query.all()
+            categories = CategoryCache.all()
             return render_template('admin/add_article.html', categories=categories)
         
         try:
@@ -129,23 +142,7 @@ def add_article():
                 flash(f'Error saving file: {save_result["error"]}', 'error')
                 return redirect(url_for('admin.add_article'))
             
-            # Extract text from PDF
             pdf_path = save_result['filepath']
-            extraction_result = PDFProcessor.extract_text_from_pdf(pdf_path)
-            
-            if not extraction_result['success']:
-                flash('Error extracting text from PDF. Article saved without content.', 'warning')
-                full_text = ''
-                preview_content = description[:500]
-                page_count = 0
-            else:
-                full_text = extraction_result['full_text']
-                preview_content = PDFProcessor.generate_preview_content(full_text)
-                page_count = extraction_result['page_count']
-            
-            # Generate embeddings
-            title_embedding = EmbeddingService.generate_embedding(title + ' ' + description)
-            content_embedding = EmbeddingService.generate_embedding(full_text[:2000]) if full_text else None
             
             # Create article
             article = Article(
@@ -157,11 +154,8 @@ def add_article():
                 pdf_filename=save_result['filename'],
                 pdf_path=pdf_path,
                 pdf_size=save_result['filesize'],
-                full_text_content=full_text,
-                preview_content=preview_content,
-                page_count=page_count,
-                title_embedding=title_embedding,
-                content_embedding=content_embedding,
+                preview_content=description[:500],
+                processing_status='pending',
                 is_published=is_published,
                 is_featured=is_featured,
                 created_by=current_user.id,
@@ -169,16 +163,21 @@ def add_article():
             )
             
             db.session.add(article)
+            db.session.flush()
+            invalidation_bus.publish(ARTICLE_CREATED, article.id, [category], listings=is_published)
             db.session.commit()
             
-            flash('Article added successfully!', 'success')
+            # Text extraction and embeddings run in the background worker pool
+            process_article_async(article.id)
+            
+            flash('Article added! Text extraction and indexing are running in the background.', 'success')
             return redirect(url_for('admin.articles'))
         
         except Exception as e:
             db.session.rollback()
             flash(f'Error adding article: {str(e)}', 'error')
     
-    categories = Category.query.all()
+    categories = CategoryCache.all()
     return render_template('admin/add_article.html', categories=categories)
 
 @admin_bp.route('/articles/<int:article_id>/edit', methods=['GET', 'POST'])
@@ -200,10 +199,13 @@ def edit_article(article_id):
         # Validation
         if not all([title, description, author, category]):
             flash('All fields are required.', 'error')
-            categories = Category.query.all()
+            categories = CategoryCache.all()
             return render_template('admin/edit_article.html', article=article, categories=categories)
         
         try:
+            # Listings only change if the article enters, leaves or moves between them
+            listed_before = (article.is_published, article.is_featured, article.category)
+            
             # Update article
             article.title = title
             article.description = description
@@ -222,9 +224,13 @@ def edit_article(article_id):
             article.is_published = is_published
             
             # Update embeddings if title or description changed
-            title_embedding = EmbeddingService.generate_embedding(title + ' ' + description)
-            article.title_embedding = title_embedding
+            if article.embedding_state('title', EmbeddingService.model_name()) != 'current':
+                EmbeddingService.embed_article(article, fields=('title',))
             
+            invalidation_bus.publish(
+                ARTICLE_UPDATED, article.id, [listed_before[2], category],
+                listings=listed_before != (is_published, is_featured, category)
+            )
             db.session.commit()
             flash('Article updated successfully!', 'success')
             return redirect(url_for('admin.articles'))
@@ -233,7 +239,7 @@ def edit_article(article_id):
             db.session.rollback()
             flash(f'Error updating article: {str(e)}', 'error')
     
-    categories = Category.query.all()
+    categories = CategoryCache.all()
     return render_template('admin/edit_article.html', article=article, categories=categories)
 
 @admin_bp.route('/articles/<int:article_id>/delete', methods=['POST'])
@@ -243,11 +249,15 @@ def delete_article(article_id):
     article = Article.query.get_or_404(article_id)
     
     try:
-        # Delete PDF file
+        # Delete PDF file, its cached analysis and its viewer derivatives
         if os.path.exists(article.pdf_path):
+            PDFProcessor.forget_analysis(article.pdf_path)
             os.remove(article.pdf_path)
+        if article.pdf_derivatives:
+            shutil.rmtree(article.pdf_derivatives['directory'], ignore_errors=True)
         
         # Delete article from database
+        invalidation_bus.publish(ARTICLE_DELETED, article.id, [article.category], listings=True)
         db.session.delete(article)
         db.session.commit()
         
@@ -258,11 +268,143 @@ def delete_article(article_id):
     
     return redirect(url_for('admin.articles'))
 
+@admin_bp.route('/articles/bulk-upload', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def bulk_upload():
+    """Upload many PDFs (or a zip with an optional metadata.csv) and import them in the background"""
+    from app.services.background import submit_task
+    from app.services.bulk_import import save_report
+    import uuid
+    
+    if request.method == 'POST':
+        category = request.form.get('category', '').strip()
+        pdf_files = [f for f in request.files.getlist('pdf_files') if f and f.filename]
+        archive = request.files.get('archive')
+        
+        if not pdf_files and not (archive and archive.filename):
+            flash('Select PDF files or a zip archive to import.', 'error')
+            return redirect(url_for('admin.bulk_upload'))
+        if archive and archive.filename and not archive.filename.lower().endswith('.zip'):
+            flash('The archive must be a .zip file.', 'error')
+            return redirect(url_for('admin.bulk_upload'))
+        
+        batch_id = uuid.uuid4().hex[:12]
+        batch_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'imports', batch_id)
+        staging_dir = os.path.join(batch_dir, 'files')
+        
+        try:
+            # Stream uploads straight to disk; the importer re-reads them from there
+            if archive and archive.filename:
+                os.makedirs(batch_dir, exist_ok=True)
+                source = os.path.join(batch_dir, 'upload.zip')
+                archive.save(source)
+            else:
+                os.makedirs(staging_dir, exist_ok=True)
+                source = staging_dir
+                staged = set()
+                for pdf_file in pdf_files:
+                    if not pdf_file.filename.lower().endswith('.pdf'):
+                        continue
+                    # Sanitizing can empty a name (e.g. non-ASCII) or map two uploads onto one
+                    filename = secure_filename(pdf_file.filename)
+                    if not filename.lower().endswith('.pdf'):
+                        filename = 'upload.pdf'
+                    stem, ext = os.path.splitext(filename)
+                    copy = 1
+                    while filename.lower() in staged:
+                        copy += 1
+                        filename = f'{stem}_{copy}{ext}'
+                    staged.add(filename.lower())
+                    pdf_file.save(os.path.join(staging_dir, filename))
+            
+            report_path = os.path.join(batch_dir, 'report.json')
+            save_report({'status': 'queued', 'files': []}, report_path)
+            submit_task(
+                'bulk_import',
+                source=source,
+                created_by=current_user.id,
+                report_path=report_path,
+                defaults={
+                    'category': category,
+                    'author': request.form.get('author', '').strip(),
+                    'tags': request.form.get('tags', '').strip()
+                },
+                publish=bool(request.form.get('is_published'))
+            )
+        except Exception as e:
+            flash(f'Error starting import: {str(e)}', 'error')
+            return redirect(url_for('admin.bulk_upload'))
+        
+        flash(f'Import {batch_id} started. Articles appear as each batch is inserted.', 'success')
+        return redirect(url_for('admin.bulk_upload', batch=batch_id))
+    
+    categories = CategoryCache.all()
+    return render_template('admin/bulk_upload.html', categories=categories,
+                         batch_id=request.args.get('batch'))
+
+@admin_bp.route('/articles/bulk-upload/<batch_id>')
+@login_required
+@admin_required
+def bulk_upload_report(batch_id):
+    """JSON report for one bulk import"""
+    report_path = os.path.join(
+        current_app.config['UPLOAD_FOLDER'], 'imports', secure_filename(batch_id), 'report.json'
+    )
+    if not os.path.exists(report_path):
+        return jsonify({'error': 'Unknown import'}), 404
+    
+    with open(report_path) as f:
+        return jsonify(json.load(f))
+
+@admin_bp.route('/search/top-queries')
+@login_required
+@admin_required
+def top_search_queries():
+    """Most frequent normalized search queries and whether they are warmed"""
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    return jsonify([stat.to_dict() for stat in SearchStats.top_queries(limit)])
+
+@admin_bp.route('/cache/stats')
+@login_required
+@admin_required
+def cache_statistics():
+    """Size, evictions and per-route hit/miss counts of this worker's caches"""
+    return jsonify(cache_stats())
+
+@admin_bp.route('/articles/processing-status')
+@login_required
+@admin_required
+def articles_processing_status():
+    """Ingestion status and per-stage timings for the given article ids"""
+    ids = [int(i) for i in request.args.get('ids', '').split(',') if i.strip().isdigit()]
+    articles = Article.query.filter(Article.id.in_(ids)).all() if ids else []
+    
+    return jsonify({article.id: article.processing_state() for article in articles})
+
+@admin_bp.route('/embeddings/migration', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def embedding_migration():
+    """Start or report on the background re-embedding of stale articles"""
+    from app.services.background import (
+        count_stale_embeddings, get_embedding_migration_status, start_embedding_migration
+    )
+    
+    if request.method == 'POST':
+        start_embedding_migration(current_app._get_current_object())
+    
+    return jsonify({
+        'model': EmbeddingService.model_name(),
+        'stale_articles': count_stale_embeddings(),
+        'migration': get_embedding_migration_status()
+    })
+
 @admin_bp.route('/categories')
 @login_required
 @admin_required
 def categories():
-    categories = Category.query.order_by(Category.name).all()
+    categories = CategoryCache.all()
     return render_template('admin/categories.html', categories=categories)
 
 @admin_bp.route('/categories/add', methods=['POST'])
@@ -285,6 +427,7 @@ def add_category():
     try:
         category = Category(name=name, slug=slug, description=description)
         db.session.add(category)
+        invalidation_bus.publish(CATEGORY_CREATED, categories=[name])
         db.session.commit()
         flash('Category added successfully!', 'success')
     except Exception as e:
@@ -1,6 +1,14 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, send_file, abort
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, abort, current_app
 from flask_login import login_required, current_user
-from app.models import Article, Category
+from app.models import Article
+from app.services.analytics import record_event, record_unique_view, time_series
+from app.services.category_cache import CategoryCache
+from app.services.counters import article_counters
+from app.services.leaderboards import Leaderboards
+from app.services.page_cache import cached_page, set_page_meta, tag_page
+from app.utils.file_serving import is_initial_transfer, send_pdf
+from app.utils.http_cache import apply_cache_control, conditional_response, json_response, make_etag, time_bucket, viewer_key
+from app.utils.signed_urls import signed_pdf_url, signing_window
 from app import db
 import os
 import uuid
@@ -8,10 +16,11 @@ import uuid
 articles_bp = Blueprint('articles', __name__)
 
 @articles_bp.route('/')
+@cached_page()
 def list_articles():
     page = request.args.get('page', 1, type=int)
     category_filter = request.args.get('category')
-    sort_by = request.args.get('sort', 'latest')  # latest, popular, featured
+    sort_by = request.args.get('sort', 'latest')  # latest, popular, trending, featured
     
     # Base query for published articles
     query = Article.query.filter_by(is_published=True)
@@ -22,7 +31,9 @@ def list_articles():
     
     # Apply sorting
     if sort_by == 'popular':
-        query = query.order_by(Article.view_count.desc())
+        query = query.order_by(*Article.popularity_order())
+    elif sort_by == 'trending':
+        query = query.order_by(*Article.trending_order())
     elif sort_by == 'featured':
         query = query.filter_by(is_featured=True).order_by(Article.created_at.desc())
     else:  # latest
@@ -32,9 +43,10 @@ def list_articles():
     articles = query.paginate(
         page=page, per_page=12, error_out=False
     )
+    tag_page('articles', *(f'article:{article.id}' for article in articles.items))
     
     # Get all categories for filter dropdown
-    categories = Category.query.filter_by(is_active=True).all()
+    categories = CategoryCache.active()
     
     return render_template('articles/list.html',
                          articles=articles,
@@ -67,7 +79,20 @@ def debug_article(article_uuid):
     except Exception as e:
         return f"Error: {str(e)}"
 
+def _record_view(article_id):
+    """View-side effects shared by rendered and cached pages; all buffered, no queries"""
+    user_id = current_user.id if current_user.is_authenticated else None
+    record_event(article_id, 'view', user_id)
+    record_unique_view(article_id)
+    if request.args.get('ref') == 'search':
+        record_event(article_id, 'search_click', user_id)
+
+def _record_cached_view(meta):
+    article_counters.increment(meta['article_id'], 'view_count')
+    _record_view(meta['article_id'])
+
 @articles_bp.route('/<uuid:article_uuid>')
+@cached_page(on_hit=_record_cached_view)
 def view_article(article_uuid):
     # Convert string to UUID if needed
     if isinstance(article_uuid, str):
@@ -78,30 +103,55 @@ def view_article(article_uuid):
     
     article = Article.query.filter_by(uuid=article_uuid, is_published=True).first_or_404()
     
-    # Increment view count
+    # Buffered; written back in batches by the counter and event flush threads
     article.increment_view_count()
-    
-    # Check if user can access full content
-    can_access_full = False
-    if current_user.is_authenticated:
-        can_access_full = current_user.is_verified or current_user.is_admin  # Allow all verified users
-    
-    # Get related articles (same category, excluding current)
-    related_articles = Article.query.filter(
-        Article.category == article.category,
-        Article.id != article.id,
-        Article.is_published == True
-    ).order_by(Article.view_count.desc()).limit(4).all()
-    
-    return render_template('articles/detail.html',
-                         article=article,
-                         can_access_full=can_access_full,
-                         related_articles=related_articles)
+    _record_view(article.id)
+    set_page_meta(article_id=article.id)
+    tag_page(f'article:{article.id}', f'category:{article.category}')
+    
+    # Entitled readers get signed PDF URLs that are served without a database hit
+    entitled = current_user.is_authenticated and (current_user.is_subscribed() or current_user.is_admin)
+    
+    # The page changes with the article, the viewer, the related articles' category and,
+    # for entitled readers, the signed URL window; deletes do not advance any timestamp,
+    # so the ETag is the only validator
+    etag = make_etag('article', article.uuid, article.updated_at,
+                     CategoryCache.listing_version(article.category), viewer_key(),
+                     signing_window() if entitled else None)
+    
+    def render():
+        # Check if user can access full content
+        can_access_full = False
+        if current_user.is_authenticated:
+            can_access_full = current_user.is_verified or current_user.is_admin  # Allow all verified users
+        
+        # Get related articles (same category, excluding current)
+        related_articles = Article.query.filter(
+            Article.category == article.category,
+            Article.id != article.id,
+            Article.is_published == True
+        ).order_by(*Article.popularity_order()).limit(4).all()
+        tag_page(*(f'article:{related.id}' for related in related_articles))
+        
+        pdf_view_url = pdf_download_url = None
+        if entitled:
+            pdf_view_url = signed_pdf_url(article, current_user.id)
+            pdf_download_url = signed_pdf_url(article, current_user.id, as_attachment=True)
+        
+        return render_template('articles/detail.html',
+                             article=article,
+                             can_access_full=can_access_full,
+                             related_articles=related_articles,
+                             pdf_view_url=pdf_view_url,
+                             pdf_download_url=pdf_download_url)
+    
+    return conditional_response(etag, render)
 
 @articles_bp.route('/<uuid:article_uuid>/preview')
 def preview_article(article_uuid):
     """Show article preview for non-subscribed users"""
     article = Article.query.filter_by(uuid=article_uuid, is_published=True).first_or_404()
+    record_event(article.id, 'preview', current_user.id if current_user.is_authenticated else None)
     
     # Only show preview content
     return render_template('articles/preview.html', article=article)
@@ -122,20 +172,19 @@ def download_pdf(article_uuid):
         flash('PDF file not found.', 'error')
         return redirect(url_for('articles.view_article', article_uuid=article_uuid))
     
-    # Increment download count
-    article.increment_download_count()
-    
-    # Send file
+    # Send file (or hand it to the front proxy); conditional requests get 304 and Range requests get 206
     try:
-        return send_file(
-            article.pdf_path,
-            as_attachment=True,
-            download_name=f"{article.title}.pdf",
-            mimetype='application/pdf'
-        )
+        response = send_pdf(article.pdf_path, f"{article.title}.pdf", as_attachment=True)
     except Exception as e:
         flash('Error downloading file. Please try again.', 'error')
         return redirect(url_for('articles.view_article', article_uuid=article_uuid))
+    
+    # Count a download once: not for revalidations or later byte ranges of the same transfer
+    if is_initial_transfer():
+        article.increment_download_count()
+        record_event(article.id, 'download', current_user.id)
+    
+    return apply_cache_control(response, current_app.config.get('HTTP_CACHE_PDF_MAX_AGE', 3600), private=True)
 
 @articles_bp.route('/<uuid:article_uuid>/view-pdf')
 @login_required
@@ -148,49 +197,106 @@ def view_pdf(article_uuid):
         abort(403)
     
     # Check if file exists
-    if not os.path.exists(article.pdf_path):
+    pdf_path = article.viewer_pdf_path
+    if not os.path.exists(pdf_path):
         abort(404)
     
-    # Send file for inline viewing
+    # Send file for inline viewing; viewers fetch large PDFs in byte ranges
     try:
-        return send_file(
-            article.pdf_path,
-            mimetype='application/pdf',
-            as_attachment=False,
-            download_name=f"{article.title}.pdf"
-        )
+        response = send_pdf(pdf_path, f"{article.title}.pdf")
     except Exception as e:
         abort(404)
+    
+    return apply_cache_control(response, current_app.config.get('HTTP_CACHE_PDF_MAX_AGE', 3600), private=True)
+
+@articles_bp.route('/api/<uuid:article_uuid>/pages')
+@login_required
+def api_article_pages(article_uuid):
+    """Signed URLs for an article's page-range fragments, so a viewer can load pages on demand"""
+    article = Article.query.filter_by(uuid=article_uuid, is_published=True).first_or_404()
+    if not (current_user.is_subscribed() or current_user.is_admin):
+        return jsonify({'success': False, 'error': 'Subscription required'}), 403
+    
+    fragments = article.page_fragments()
+    if not fragments:
+        return jsonify({'success': False, 'error': 'Page fragments are not available for this article'}), 404
+    
+    return jsonify({
+        'success': True,
+        'page_count': article.page_count,
+        'pages_per_fragment': article.pdf_derivatives.get('pages_per_fragment'),
+        'full_pdf_url': signed_pdf_url(article, current_user.id),
+        'fragments': [{
+            'first_page': fragment['first_page'],
+            'last_page': fragment['last_page'],
+            'size': fragment['size'],
+            'url': _fragment_url(article, fragment)
+        } for fragment in fragments]
+    })
+
+@articles_bp.route('/api/<uuid:article_uuid>/pages/<int:page_number>')
+@login_required
+def api_article_page(article_uuid, page_number):
+    """Redirect to the signed fragment that contains one page"""
+    article = Article.query.filter_by(uuid=article_uuid, is_published=True).first_or_404()
+    if not (current_user.is_subscribed() or current_user.is_admin):
+        abort(403)
+    
+    for fragment in article.page_fragments():
+        if fragment['first_page'] <= page_number <= fragment['last_page']:
+            url = _fragment_url(article, fragment)
+            if url:
+                return redirect(url)
+    abort(404)
+
+def _fragment_url(article, fragment):
+    return signed_pdf_url(
+        article, current_user.id, file_path=fragment['path'],
+        download_name=f"{article.title} (pages {fragment['first_page']}-{fragment['last_page']}).pdf"
+    )
 
 @articles_bp.route('/category/<category_name>')
+@cached_page()
 def category_articles(category_name):
     """Show articles in a specific category"""
     page = request.args.get('page', 1, type=int)
     sort_by = request.args.get('sort', 'latest')
     
     # Get category
-    category = Category.query.filter_by(slug=category_name, is_active=True).first_or_404()
-    
-    # Base query for published articles in this category
-    query = Article.query.filter_by(is_published=True, category=category.name)
-    
-    # Apply sorting
-    if sort_by == 'popular':
-        query = query.order_by(Article.view_count.desc())
-    elif sort_by == 'featured':
-        query = query.filter_by(is_featured=True).order_by(Article.created_at.desc())
-    else:  # latest
-        query = query.order_by(Article.created_at.desc())
-    
-    # Paginate results
-    articles = query.paginate(
-        page=page, per_page=12, error_out=False
-    )
-    
-    return render_template('articles/category.html',
-                         articles=articles,
-                         category=category,
-                         current_sort=sort_by)
+    category = CategoryCache.get_by_slug_or_404(category_name)
+    
+    max_age = current_app.config.get('HTTP_CACHE_MAX_AGE', 60)
+    # Popular and trending orders move with counters that do not touch updated_at
+    window = time_bucket(max_age) if sort_by in ('popular', 'trending') else None
+    etag = make_etag('category', category.id, category.name, sort_by, page,
+                     CategoryCache.listing_version(category.name), window, viewer_key())
+    
+    def render():
+        # Base query for published articles in this category
+        query = Article.query.filter_by(is_published=True, category=category.name)
+        
+        # Apply sorting
+        if sort_by == 'popular':
+            query = query.order_by(*Article.popularity_order())
+        elif sort_by == 'trending':
+            query = query.order_by(*Article.trending_order())
+        elif sort_by == 'featured':
+            query = query.filter_by(is_featured=True).order_by(Article.created_at.desc())
+        else:  # latest
+            query = query.order_by(Article.created_at.desc())
+        
+        # Paginate results
+        articles = query.paginate(
+            page=page, per_page=12, error_out=False
+        )
+        tag_page(f'category:{category.name}', *(f'article:{article.id}' for article in articles.items))
+        
+        return render_template('articles/category.html',
+                             articles=articles,
+                             category=category,
+                             current_sort=sort_by)
+    
+    return conditional_response(etag, render)
 
 @articles_bp.route('/api/<uuid:article_uuid>/like', methods=['POST'])
 @login_required
@@ -207,38 +313,71 @@ def like_article(article_uuid):
         'view_count': article.view_count
     })
 
+def _leaderboard_response(name, default_limit, category=None):
+    limit = request.args.get('limit', default_limit, type=int)
+    return json_response(Leaderboards.json(name, limit, category))
+
 @articles_bp.route('/api/popular')
 def api_popular_articles():
     """API endpoint for popular articles"""
-    limit = request.args.get('limit', 5, type=int)
-    
-    articles = Article.query.filter_by(is_published=True)\
-        .order_by(Article.view_count.desc())\
-        .limit(limit).all()
-    
-    return jsonify([article.to_dict() for article in articles])
+    return _leaderboard_response('popular', 5)
+
+@articles_bp.route('/api/trending')
+def api_trending_articles():
+    """API endpoint for trending articles (exponentially decayed views and downloads)"""
+    category = request.args.get('category')
+    # Each category gets a board of its own, so only real ones may create one
+    if category and category not in {entry.name for entry in CategoryCache.active()}:
+        abort(404)
+    return _leaderboard_response('trending', 5, category)
 
 @articles_bp.route('/api/featured')
 def api_featured_articles():
     """API endpoint for featured articles"""
-    limit = request.args.get('limit', 6, type=int)
-    
-    articles = Article.query.filter_by(is_published=True, is_featured=True)\
-        .order_by(Article.created_at.desc())\
-        .limit(limit).all()
-    
-    return jsonify([article.to_dict() for article in articles])
+    return _leaderboard_response('featured', 6)
 
 @articles_bp.route('/api/recent')
 def api_recent_articles():
     """API endpoint for recent articles"""
-    limit = request.args.get('limit', 10, type=int)
+    return _leaderboard_response('recent', 10)
+
+def _stats_params():
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in ('hour', 'day'):
+        abort(400)
+    default_periods = 48 if granularity == 'hour' else 30
+    periods = max(1, min(request.args.get('periods', default_periods, type=int), 366))
+    return granularity, periods
+
+@articles_bp.route('/api/<uuid:article_uuid>/stats')
+def api_article_stats(article_uuid):
+    """Hourly or daily view/download/preview/search-click counts for one article"""
+    article = Article.query.filter_by(uuid=article_uuid, is_published=True).first_or_404()
+    granularity, periods = _stats_params()
+    max_age = current_app.config.get('HTTP_CACHE_STATS_MAX_AGE', 300)
     
-    articles = Article.query.filter_by(is_published=True)\
-        .order_by(Article.created_at.desc())\
-        .limit(limit).all()
+    def build():
+        stats = time_series(granularity, periods, article_id=article.id)
+        stats.update({'success': True, 'article_uuid': str(article.uuid)})
+        return jsonify(stats)
     
-    return jsonify([article.to_dict() for article in articles])
+    etag = make_etag('article-stats', article.id, granularity, periods, time_bucket(max_age))
+    return conditional_response(etag, build, max_age=max_age, private=False)
+
+@articles_bp.route('/api/category/<category_name>/stats')
+def api_category_stats(category_name):
+    """Hourly or daily event counts summed over a category's articles"""
+    category = CategoryCache.get_by_slug_or_404(category_name)
+    granularity, periods = _stats_params()
+    max_age = current_app.config.get('HTTP_CACHE_STATS_MAX_AGE', 300)
+    
+    def build():
+        stats = time_series(granularity, periods, category=category.name)
+        stats.update({'success': True, 'category': category.name})
+        return jsonify(stats)
+    
+    etag = make_etag('category-stats', category.id, granularity, periods, time_bucket(max_age))
+    return conditional_response(etag, build, max_age=max_age, private=False)
 
 
 # from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, send_file, abort
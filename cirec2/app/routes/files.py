@@ -0,0 +1,32 @@
+from flask import Blueprint, request, current_app, abort
+from app.services.analytics import record_event
+from app.services.counters import article_counters
+from app.utils.file_serving import is_initial_transfer, send_pdf
+from app.utils.http_cache import apply_cache_control
+from app.utils.signed_urls import verify_pdf_signature
+import os
+import time
+
+# Signed PDF URLs: checked with one HMAC, no database or session lookups
+files_bp = Blueprint('files', __name__)
+
+@files_bp.route('/pdf/<path:path>')
+def signed_pdf(path):
+    """Serve a PDF from a URL issued by signed_pdf_url()"""
+    grant = verify_pdf_signature(path, request.args)
+    if grant is None:
+        abort(403)
+    
+    root = os.path.abspath(current_app.config['PDF_STORAGE_ROOT'])
+    full_path = os.path.abspath(os.path.join(root, path))
+    if os.path.commonpath([root, full_path]) != root or not os.path.isfile(full_path):
+        abort(404)
+    
+    # Buffered, like download_pdf, so counting does not touch the database either
+    if grant['as_attachment'] and is_initial_transfer():
+        article_counters.increment(grant['article_id'], 'download_count')
+        record_event(grant['article_id'], 'download', grant['user_id'])
+    
+    response = send_pdf(full_path, grant['download_name'], as_attachment=grant['as_attachment'])
+    max_age = min(current_app.config.get('HTTP_CACHE_PDF_MAX_AGE', 3600), int(grant['expires'] - time.time()))
+    return apply_cache_control(response, max_age, private=True)
@@ -1,15 +1,38 @@
 from flask import Blueprint, render_template, request, jsonify, g
-from app.models import Article, Category
+from app.models import Article
+from app.services.category_cache import CategoryCache
+from app.services.leaderboards import Leaderboards
+from app.services.page_cache import cached_page, page_cache, tag_page
+from app.services.site_stats import SiteStats
+from app.utils.http_cache import conditional_response, make_etag
 from app import db
 
 main_bp = Blueprint('main', __name__)
 
+@main_bp.before_app_request
+def serve_cached_page():
+    """Answer anonymous requests for cached pages before any other hook queries the database"""
+    return page_cache.serve()
+
 @main_bp.before_app_request
 def load_categories():
     """Load categories for navigation"""
-    g.categories = Category.query.filter_by(is_active=True).all()
+    if request.blueprint == 'files':
+        # Signed file URLs render no navigation
+        return
+    g.categories = CategoryCache.active()
+
+def site_stats():
+    """Public site counts, from the trigger-maintained site_stats rows and the category cache"""
+    counts = SiteStats.counts()
+    return {
+        'total_articles': counts['published_articles'],
+        'total_categories': len(CategoryCache.active()),
+        'featured_count': counts['featured_articles']
+    }
 
 @main_bp.route('/')
+@cached_page()
 def index():
     page = request.args.get('page', 1, type=int)
     category_filter = request.args.get('category')
@@ -21,11 +44,8 @@ def index():
     if category_filter:
         query = query.filter_by(category=category_filter)
     
-    # Get featured articles for homepage
-    featured_articles = Article.query.filter_by(
-        is_published=True, 
-        is_featured=True
-    ).order_by(Article.created_at.desc()).limit(6).all()
+    # Featured articles for homepage, from the precomputed board
+    featured_articles = Leaderboards.entries('featured', 6)
     
     # Get latest articles with pagination
     articles = query.order_by(Article.created_at.desc()).paginate(
@@ -33,16 +53,14 @@ def index():
         per_page=12, 
         error_out=False
     )
+    tag_page('articles', *(f'article:{article.id}' for article in articles.items),
+             *(f"article:{article['id']}" for article in featured_articles))
     
     # Get all categories for filter
-    categories = Category.query.filter_by(is_active=True).all()
+    categories = CategoryCache.active()
     
     # Stats for hero section
-    stats = {
-        'total_articles': Article.query.filter_by(is_published=True).count(),
-        'total_categories': Category.query.filter_by(is_active=True).count(),
-        'featured_count': Article.query.filter_by(is_published=True, is_featured=True).count()
-    }
+    stats = site_stats()
     
     return render_template('index.html',
                          articles=articles,
@@ -62,9 +80,6 @@ def contact():
 @main_bp.route('/api/stats')
 def api_stats():
     """API endpoint for site statistics"""
-    stats = {
-        'total_articles': Article.query.filter_by(is_published=True).count(),
-        'total_categories': Category.query.filter_by(is_active=True).count(),
-        'featured_count': Article.query.filter_by(is_published=True, is_featured=True).count()
-    }
-    return jsonify(stats)
\ No newline at end of file
+    # One primary-key read, so the counts themselves make the ETag
+    stats = site_stats()
+    return conditional_response(make_etag('site-stats', stats), lambda: jsonify(stats), private=False)
\ No newline at end of file
@@ -1,7 +1,8 @@
 from flask import Blueprint, render_template, request, jsonify
 from sqlalchemy import or_, func
-from app.models import Article, Category
-from app.services.embedding_service import EmbeddingService
+from app.models import Article
+from app.services.category_cache import CategoryCache
+from app.services.search_stats import SearchStats
 from app import db
 import re
 
@@ -15,9 +16,10 @@ def search():
     page = request.args.get('page', 1, type=int)
     
     articles = None
-    categories = Category.query.filter_by(is_active=True).all()
+    categories = CategoryCache.active()
     
     if query:
+        SearchStats.record(query)
         if search_type == 'semantic':
             articles = perform_semantic_search(query, category_filter, page)
         elif search_type == 'text':
@@ -69,7 +71,7 @@ def perform_text_search(query, category_filter=None, page=1):
     # Order by relevance (approximate)
     search_query = search_query.order_by(
         Article.is_featured.desc(),
-        Article.view_count.desc(),
+        *Article.popularity_order(),
         Article.created_at.desc()
     )
     
@@ -81,59 +83,27 @@ def perform_text_search(query, category_filter=None, page=1):
 def perform_semantic_search(query, category_filter=None, page=1):
     """Perform semantic search using embeddings"""
     try:
-        # Generate embedding for search query
-        query_embedding = EmbeddingService.generate_embedding(query)
-        if not query_embedding:
+        # Precomputed for top queries, otherwise scored once and shared by concurrent searches
+        ranking = SearchStats.ranking(query, category_filter)
+        if ranking is None:
             return perform_text_search(query, category_filter, page)
         
-        # Base query for published articles
-        base_query = Article.query.filter_by(is_published=True)
-        
-        # Apply category filter
-        if category_filter:
-            base_query = base_query.filter_by(category=category_filter)
-        
-        # Filter articles that have embeddings
-        base_query = base_query.filter(Article.title_embedding.isnot(None))
-        
-        # Get articles and calculate similarity
-        articles_with_similarity = []
-        articles = base_query.all()
-        
-        for article in articles:
-            # Calculate similarity with title embedding
-            title_similarity = 0
-            if article.title_embedding:
-                title_similarity = EmbeddingService.calculate_similarity(
-                    query_embedding, article.title_embedding
-                )
-            
-            # Calculate similarity with content embedding
-            content_similarity = 0
-            if article.content_embedding:
-                content_similarity = EmbeddingService.calculate_similarity(
-                    query_embedding, article.content_embedding
-                )
-            
-            # Combined similarity score (weighted)
-            combined_similarity = (title_similarity * 0.7) + (content_similarity * 0.3)
-            
-            if combined_similarity > 0.3:  # Threshold for relevance
-                articles_with_similarity.append({
-                    'article': article,
-                    'similarity': combined_similarity
-                })
-        
-        # Sort by similarity
-        articles_with_similarity.sort(key=lambda x: x['similarity'], reverse=True)
-        
-        # Paginate manually
+        # Paginate manually, loading only this page's articles
         per_page = 12
         start = (page - 1) * per_page
         end = start + per_page
         
-        paginated_articles = articles_with_similarity[start:end]
-        total = len(articles_with_similarity)
+        page_ids = [article_id for article_id, _ in ranking[start:end]]
+        articles_by_id = {
+            article.id: article
+            for article in Article.query.filter(Article.id.in_(page_ids), Article.is_published == True)
+        } if page_ids else {}
+        paginated_articles = [
+            {'article': articles_by_id[article_id], 'similarity': similarity}
+            for article_id, similarity in ranking[start:end]
+            if article_id in articles_by_id
+        ]
+        total = len(ranking)
         
         # Create a mock pagination object
         class MockPagination:
@@ -257,10 +227,10 @@ def api_search_suggestions():
     
     # Category suggestions
     if len(suggestions) < limit:
-        category_matches = Category.query.filter(
-            Category.is_active == True,
-            Category.name.ilike(f'%{query}%')
-        ).limit(limit - len(suggestions)).all()
+        needle = query.lower()
+        category_matches = [
+            category for category in CategoryCache.active() if needle in category.name.lower()
+        ][:limit - len(suggestions)]
         
         for category in category_matches:
             suggestions.append({
@@ -325,6 +295,7 @@ def api_advanced_search():
     
     # Apply filters
     if query:
+        SearchStats.record(query)
         search_conditions = []
         search_terms = re.findall(r'\w+', query.lower())
         for term in search_terms:
@@ -367,13 +338,13 @@ def api_advanced_search():
     elif sort_by == 'date_asc':
         search_query = search_query.order_by(Article.created_at.asc())
     elif sort_by == 'popular':
-        search_query = search_query.order_by(Article.view_count.desc())
+        search_query = search_query.order_by(*Article.popularity_order())
     elif sort_by == 'title':
         search_query = search_query.order_by(Article.title.asc())
     else:  # relevance
         search_query = search_query.order_by(
             Article.is_featured.desc(),
-            Article.view_count.desc(),
+            *Article.popularity_order(),
             Article.created_at.desc()
         )
     
@@ -0,0 +1,322 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, select, text, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from flask import current_app, request
+from flask_login import current_user
+from app.services.counters import RowBuffer, SketchBuffer
+from app.services.job_queue import JobQueue, task
+from app.services.leaderboards import Leaderboards
+from app.services.sketches import HyperLogLog
+from app.models import Article, ArticleDailyUniques, ArticleEvent, ArticleEventRollup
+from app.models.event import EVENT_TYPES
+from app import db
+import hashlib
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+PARTITION_NAME_PATTERN = re.compile(r'^article_events_(\d{8})$')
+BOT_USER_AGENT_PATTERN = re.compile(r'bot|crawl|spider|slurp|headless|preview|monitor|curl|wget|python-requests', re.I)
+GRANULARITIES = {'hour': timedelta(hours=1), 'day': timedelta(days=1)}
+
+def _existing_article_ids(article_ids):
+    """The ids that still have an article, key-share locked so none is deleted before this transaction ends
+    
+    Events and sketches buffered for an article that was deleted meanwhile
+    would fail the foreign key and, restored by the buffer, fail every later
+    flush with them; they are dropped instead.
+    """
+    articles = Article.__table__
+    return set(db.session.execute(
+        select(articles.c.id).where(articles.c.id.in_(set(article_ids))).with_for_update(read=True, key_share=True)
+    ).scalars())
+
+def _flush_events(rows):
+    """Append a batch of buffered events; executemany is sent as multi-row INSERTs"""
+    existing = _existing_article_ids(row['article_id'] for row in rows)
+    kept = [row for row in rows if row['article_id'] in existing]
+    if len(kept) < len(rows):
+        logger.info(f"Dropped {len(rows) - len(kept)} buffered events for deleted articles")
+    if kept:
+        db.session.execute(insert(ArticleEvent.__table__), kept)
+    db.session.commit()
+
+# Raw events are buffered like the counters and appended in batches
+event_buffer = RowBuffer(_flush_events, name='article events', config_prefix='EVENT')
+
+def record_event(article_id, event_type, user_id=None):
+    """Queue one view/download/preview/search_click event for the event log"""
+    event_buffer.append({
+        'article_id': article_id,
+        'event_type': EVENT_TYPES[event_type],
+        'user_id': user_id,
+        'occurred_at': datetime.utcnow()
+    })
+
+def visitor_key():
+    """Stable key for the current visitor, or None for bots
+    
+    Signed-in readers are keyed by user id; anonymous ones by a salted hash of
+    IP and user agent, so no raw address is kept in memory or in the sketches.
+    """
+    if current_user.is_authenticated:
+        return f'user:{current_user.id}'
+    
+    user_agent = request.headers.get('User-Agent', '')
+    if not user_agent or BOT_USER_AGENT_PATTERN.search(user_agent):
+        return None
+    raw = f"{current_app.config['SECRET_KEY']}|{request.remote_addr}|{user_agent}"
+    return 'anon:' + hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+def _flush_unique_views(batch):
+    """Merge buffered {(article_id, day): sketch} into the daily and all-time sketches
+    
+    Rows are locked in a fixed order and merged register-wise, so any number
+    of processes can flush their own sketches for the same article and day.
+    """
+    existing = _existing_article_ids(article_id for article_id, _ in batch)
+    keys = sorted(key for key in batch if key[0] in existing)
+    if len(keys) < len(batch):
+        logger.info(f"Dropped {len(batch) - len(keys)} buffered unique-view sketches for deleted articles")
+    if not keys:
+        db.session.commit()
+        return
+    
+    db.session.execute(
+        pg_insert(ArticleDailyUniques.__table__).values([
+            {'article_id': article_id, 'day': day, 'sketch': b'', 'unique_visitors': 0}
+            for article_id, day in keys
+        ]).on_conflict_do_nothing()
+    )
+    
+    per_article = {}
+    daily_rows = ArticleDailyUniques.query.filter(
+        tuple_(ArticleDailyUniques.article_id, ArticleDailyUniques.day).in_(keys)
+    ).order_by(ArticleDailyUniques.article_id, ArticleDailyUniques.day).with_for_update().all()
+    for row in daily_rows:
+        sketch = batch[(row.article_id, row.day)]
+        merged = HyperLogLog.from_bytes(row.sketch).merge(sketch)
+        row.sketch = merged.to_bytes()
+        row.unique_visitors = merged.count()
+        per_article.setdefault(row.article_id, HyperLogLog()).merge(sketch)
+    
+    # Plain SQL so the counter write does not bump articles.updated_at
+    articles = Article.__table__
+    current = db.session.execute(
+        select(articles.c.id, articles.c.unique_view_sketch, articles.c.category, articles.c.is_published)
+        .where(articles.c.id.in_(per_article))
+        .order_by(articles.c.id)
+        .with_for_update()
+    ).all()
+    counts = {}
+    for article_id, stored, category, is_published in current:
+        merged = HyperLogLog.from_bytes(stored).merge(per_article[article_id])
+        db.session.execute(
+            text("UPDATE articles SET unique_view_sketch = :sketch, unique_view_count = :count WHERE id = :id"),
+            {'sketch': merged.to_bytes(), 'count': merged.count(), 'id': article_id}
+        )
+        if is_published:
+            counts[article_id] = (merged.count(), category)
+    db.session.commit()
+    
+    Leaderboards.note_scores('popular', counts)
+
+# Distinct readers per article per day, merged into the database in batches
+unique_views = SketchBuffer(_flush_unique_views, name='unique views', config_prefix='EVENT')
+
+def record_unique_view(article_id):
+    """Count the current visitor towards the article's distinct readers for today"""
+    key = visitor_key()
+    if key is not None:
+        unique_views.add((article_id, datetime.utcnow().date()), key)
+
+def unique_visitors(article_id, start_day, end_day):
+    """Distinct visitors per day and over the whole [start_day, end_day) window"""
+    rows = ArticleDailyUniques.query.filter(
+        ArticleDailyUniques.article_id == article_id,
+        ArticleDailyUniques.day >= start_day,
+        ArticleDailyUniques.day < end_day
+    ).all()
+    
+    window = HyperLogLog()
+    for row in rows:
+        window.merge(HyperLogLog.from_bytes(row.sketch))
+    return {row.day: row.unique_visitors for row in rows}, window.count()
+
+def _bucket_floor(moment, granularity):
+    if granularity == 'day':
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+def ensure_event_partitions(days_ahead=None):
+    """Create the daily partitions for yesterday through days_ahead days from now"""
+    days_ahead = days_ahead if days_ahead is not None else current_app.config.get('EVENT_PARTITION_DAYS_AHEAD', 3)
+    today = _bucket_floor(datetime.utcnow(), 'day')
+    created = []
+    
+    for offset in range(-1, days_ahead + 1):
+        day = today + timedelta(days=offset)
+        name = f"article_events_{day:%Y%m%d}"
+        try:
+            db.session.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF article_events "
+                f"FOR VALUES FROM ('{day:%Y-%m-%d}') TO ('{day + timedelta(days=1):%Y-%m-%d}')"
+            ))
+            db.session.commit()
+            created.append(name)
+        except Exception as e:
+            # Typically rows for that day already landed in the default partition
+            db.session.rollback()
+            logger.warning(f"Could not create event partition {name}: {str(e)}")
+    
+    return created
+
+def drop_expired_event_partitions(retention_days=None):
+    """Drop daily raw-event partitions older than the retention window; rollups are kept"""
+    retention_days = retention_days or current_app.config.get('EVENT_RETENTION_DAYS', 90)
+    cutoff = _bucket_floor(datetime.utcnow(), 'day') - timedelta(days=retention_days)
+    
+    partitions = db.session.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = 'article_events'"
+    )).scalars().all()
+    
+    dropped = []
+    for name in partitions:
+        match = PARTITION_NAME_PATTERN.match(name)
+        if match and datetime.strptime(match.group(1), '%Y%m%d') < cutoff:
+            db.session.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            dropped.append(name)
+    db.session.commit()
+    
+    if dropped:
+        logger.info(f"Dropped expired event partitions: {', '.join(dropped)}")
+    return dropped
+
+def rollup_events(since=None, until=None):
+    """Recompute hourly and daily rollups for the buckets touched by [since, until)
+    
+    Buckets are recomputed from scratch and upserted, so re-running over the
+    same window (or overlapping windows) is idempotent.
+    """
+    now = datetime.utcnow()
+    if since is None:
+        lookback = current_app.config.get('EVENT_ROLLUP_LOOKBACK_HOURS', 2)
+        since = now - timedelta(hours=lookback)
+    hour_since = _bucket_floor(since, 'hour')
+    hour_until = _bucket_floor(until or now, 'hour') + GRANULARITIES['hour']
+    day_since = _bucket_floor(since, 'day')
+    day_until = _bucket_floor(until or now, 'day') + GRANULARITIES['day']
+    
+    try:
+        hours = db.session.execute(text(
+            "INSERT INTO article_event_rollups (granularity, bucket_start, article_id, event_type, count) "
+            "SELECT 'hour', date_trunc('hour', e.occurred_at), e.article_id, e.event_type, count(*) "
+            "FROM article_events e JOIN articles a ON a.id = e.article_id "
+            "WHERE e.occurred_at >= :since AND e.occurred_at < :until "
+            "GROUP BY 2, 3, 4 "
+            "ON CONFLICT ON CONSTRAINT uq_article_event_rollups_bucket "
+            "DO UPDATE SET count = EXCLUDED.count"
+        ), {'since': hour_since, 'until': hour_until}).rowcount
+        
+        # Days are summed from the hourly buckets, never from raw events
+        days = db.session.execute(text(
+            "INSERT INTO article_event_rollups (granularity, bucket_start, article_id, event_type, count) "
+            "SELECT 'day', date_trunc('day', bucket_start), article_id, event_type, sum(count) "
+            "FROM article_event_rollups "
+            "WHERE granularity = 'hour' AND bucket_start >= :since AND bucket_start < :until "
+            "GROUP BY 2, 3, 4 "
+            "ON CONFLICT ON CONSTRAINT uq_article_event_rollups_bucket "
+            "DO UPDATE SET count = EXCLUDED.count"
+        ), {'since': day_since, 'until': day_until}).rowcount
+        
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Event rollup failed: {str(e)}")
+        return {'success': False, 'error': str(e)}
+    
+    logger.info(f"Rolled up events since {hour_since}: {hours} hourly, {days} daily buckets")
+    return {'success': True, 'since': hour_since.isoformat(), 'hourly_buckets': hours, 'daily_buckets': days}
+
+def schedule_rollup(delay=None):
+    """Queue the next periodic rollup unless one is already waiting (database backend)"""
+    delay = delay if delay is not None else current_app.config.get('EVENT_ROLLUP_INTERVAL', 300)
+    return JobQueue.schedule_recurring('rollup_events', delay=delay)
+
+@task('rollup_events')
+def rollup_events_job(hours=None, reschedule=False):
+    """Job handler: keep partitions ahead of time, roll up recent events, prune old raw events"""
+    from app.services.background import task_scope
+    
+    with task_scope():
+        ensure_event_partitions()
+        since = datetime.utcnow() - timedelta(hours=hours) if hours else None
+        result = rollup_events(since=since)
+        drop_expired_event_partitions()
+        
+        if not result['success']:
+            raise RuntimeError(result['error'])
+        
+        if reschedule:
+            # This job still counts as running, so queue the next run directly
+            JobQueue.enqueue('rollup_events', {'reschedule': True},
+                             delay=current_app.config.get('EVENT_ROLLUP_INTERVAL', 300))
+        return result
+
+def time_series(granularity='day', periods=30, article_id=None, category=None):
+    """Event counts per bucket for one article or one category, read from the rollups"""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity {granularity}")
+    
+    step = GRANULARITIES[granularity]
+    end = _bucket_floor(datetime.utcnow(), granularity) + step
+    start = end - step * periods
+    
+    query = db.session.query(
+        ArticleEventRollup.bucket_start,
+        ArticleEventRollup.event_type,
+        func.sum(ArticleEventRollup.count)
+    ).filter(
+        ArticleEventRollup.granularity == granularity,
+        ArticleEventRollup.bucket_start >= start,
+        ArticleEventRollup.bucket_start < end
+    )
+    if article_id is not None:
+        query = query.filter(ArticleEventRollup.article_id == article_id)
+    if category is not None:
+        query = query.join(Article, Article.id == ArticleEventRollup.article_id).filter(Article.category == category)
+    
+    counts = {}
+    for bucket_start, event_type, count in query.group_by(
+        ArticleEventRollup.bucket_start, ArticleEventRollup.event_type
+    ):
+        counts[(bucket_start, event_type)] = int(count)
+    
+    # Daily sketches merge into distinct readers over the whole window
+    daily_uniques = None
+    totals = dict.fromkeys(EVENT_TYPES, 0)
+    if article_id is not None and granularity == 'day':
+        daily_uniques, totals['unique_visitors'] = unique_visitors(article_id, start.date(), end.date())
+    
+    series = []
+    for i in range(periods):
+        bucket = start + step * i
+        point = {'bucket': bucket.isoformat()}
+        for name, code in EVENT_TYPES.items():
+            point[name] = counts.get((bucket, code), 0)
+            totals[name] += point[name]
+        if daily_uniques is not None:
+            point['unique_visitors'] = daily_uniques.get(bucket.date(), 0)
+        series.append(point)
+    
+    return {
+        'granularity': granularity,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'series': series,
+        'totals': totals
+    }
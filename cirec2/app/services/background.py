@@ -1,112 +1,531 @@
-from celery import Celery
 from app.services.pdf_processor import PDFProcessor
 from app.services.embedding_service import EmbeddingService
+from app.services.job_queue import JobQueue, TASKS, task
+from app.services.invalidation import ARTICLE_PROCESSED, invalidation_bus
 from app.models import Article
 from app import db
+from flask import current_app, has_app_context
+from sqlalchemy import and_, or_, func, select, text
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+import multiprocessing
+import threading
 import logging
+import json
+import os
+import time
 
 logger = logging.getLogger(__name__)
 
-# Initialize Celery (for production use)
-# For development, we'll use direct execution
-USE_CELERY = False
+# Worker runtime: one Flask app (and so one engine/connection pool) per process,
+# shared by every background task that process runs
+_runtime_app = None
+_runtime_pid = None
+_runtime_lock = threading.Lock()
 
-if USE_CELERY:
-    celery = Celery('cirec_blog')
-    celery.config_from_object('app.config')
+def set_runtime_app(app):
+    """Use an already-built app for background tasks in this process"""
+    global _runtime_app, _runtime_pid
+    with _runtime_lock:
+        _runtime_app = app
+        _runtime_pid = os.getpid()
+
+def get_runtime_app():
+    """Return this process's background app, building it on first use"""
+    global _runtime_app, _runtime_pid
+    with _runtime_lock:
+        if _runtime_app is not None and _runtime_pid != os.getpid():
+            # Forked child: pooled connections belong to the parent
+            with _runtime_app.app_context():
+                db.engine.dispose(close=False)
+            _runtime_pid = os.getpid()
+        if _runtime_app is None:
+            if has_app_context():
+                _runtime_app = current_app._get_current_object()
+            else:
+                from app import create_app
+                _runtime_app = create_app()
+            _runtime_pid = os.getpid()
+        return _runtime_app
+
+@contextmanager
+def task_scope():
+    """Run one task in a fresh session on the process's long-lived app
+    
+    Pushing an app context is cheap; the app, engine, connection pool and the
+    loaded embedding model are all reused across tasks.
+    """
+    with get_runtime_app().app_context():
+        try:
+            yield db.session
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            db.session.remove()
+
+# Local worker pool for article ingestion when TASK_BACKEND is 'local'
+_ingest_executor = None
+_ingest_executor_lock = threading.Lock()
+
+def _get_ingest_executor():
+    global _ingest_executor
+    with _ingest_executor_lock:
+        if _ingest_executor is None:
+            workers = current_app.config.get('INGEST_WORKERS', 2) if has_app_context() else 2
+            _ingest_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ingest')
+        return _ingest_executor
+
+def submit_task(task_name, priority=0, **payload):
+    """Run a registered task in the background
+    
+    With TASK_BACKEND = 'database' the work is queued in the jobs table for
+    `flask worker` processes; otherwise it runs in this process's local pool.
+    """
+    if current_app.config.get('TASK_BACKEND') == 'database':
+        return JobQueue.enqueue(task_name, payload, priority=priority)
+    else:
+        set_runtime_app(current_app._get_current_object())
+        return _get_ingest_executor().submit(TASKS[task_name], **payload)
 
 def process_article_async(article_id):
     """Process article PDF and generate embeddings"""
-    if USE_CELERY:
-        return _process_article_task.delay(article_id)
-    else:
-        return _process_article_task(article_id)
+    return submit_task('process_article', priority=10, article_id=article_id)
 
-def _process_article_task(article_id):
-    """Background task to process article PDF and generate embeddings"""
+@task('process_article')
+def _process_article_job(article_id):
+    """Job queue handler; unexpected errors are raised so the queue retries with backoff
+    
+    A missing article or a PDF that cannot be extracted fails the same way
+    every time, so those finish the job (the article is marked failed).
+    """
+    return _process_article_task(article_id, raise_errors=True)
+
+def build_derivatives_async(article_id):
+    """Build an article's viewer derivatives in the background, behind article processing"""
+    return submit_task('build_pdf_derivatives', article_id=article_id)
+
+@task('build_pdf_derivatives')
+def _build_derivatives_job(article_id):
+    """Job queue handler for articles that skipped processing, such as bulk imports"""
+    with task_scope():
+        article = Article.query.get(article_id)
+        if not article or article.pdf_derivatives is not None:
+            return
+        result = build_pdf_derivatives(article)
+        if result['success']:
+            db.session.commit()
+
+@contextmanager
+def _timed_stage(timings, stage):
+    """Record the wall-clock seconds spent in an ingest stage"""
+    started = time.perf_counter()
     try:
-        # Get article from database
-        from app import create_app
-        app = create_app()
-        
-        with app.app_context():
+        yield
+    finally:
+        timings[stage] = round(time.perf_counter() - started, 3)
+
+def _process_article_task(article_id, raise_errors=False):
+    """Background task to process article PDF and generate embeddings
+    
+    Returns whether the article ended up ready. With raise_errors, errors
+    other than a missing article or a failed extraction (the database,
+    embedding model or filesystem going away) are re-raised after the
+    article is marked failed.
+    """
+    started = time.perf_counter()
+    
+    with task_scope():
+        timings = {'setup': round(time.perf_counter() - started, 3)}
+        try:
+            # Get article from database
             article = Article.query.get(article_id)
             if not article:
                 logger.error(f"Article {article_id} not found")
                 return False
             
             logger.info(f"Processing article: {article.title}")
+            article.processing_status = 'processing'
+            article.processing_error = None
+            db.session.commit()
             
             # Extract text from PDF if not already done
             if not article.full_text_content:
-                extraction_result = PDFProcessor.extract_text_from_pdf(article.pdf_path)
+                with _timed_stage(timings, 'extract'):
+                    extraction_result = PDFProcessor.extract_text_from_pdf(article.pdf_path)
                 
                 if extraction_result['success']:
                     article.full_text_content = extraction_result['full_text']
                     article.page_count = extraction_result['page_count']
                     
                     # Update preview content
-                    article.preview_content = PDFProcessor.generate_preview_content(
-                        extraction_result['full_text']
-                    )
+                    article.preview_content = extraction_result['preview_content']
                 else:
                     logger.error(f"Failed to extract text from {article.pdf_path}")
+                    article.processing_error = f"Text extraction failed: {extraction_result.get('error')}"
             
-            # Generate embeddings if not already done
-            if not article.title_embedding:
-                title_text = f"{article.title} {article.description}"
-                article.title_embedding = EmbeddingService.generate_embedding(title_text)
-                logger.info(f"Generated title embedding for article {article_id}")
+            # Compressed copy and page fragments so the viewer can show page one early
+            if current_app.config.get('PDF_BUILD_DERIVATIVES', True) and article.pdf_derivatives is None:
+                with _timed_stage(timings, 'derivatives'):
+                    build_pdf_derivatives(article)
             
-            if not article.content_embedding and article.full_text_content:
-                # Use first 2000 characters for content embedding
-                content_sample = article.full_text_content[:2000]
-                article.content_embedding = EmbeddingService.generate_embedding(content_sample)
-                logger.info(f"Generated content embedding for article {article_id}")
+            # Generate embeddings that are missing or stale
+            model_name = EmbeddingService.model_name()
+            stale_fields = [
+                field for field in ('title', 'content')
+                if article.embedding_state(field, model_name) != 'current'
+            ]
+            if stale_fields:
+                with _timed_stage(timings, 'embed'):
+                    EmbeddingService.embed_article(article, stale_fields)
+                logger.info(f"Generated {', '.join(stale_fields)} embeddings for article {article_id}")
             
             # Save changes
-            db.session.commit()
-            logger.info(f"Successfully processed article {article_id}")
-            
-            return True
+            with _timed_stage(timings, 'save'):
+                article.processing_status = 'failed' if article.processing_error else 'ready'
+                article.processing_timings = timings
+                invalidation_bus.publish(ARTICLE_PROCESSED, article_id, [article.category])
+                db.session.commit()
+            logger.info(f"Successfully processed article {article_id} in {timings}")
             
+            return article.processing_status == 'ready'
+        
+        except Exception as e:
+            logger.error(f"Error processing article {article_id}: {str(e)}")
+            db.session.rollback()
+            _mark_processing_failed(article_id, str(e), timings)
+            if raise_errors:
+                raise
+            return False
+
+def build_pdf_derivatives(article):
+    """Write an article's viewer derivatives and record them; failures leave the original in use"""
+    output_dir = os.path.join(current_app.config['PDF_STORAGE_ROOT'], 'derived', str(article.uuid))
+    result = PDFProcessor.build_derivatives(
+        article.pdf_path, output_dir, current_app.config.get('PDF_FRAGMENT_PAGES', 10)
+    )
+    if not result['success']:
+        logger.warning(f"Could not build PDF derivatives for article {article.id}: {result['error']}")
+        return result
+    
+    result.pop('success')
+    article.pdf_derivatives = result
+    logger.info(f"Built {len(result['fragments'])} page fragments for article {article.id}; "
+                f"compressed copy saved {result['bytes_saved']} bytes")
+    return dict(result, success=True)
+
+def _mark_processing_failed(article_id, error, timings):
+    try:
+        article = Article.query.get(article_id)
+        if article:
+            article.processing_status = 'failed'
+            article.processing_error = error
+            article.processing_timings = timings
+            db.session.commit()
     except Exception as e:
-        logger.error(f"Error processing article {article_id}: {str(e)}")
+        logger.error(f"Could not record failure for article {article_id}: {str(e)}")
         db.session.rollback()
-        return False
 
-def reprocess_all_embeddings():
-    """Reprocess embeddings for all articles (maintenance task)"""
-    from app import create_app
-    app = create_app()
+def reprocess_all_embeddings(batch_size=64, workers=1, restart=False):
+    """Reprocess embeddings for all published articles (maintenance task)
     
-    with app.app_context():
-        articles = Article.query.filter_by(is_published=True).all()
+    Streams only the columns needed for embedding, encodes them in batches
+    (optionally across a pool of worker processes), writes each batch back with
+    one bulk UPDATE and records a checkpoint so an interrupted run resumes
+    after the last committed article.
+    """
+    with task_scope():
+        model_name = EmbeddingService.model_name()
+        checkpoint_path = current_app.config['EMBEDDING_CHECKPOINT_FILE']
+        checkpoint = None if restart else _load_checkpoint(checkpoint_path, model_name)
+        last_id = checkpoint['last_id'] if checkpoint else 0
+        success_count = checkpoint['processed'] if checkpoint else 0
         
-        success_count = 0
-        total_count = len(articles)
+        total_count = Article.query.filter_by(is_published=True).count()
+        if last_id:
+            logger.info(f"Resuming embedding reprocessing after article {last_id}")
         
-        for article in articles:
-            try:
-                # Regenerate embeddings
-                title_text = f"{article.title} {article.description}"
-                article.title_embedding = EmbeddingService.generate_embedding(title_text)
-                
-                if article.full_text_content:
-                    content_sample = article.full_text_content[:2000]
-                    article.content_embedding = EmbeddingService.generate_embedding(content_sample)
-                
-                db.session.commit()
-                success_count += 1
-                logger.info(f"Reprocessed embeddings for article {article.id}")
+        rows = select(
+            Article.id,
+            Article.title_embedding_text,
+            Article.content_embedding_text
+        ).where(
+            Article.is_published == True,
+            Article.id > last_id
+        ).order_by(Article.id)
+        
+        pool = None
+        if workers > 1:
+            pool = multiprocessing.get_context('spawn').Pool(
+                workers, initializer=_init_encoder, initargs=(model_name,)
+            )
+        
+        try:
+            # Read on a dedicated connection so committing updates does not close the cursor
+            with db.engine.connect() as conn:
+                result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(rows)
+                batches = (
+                    (model_name, [tuple(row) for row in partition])
+                    for partition in result.partitions()
+                )
+                encoded = pool.imap(_encode_rows, batches) if pool else map(_encode_rows, batches)
                 
-            except Exception as e:
-                logger.error(f"Failed to reprocess article {article.id}: {str(e)}")
-                db.session.rollback()
+                for batch_last_id, mappings in encoded:
+                    try:
+                        _bulk_update_embeddings(mappings)
+                        db.session.commit()
+                    except Exception as e:
+                        logger.error(f"Failed to write embeddings up to article {batch_last_id}: {str(e)}")
+                        db.session.rollback()
+                        raise
+                    
+                    success_count += len(mappings)
+                    _save_checkpoint(checkpoint_path, model_name, batch_last_id, success_count)
+                    logger.info(f"Reprocessed embeddings up to article {batch_last_id} "
+                                f"({success_count}/{total_count})")
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
         
+        _clear_checkpoint(checkpoint_path)
         logger.info(f"Reprocessing complete: {success_count}/{total_count} articles processed")
         return success_count, total_count
 
-# Celery task decorators (if using Celery)
-if USE_CELERY:
-    _process_article_task = celery.task(_process_article_task)
\ No newline at end of file
+# Per-process model used by reprocessing worker pools
+_encoder = None
+
+def _init_encoder(model_name):
+    """Pool initializer: load the embedding model once per worker process"""
+    global _encoder
+    from sentence_transformers import SentenceTransformer
+    _encoder = SentenceTransformer(model_name)
+
+def _encode_rows(payload):
+    """Encode a batch of (id, title text, content text) rows into UPDATE mappings"""
+    model_name, rows = payload
+    
+    title_texts = [title_text for _, title_text, _ in rows]
+    content_texts = [content_text for _, _, content_text in rows]
+    content_indexes = [i for i, sample in enumerate(content_texts) if sample.strip()]
+    texts = title_texts + [content_texts[i] for i in content_indexes]
+    
+    if _encoder is not None:
+        cleaned = [EmbeddingService.preprocess_text(t) for t in texts]
+        vectors = [vector.tolist() for vector in _encoder.encode(cleaned)]
+    else:
+        vectors = EmbeddingService.generate_embeddings_batch(texts)
+    
+    title_vectors = vectors[:len(rows)]
+    content_vectors = dict(zip(content_indexes, vectors[len(rows):]))
+    
+    mappings = []
+    for i, (article_id, _, _) in enumerate(rows):
+        if title_vectors[i] is None:
+            logger.error(f"Failed to reprocess article {article_id}: no embedding generated")
+            continue
+        
+        content_vector = content_vectors.get(i)
+        mappings.append({
+            'id': article_id,
+            'title_embedding': str(title_vectors[i]),
+            'title_embedding_model': model_name,
+            'title_embedding_hash': Article.embedding_input_hash(title_texts[i]),
+            'content_embedding': str(content_vector) if content_vector is not None else None,
+            'content_embedding_model': model_name if content_vector is not None else None,
+            'content_embedding_hash': (
+                Article.embedding_input_hash(content_texts[i]) if content_vector is not None else None
+            )
+        })
+    
+    return rows[-1][0], mappings
+
+_EMBEDDING_COLUMNS = (
+    'title_embedding', 'title_embedding_model', 'title_embedding_hash',
+    'content_embedding', 'content_embedding_model', 'content_embedding_hash'
+)
+
+def _bulk_update_embeddings(mappings):
+    """Write a batch of embeddings with a single UPDATE ... FROM (VALUES ...) statement"""
+    if not mappings:
+        return
+    
+    values = []
+    params = {}
+    for i, mapping in enumerate(mappings):
+        values.append(
+            f"(:id_{i}, CAST(:title_embedding_{i} AS vector), :title_embedding_model_{i}, "
+            f":title_embedding_hash_{i}, CAST(:content_embedding_{i} AS vector), "
+            f":content_embedding_model_{i}, :content_embedding_hash_{i})"
+        )
+        params[f'id_{i}'] = mapping['id']
+        for column in _EMBEDDING_COLUMNS:
+            params[f'{column}_{i}'] = mapping[column]
+    
+    assignments = ', '.join(f"{column} = v.{column}" for column in _EMBEDDING_COLUMNS)
+    db.session.execute(text(
+        f"UPDATE articles SET {assignments} "
+        f"FROM (VALUES {', '.join(values)}) AS v(id, {', '.join(_EMBEDDING_COLUMNS)}) "
+        f"WHERE articles.id = v.id"
+    ), params)
+
+def _load_checkpoint(path, model_name):
+    """Return the saved checkpoint if it belongs to the same model"""
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    if checkpoint.get('model') != model_name:
+        logger.info("Ignoring embedding checkpoint written for another model")
+        return None
+    return checkpoint
+
+def _save_checkpoint(path, model_name, last_id, processed):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            'model': model_name,
+            'last_id': last_id,
+            'processed': processed,
+            'updated_at': datetime.utcnow().isoformat()
+        }, f)
+    os.replace(tmp_path, path)
+
+def _clear_checkpoint(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+def _sql_input_hash(text):
+    """Article.embedding_input_hash computed by Postgres"""
+    return func.encode(func.sha256(func.convert_to(text, 'UTF8')), 'hex')
+
+def stale_embedding_filter(model_name):
+    """SQL condition matching articles with any embedding that is not 'current'
+    
+    Mirrors Article.embedding_state: missing vectors, vectors from another
+    model or of unknown provenance, and vectors whose recorded input hash
+    (possibly NULL) differs from the hash of the article's text today.
+    """
+    has_content = and_(
+        Article.full_text_content.isnot(None),
+        Article.full_text_content != ''
+    )
+    return or_(
+        Article.title_embedding.is_(None),
+        Article.title_embedding_model.is_distinct_from(model_name),
+        Article.title_embedding_hash.is_distinct_from(_sql_input_hash(Article.title_embedding_text)),
+        and_(has_content, Article.content_embedding.is_(None)),
+        and_(has_content, Article.content_embedding_model.is_distinct_from(model_name)),
+        and_(has_content, Article.content_embedding_hash.is_distinct_from(_sql_input_hash(Article.content_embedding_text)))
+    )
+
+def count_stale_embeddings():
+    """Number of articles that need re-embedding with the configured model"""
+    return Article.query.filter(stale_embedding_filter(EmbeddingService.model_name())).count()
+
+class EmbeddingMigrator:
+    """Throttled re-embedding of stale articles while the site stays up
+    
+    Walks stale rows in id order, re-embeds one batch at a time, commits it and
+    sleeps before the next batch so search traffic keeps the database and CPU.
+    """
+    
+    def __init__(self, app, batch_size=None, pause=None):
+        self.app = app
+        self.batch_size = batch_size or app.config.get('EMBEDDING_MIGRATION_BATCH_SIZE', 32)
+        self.pause = app.config.get('EMBEDDING_MIGRATION_PAUSE', 1.0) if pause is None else pause
+        self._thread = None
+        self._stop = threading.Event()
+        self.progress = {
+            'running': False,
+            'model': None,
+            'total': 0,
+            'processed': 0,
+            'failed': 0,
+            'started_at': None,
+            'finished_at': None
+        }
+    
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self):
+        """Run the migration in a daemon thread"""
+        if self.is_running:
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name='embedding-migrator', daemon=True)
+        self._thread.start()
+        return True
+    
+    def stop(self):
+        self._stop.set()
+    
+    def run(self):
+        """Re-embed all stale articles, one batch at a time"""
+        with self.app.app_context():
+            model_name = EmbeddingService.model_name()
+            stale = stale_embedding_filter(model_name)
+            
+            self.progress.update({
+                'running': True,
+                'model': model_name,
+                'total': Article.query.filter(stale).count(),
+                'processed': 0,
+                'failed': 0,
+                'started_at': datetime.utcnow().isoformat(),
+                'finished_at': None
+            })
+            logger.info(f"Embedding migration to {model_name}: {self.progress['total']} stale articles")
+            
+            last_id = 0
+            try:
+                while not self._stop.is_set():
+                    batch = Article.query.filter(stale, Article.id > last_id)\
+                        .order_by(Article.id)\
+                        .limit(self.batch_size).all()
+                    if not batch:
+                        break
+                    last_id = batch[-1].id
+                    
+                    try:
+                        EmbeddingService.embed_articles(batch)
+                        db.session.commit()
+                        self.progress['processed'] += len(batch)
+                    except Exception as e:
+                        logger.error(f"Embedding migration batch ending at article {last_id} failed: {str(e)}")
+                        db.session.rollback()
+                        self.progress['failed'] += len(batch)
+                    
+                    logger.info(
+                        f"Embedding migration progress: {self.progress['processed']}/{self.progress['total']}"
+                    )
+                    self._stop.wait(self.pause)
+            finally:
+                db.session.remove()
+                self.progress['running'] = False
+                self.progress['finished_at'] = datetime.utcnow().isoformat()
+        
+        return self.progress
+
+_embedding_migrator = None
+
+def start_embedding_migration(app, batch_size=None, pause=None):
+    """Start the background embedding migrator unless one is already running"""
+    global _embedding_migrator
+    if _embedding_migrator is not None and _embedding_migrator.is_running:
+        return _embedding_migrator
+    _embedding_migrator = EmbeddingMigrator(app, batch_size, pause)
+    _embedding_migrator.start()
+    return _embedding_migrator
+
+def get_embedding_migration_status():
+    """Progress of the current or last embedding migration in this process"""
+    if _embedding_migrator is None:
+        return None
+    return dict(_embedding_migrator.progress)
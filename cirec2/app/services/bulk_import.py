@@ -0,0 +1,272 @@
+from concurrent.futures import FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from sqlalchemy import insert
+from flask import current_app
+from app.services.pdf_processor import PDFProcessor, _get_extraction_pool
+from app.services.embedding_service import EmbeddingService
+from app.services.background import build_derivatives_async
+from app.services.job_queue import task
+from app.services.invalidation import ARTICLES_IMPORTED, invalidation_bus
+from app.models import Article
+from app import db
+import zipfile
+import logging
+import json
+import time
+import uuid
+import csv
+import io
+import os
+
+logger = logging.getLogger(__name__)
+
+SIDECAR_FILENAME = 'metadata.csv'
+SIDECAR_FIELDS = ('title', 'description', 'author', 'category', 'tags', 'is_published', 'is_featured')
+
+def _analyze_for_import(pdf_path, cache_dir):
+    """Pool worker: single-pass parse of one stored PDF"""
+    return PDFProcessor.analyze_pdf(pdf_path, parallel=False, cache_dir=cache_dir)
+
+def _truthy(value):
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y', 'on')
+
+class BulkImporter:
+    """Import a directory or zip archive of PDFs as articles
+    
+    Files are streamed into storage, parsed in the shared extraction pool,
+    embedded in batches and inserted with one multi-row INSERT per batch.
+    Metadata comes from a metadata.csv sidecar (keyed by filename), then the
+    PDF's /Title and /Author, then the defaults passed in.
+    """
+    
+    def __init__(self, created_by, defaults=None, publish=False, workers=None, batch_size=32):
+        self.created_by = created_by
+        self.defaults = defaults or {}
+        self.publish = publish
+        self.workers = workers or current_app.config.get('PDF_EXTRACTION_WORKERS', 2)
+        self.batch_size = batch_size
+        self.upload_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'pdfs')
+        self.cache_dir = current_app.config.get('PDF_ANALYSIS_CACHE_DIR')
+        self.results = []
+    
+    def import_path(self, source):
+        """Import every PDF under a directory or inside a zip; returns the report"""
+        started = time.perf_counter()
+        
+        if zipfile.is_zipfile(source):
+            with zipfile.ZipFile(source) as archive:
+                sidecar = self._read_zip_sidecar(archive)
+                self._run(self._iter_zip(archive), sidecar)
+        else:
+            sidecar = self._read_sidecar_file(os.path.join(source, SIDECAR_FILENAME))
+            self._run(self._iter_directory(source), sidecar)
+        
+        return self.report(time.perf_counter() - started)
+    
+    def report(self, elapsed):
+        imported = sum(1 for r in self.results if r['status'] == 'imported')
+        return {
+            'finished_at': datetime.utcnow().isoformat(),
+            'total': len(self.results),
+            'imported': imported,
+            'failed': len(self.results) - imported,
+            'elapsed_seconds': round(elapsed, 2),
+            'documents_per_minute': round(imported / elapsed * 60, 1) if elapsed else 0.0,
+            'files': self.results
+        }
+    
+    def _iter_directory(self, source):
+        """Yield (original name, stored file info) for each PDF in a directory tree"""
+        for root, _, filenames in os.walk(source):
+            for filename in sorted(filenames):
+                if not filename.lower().endswith('.pdf'):
+                    continue
+                with open(os.path.join(root, filename), 'rb') as stream:
+                    yield filename, PDFProcessor.store_pdf_stream(stream, filename, self.upload_folder)
+    
+    def _iter_zip(self, archive):
+        """Yield (original name, stored file info), streaming each member into storage"""
+        for member in archive.infolist():
+            if member.is_dir() or not member.filename.lower().endswith('.pdf'):
+                continue
+            filename = os.path.basename(member.filename)
+            with archive.open(member) as stream:
+                yield filename, PDFProcessor.store_pdf_stream(stream, filename, self.upload_folder)
+    
+    @staticmethod
+    def _read_sidecar_file(path):
+        if not os.path.exists(path):
+            return {}
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            return BulkImporter._parse_sidecar(f)
+    
+    @staticmethod
+    def _read_zip_sidecar(archive):
+        for name in archive.namelist():
+            if os.path.basename(name).lower() == SIDECAR_FILENAME:
+                with archive.open(name) as raw:
+                    return BulkImporter._parse_sidecar(io.TextIOWrapper(raw, encoding='utf-8-sig', newline=''))
+        return {}
+    
+    @staticmethod
+    def _parse_sidecar(f):
+        return {
+            os.path.basename(row['filename']).strip(): row
+            for row in csv.DictReader(f)
+            if row.get('filename')
+        }
+    
+    def _run(self, files, sidecar):
+        """Keep the extraction pool busy while embedding and inserting finished files in batches"""
+        in_flight = {}
+        ready = []
+        
+        def submit(filename, stored, retried=False):
+            # Looked up each time: a timed-out extraction replaces the shared pool
+            future = _get_extraction_pool(self.workers).submit(_analyze_for_import, stored['filepath'], self.cache_dir)
+            in_flight[future] = (filename, stored, retried)
+        
+        def collect(done):
+            for future in done:
+                filename, stored, retried = in_flight.pop(future)
+                try:
+                    analysis = future.result()
+                except BrokenProcessPool as e:
+                    if not retried:
+                        submit(filename, stored, retried=True)
+                        continue
+                    analysis = {'success': False, 'error': str(e)}
+                except Exception as e:
+                    analysis = {'success': False, 'error': str(e)}
+                ready.append(self._prepare(filename, stored, analysis, sidecar.get(filename, {})))
+            while len(ready) >= self.batch_size:
+                self._insert_batch(ready[:self.batch_size])
+                del ready[:self.batch_size]
+        
+        for filename, stored in files:
+            submit(filename, stored)
+            if len(in_flight) >= self.workers * 2:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+        
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            collect(done)
+        if ready:
+            self._insert_batch(ready)
+    
+    def _prepare(self, filename, stored, analysis, row):
+        """Build the article for one file, or a failure entry"""
+        result = {'file': filename, 'stored_as': stored['filename'], 'status': 'failed',
+                  'article_id': None, 'pages': analysis.get('page_count'), 'error': None}
+        
+        if not analysis.get('success'):
+            result['error'] = f"Extraction failed: {analysis.get('error')}"
+            return result, None
+        
+        info = analysis.get('metadata') or {}
+        fields = {key: (row.get(key) or '').strip() for key in SIDECAR_FIELDS}
+        title = fields['title'] or info.get('title') or os.path.splitext(filename)[0].replace('_', ' ')
+        category = fields['category'] or self.defaults.get('category')
+        if not category:
+            result['error'] = 'No category in metadata.csv and no default category given'
+            return result, None
+        
+        is_published = _truthy(fields['is_published']) if fields['is_published'] else self.publish
+        now = datetime.utcnow()
+        article = Article(
+            title=title[:255],
+            description=fields['description'] or info.get('subject') or analysis['preview_content'][:500] or title,
+            author=(fields['author'] or info.get('author') or self.defaults.get('author') or 'Unknown')[:120],
+            category=category,
+            tags=fields['tags'] or self.defaults.get('tags', ''),
+            pdf_filename=stored['filename'],
+            pdf_path=stored['filepath'],
+            pdf_size=stored['filesize'],
+            full_text_content=analysis['full_text'],
+            preview_content=analysis['preview_content'] or title,
+            page_count=analysis['page_count'],
+            processing_status='ready',
+            is_published=is_published,
+            is_featured=_truthy(fields['is_featured']),
+            view_count=0,
+            download_count=0,
+            unique_view_count=0,
+            trending_score=0.0,
+            created_by=self.created_by,
+            published_at=now if is_published else None,
+            # Set explicitly: every row of a multi-row INSERT needs the same columns
+            uuid=uuid.uuid4(),
+            created_at=now,
+            updated_at=now
+        )
+        return result, article
+    
+    def _insert_batch(self, prepared):
+        """Batch-embed the prepared articles and insert them with one multi-row INSERT"""
+        articles = [article for _, article in prepared if article is not None]
+        for result, article in prepared:
+            self.results.append(result)
+        if not articles:
+            return
+        
+        try:
+            EmbeddingService.embed_articles(articles)
+            
+            # pdf_derivatives is left out so it is stored as SQL NULL; a None here would be written as JSON 'null'
+            columns = [column for column in Article.__table__.columns if column.key not in ('id', 'pdf_derivatives')]
+            rows = [
+                {column.key: getattr(article, column.key) for column in columns}
+                for article in articles
+            ]
+            inserted = db.session.execute(
+                insert(Article.__table__).values(rows).returning(
+                    Article.__table__.c.id, Article.__table__.c.pdf_filename
+                )
+            ).all()
+            invalidation_bus.publish(
+                ARTICLES_IMPORTED, categories=[article.category for article in articles if article.is_published], listings=True
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Bulk import batch failed: {str(e)}")
+            for result, article in prepared:
+                if article is not None:
+                    result['error'] = str(e)
+            return
+        
+        ids = {pdf_filename: article_id for article_id, pdf_filename in inserted}
+        for result, article in prepared:
+            if article is not None:
+                result['status'] = 'imported'
+                result['article_id'] = ids.get(article.pdf_filename)
+        
+        # Imports skip article processing, which is where derivatives are normally built
+        if current_app.config.get('PDF_BUILD_DERIVATIVES', True):
+            for article_id in ids.values():
+                build_derivatives_async(article_id)
+
+def save_report(report, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, path)
+
+@task('bulk_import')
+def run_bulk_import(source, created_by, report_path, defaults=None, publish=False):
+    """Background task: import a staged directory or zip and write the report next to it"""
+    from app.services.background import task_scope
+    
+    with task_scope():
+        save_report({'status': 'running', 'files': []}, report_path)
+        try:
+            report = BulkImporter(created_by, defaults=defaults, publish=publish).import_path(source)
+            report['status'] = 'done'
+        except Exception as e:
+            logger.error(f"Bulk import of {source} failed: {str(e)}")
+            report = {'status': 'failed', 'error': str(e), 'files': []}
+        save_report(report, report_path)
+        return report
@@ -0,0 +1,461 @@
+from collections import OrderedDict, defaultdict
+from functools import wraps
+from flask import current_app, make_response, request
+from flask_login import current_user
+from werkzeug.wrappers import Response
+from app.services.single_flight import SingleFlight, cross_process_lock
+import hashlib
+import threading
+import logging
+import pickle
+import struct
+import json
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+# Layout of the entry header; part of every key, so a change never reads old entries
+ENTRY_FORMAT = 2
+
+# Headers that belong to one client and must never be replayed to another
+UNCACHEABLE_HEADERS = ('Set-Cookie',)
+
+def serialize_response(response, **extra):
+    """Status, headers and body of a complete response as bytes; extra is kept alongside"""
+    meta = dict(extra, status=response.status_code, headers=list(response.headers))
+    header = json.dumps(meta).encode('utf-8')
+    return struct.pack('>I', len(header)) + header + response.get_data()
+
+def deserialize_response(data):
+    """(Response, extra) from serialize_response() output"""
+    (length,) = struct.unpack_from('>I', data)
+    meta = json.loads(data[4:4 + length])
+    response = Response(data[4 + length:], status=meta.pop('status'), headers=meta.pop('headers'))
+    return response, meta
+
+def is_cacheable(response):
+    if response.status_code != 200 or response.direct_passthrough or response.is_streamed:
+        return False
+    return not any(name in response.headers for name in UNCACHEABLE_HEADERS)
+
+class MemoryBackend:
+    """Per-process LRU over bytes values, bounded by their total size
+    
+    Counters are kept up to max_counters, least recently bumped dropped
+    first. A dropped counter's value becomes the floor that unknown names
+    read as, so no counter ever reads lower than its last bump: entries it
+    invalidated stay misses, and at worst a few others miss once too.
+    """
+    
+    def __init__(self, max_bytes, max_counters=100000):
+        self.max_bytes = max_bytes
+        self.max_counters = max_counters
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._counters = OrderedDict()  # name -> version, least recently bumped first
+        self._counter_floor = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+    
+    def set(self, key, value, ttl):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time() + ttl, value)
+            self._bytes += len(key) + len(value)
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+    
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+    
+    def _remove(self, key):
+        _, value = self._entries.pop(key)
+        self._bytes -= len(key) + len(value)
+    
+    def get_counter(self, name):
+        return self._counters.get(name, self._counter_floor)
+    
+    def bump_counter(self, name):
+        # Nanosecond timestamps rather than +1, so concurrent bumps never collide
+        with self._lock:
+            self._counters.pop(name, None)
+            self._counters[name] = max(time.time_ns(), self._counter_floor + 1)
+            while len(self._counters) > self.max_counters:
+                _, version = self._counters.popitem(last=False)
+                self._counter_floor = max(self._counter_floor, version)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def stats(self):
+        return {'backend': 'memory', 'entries': len(self._entries), 'bytes': self._bytes,
+                'max_bytes': self.max_bytes, 'evictions': self.evictions}
+
+class FileSystemBackend:
+    """Values as files, shared by every worker on the host
+    
+    Each file starts with its expiry time; reads bump the mtime, so pruning
+    the oldest mtimes first approximates LRU. The directory is only scanned
+    after roughly a tenth of the budget has been written, which keeps
+    eviction amortised instead of a scan per insert. Counters (key versions)
+    live in a separate directory that is never pruned.
+    """
+    
+    HEADER = struct.Struct('>d')
+    
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries_dir = os.path.join(directory, 'entries')
+        self._counters_dir = os.path.join(directory, 'counters')
+        os.makedirs(self._entries_dir, exist_ok=True)
+        os.makedirs(self._counters_dir, exist_ok=True)
+        self._written = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+    
+    @staticmethod
+    def _filename(key):
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+    
+    def get(self, key):
+        path = os.path.join(self._entries_dir, self._filename(key))
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            (expires_at,) = self.HEADER.unpack_from(data)
+        except struct.error:
+            # Too short for the header (e.g. a crash or a full disk left it); a miss
+            self.delete(key)
+            return None
+        if expires_at < time.time():
+            self.delete(key)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data[self.HEADER.size:]
+    
+    def set(self, key, value, ttl):
+        path = os.path.join(self._entries_dir, self._filename(key))
+        self._write(path, self.HEADER.pack(time.time() + ttl) + value)
+        with self._lock:
+            self._written += len(value)
+            due = self._written > self.max_bytes // 10
+            if due:
+                self._written = 0
+        if due:
+            self.prune()
+    
+    def delete(self, key):
+        try:
+            os.remove(os.path.join(self._entries_dir, self._filename(key)))
+        except OSError:
+            pass
+    
+    def prune(self):
+        """Drop the least recently used files until under 90% of the budget (expired ones go on read)"""
+        files = []
+        total = 0
+        with os.scandir(self._entries_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.tmp'):
+                    continue  # Being written by another worker
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        files.sort()
+        target = self.max_bytes * 0.9
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+    
+    def get_counter(self, name):
+        try:
+            with open(os.path.join(self._counters_dir, self._filename(name)), 'rb') as f:
+                return int(f.read() or 0)
+        except (OSError, ValueError):
+            return 0
+    
+    def bump_counter(self, name):
+        self._write(os.path.join(self._counters_dir, self._filename(name)), str(time.time_ns()).encode('ascii'))
+    
+    @staticmethod
+    def _write(path, data):
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    
+    def clear(self):
+        with os.scandir(self._entries_dir) as entries:
+            for entry in entries:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+    
+    def stats(self):
+        sizes = [entry.stat().st_size for entry in os.scandir(self._entries_dir)]
+        return {'backend': 'filesystem', 'directory': self.directory, 'entries': len(sizes),
+                'bytes': sum(sizes), 'max_bytes': self.max_bytes, 'evictions': self.evictions}
+
+class SharedMemoryBackend(FileSystemBackend):
+    """FileSystemBackend on tmpfs (/dev/shm): shared between workers, never touches disk"""
+    
+    def stats(self):
+        return dict(super().stats(), backend='shm')
+
+BACKENDS = {
+    'memory': MemoryBackend,
+    'filesystem': FileSystemBackend,
+    'shm': SharedMemoryBackend
+}
+
+class Cache:
+    """Named cache on the configured backend, with versioned keys and hit/miss metrics
+    
+    Every key is prefixed with CACHE_KEY_VERSION (bump it to drop everything
+    on deploy) and the cache name. Tags are version counters kept outside the
+    LRU: an entry stored with set(..., tags=...) is a miss once any of its
+    tags has been bumped, so invalidating a tag is O(1) however many entries
+    carry it, and with a shared backend it reaches every worker.
+    """
+    
+    def __init__(self, name, max_bytes_setting='CACHE_MAX_BYTES', ttl_setting='CACHE_DEFAULT_TTL'):
+        self.name = name
+        self.max_bytes_setting = max_bytes_setting
+        self.ttl_setting = ttl_setting
+        self.metrics = defaultdict(lambda: {'hits': 0, 'stale': 0, 'misses': 0, 'stores': 0, 'discarded': 0})
+        self.flight = SingleFlight()
+        self._backend = None
+        self._backend_pid = None
+        self._lock = threading.Lock()
+    
+    @property
+    def backend(self):
+        # Built on first use in each process, from the app config
+        if self._backend is None or self._backend_pid != os.getpid():
+            with self._lock:
+                if self._backend is None or self._backend_pid != os.getpid():
+                    self._backend = self._create_backend()
+                    self._backend_pid = os.getpid()
+        return self._backend
+    
+    def _create_backend(self):
+        config = current_app.config
+        kind = config.get('CACHE_BACKEND', 'memory')
+        max_bytes = config.get(self.max_bytes_setting) or config.get('CACHE_MAX_BYTES', 64 * 1024 * 1024)
+        if kind not in BACKENDS:
+            logger.warning(f"Unknown CACHE_BACKEND {kind!r}; using memory")
+            kind = 'memory'
+        if kind == 'memory':
+            return MemoryBackend(max_bytes, config.get('CACHE_MAX_COUNTERS', 100000))
+        root = config.get('CACHE_SHM_DIR') if kind == 'shm' else config.get('CACHE_DIR')
+        return BACKENDS[kind](os.path.join(root, self.name), max_bytes)
+    
+    @property
+    def shared(self):
+        """Whether every worker on the host sees the same entries and tags"""
+        return not isinstance(self.backend, MemoryBackend)
+    
+    def _key(self, key):
+        return f"{current_app.config.get('CACHE_KEY_VERSION', 1)}.{ENTRY_FORMAT}:{self.name}:{key}"
+    
+    def lookup(self, key, label=None):
+        """(bytes, fresh) for key, or (None, False) on a miss
+        
+        An entry stored with stale_ttl stays readable for that long after its
+        ttl, flagged as not fresh; an invalidated tag makes it a plain miss,
+        since a purge means its content is wrong, not just old.
+        """
+        data = self.backend.get(self._key(key))
+        fresh = False
+        if data is not None:
+            entry = self._unpack(data)
+            if entry is None:
+                logger.warning(f"Dropping unreadable {self.name} cache entry {key!r}")
+                self.backend.delete(self._key(key))
+                data = None
+            elif any(self.backend.get_counter(f'tag:{tag}') != version for tag, version in entry[0].items()):
+                data = None
+            else:
+                _, fresh_until, data = entry
+                fresh = fresh_until >= time.time()
+        if label is not False:
+            outcome = 'misses' if data is None else 'hits' if fresh else 'stale'
+            self.metrics[label or self.name][outcome] += 1
+        return data, fresh
+    
+    @staticmethod
+    def _unpack(data):
+        """(tags, fresh_until, value) of a stored entry, or None if it cannot be read"""
+        try:
+            (length,) = struct.unpack_from('>I', data)
+            header = json.loads(data[4:4 + length])
+            return header['tags'], header['fresh_until'], data[4 + length:]
+        except (struct.error, ValueError, KeyError, TypeError):
+            return None
+    
+    def get(self, key, label=None):
+        """Cached bytes for key while fresh, or None; a hit or miss is counted under label"""
+        data, fresh = self.lookup(key, label)
+        return data if fresh else None
+    
+    def set(self, key, value, ttl=None, tags=(), label=None, stale_ttl=0, computed_at=None):
+        """Store bytes for key; it expires after ttl seconds or when any tag is invalidated
+        
+        With stale_ttl it is kept that much longer for lookup() and
+        get_or_compute() to serve while a fresh copy is computed. Pass
+        computed_at (time.time_ns() from before the value was read from the
+        database): if a tag was invalidated since, the value may predate that
+        change, so it is not stored and False is returned.
+        """
+        ttl = ttl or current_app.config.get(self.ttl_setting) or current_app.config.get('CACHE_DEFAULT_TTL', 300)
+        versions = {tag: self.backend.get_counter(f'tag:{tag}') for tag in tags}
+        if computed_at is not None and any(version > computed_at for version in versions.values()):
+            self.metrics[label or self.name]['discarded'] += 1
+            return False
+        header = json.dumps({'tags': versions, 'fresh_until': time.time() + ttl}).encode('utf-8')
+        self.backend.set(self._key(key), struct.pack('>I', len(header)) + header + value, ttl + stale_ttl)
+        self.metrics[label or self.name]['stores'] += 1
+        return True
+    
+    def get_or_compute(self, key, compute, ttl=None, tags=(), label=None, stale_ttl=None):
+        """Cached bytes for key, calling compute() at most once at a time to refill it
+        
+        Concurrent misses in this process share one call (single flight), and
+        with SINGLE_FLIGHT_LOCK the leader also holds a lock that other
+        workers wait on, then finds their stored result instead of computing
+        it again. A stale entry (stale_ttl, default CACHE_STALE_TTL) is
+        returned straight away to everyone except the one caller refreshing
+        it. tags may be a callable, evaluated after compute(); a None result
+        is returned but not stored.
+        """
+        if stale_ttl is None:
+            stale_ttl = current_app.config.get('CACHE_STALE_TTL', 0)
+        data, fresh = self.lookup(key, label)
+        if fresh or (data is not None and self.flight.in_flight(key)):
+            return data
+        
+        def refill():
+            with self.lock(key):
+                # Another worker may have refilled it while we waited for the lock
+                data, fresh = self.lookup(key, label=False)
+                if fresh:
+                    return data
+                computed_at = time.time_ns()
+                data = compute()
+                if data is not None:
+                    self.set(key, data, ttl, tags() if callable(tags) else tags, label, stale_ttl, computed_at)
+                return data
+        
+        data, _ = self.flight.do(key, refill, current_app.config.get('SINGLE_FLIGHT_TIMEOUT', 30))
+        return data
+    
+    def lock(self, key):
+        """Cross-process lock for computing key (see single_flight.cross_process_lock)"""
+        return cross_process_lock(self._key(key))
+    
+    def delete(self, key):
+        self.backend.delete(self._key(key))
+    
+    def invalidate(self, *tags):
+        """Make every entry carrying any of the tags a miss"""
+        for tag in tags:
+            self.backend.bump_counter(f'tag:{tag}')
+    
+    def get_object(self, key, label=None):
+        data = self.get(key, label)
+        return pickle.loads(data) if data is not None else None
+    
+    def set_object(self, key, value, ttl=None, tags=(), label=None, stale_ttl=0, computed_at=None):
+        return self.set(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ttl, tags, label, stale_ttl, computed_at)
+    
+    def get_or_compute_object(self, key, compute, ttl=None, tags=(), label=None, stale_ttl=None):
+        """get_or_compute() for any picklable value"""
+        def compute_bytes():
+            value = compute()
+            return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL) if value is not None else None
+        
+        data = self.get_or_compute(key, compute_bytes, ttl, tags, label, stale_ttl)
+        return pickle.loads(data) if data is not None else None
+    
+    def clear(self):
+        self.backend.clear()
+    
+    def stats(self):
+        return dict(self.backend.stats(), name=self.name, routes={label: dict(counts) for label, counts in self.metrics.items()})
+
+# Every named cache, for the admin stats endpoint
+_caches = {}
+
+def get_cache(name, **kwargs):
+    if name not in _caches:
+        _caches[name] = Cache(name, **kwargs)
+    return _caches[name]
+
+def cache_stats():
+    return {name: cache.stats() for name, cache in _caches.items()}
+
+def cache_response(duration=300, tags=()):
+    """Cache a view's complete response for anonymous visitors
+    
+    The key is the endpoint, view arguments, query string and role; the
+    response is stored serialized, so any backend can hold it.
+    """
+    def decorator(f):
+        responses = get_cache('responses')
+        
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method != 'GET' or current_user.is_authenticated:
+                return f(*args, **kwargs)
+            
+            key = f"{request.endpoint}:{sorted(kwargs.items())!r}:{request.query_string.decode('latin-1')}:anonymous"
+            data = responses.get(key, label=request.endpoint)
+            if data is not None:
+                response, _ = deserialize_response(data)
+                return response.make_conditional(request.environ)
+            
+            computed_at = time.time_ns()
+            response = make_response(f(*args, **kwargs))
+            if is_cacheable(response):
+                responses.set(key, serialize_response(response), duration, tags, label=request.endpoint,
+                              computed_at=computed_at)
+            return response
+        return decorated_function
+    return decorator
@@ -0,0 +1,114 @@
+from collections import namedtuple
+from flask import abort, current_app
+from app.models import Category
+from app.services.invalidation import CATEGORY_CREATED, COUNTS_RECONCILED, invalidation_bus
+import threading
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Detached, read-only copy of a categories row; templates use it like the model
+CategoryEntry = namedtuple('CategoryEntry', 'id name slug description is_active article_count created_at')
+
+class CategoryCache:
+    """Every category, loaded once per process and shared by all requests
+    
+    Navigation, filters, dropdowns and slug lookups read the same snapshot
+    instead of querying categories on each request. invalidate() bumps the
+    version and the next read reloads; the invalidation bus calls it in
+    every worker when a category is added or articles enter or leave
+    listings (which changes the counts), and CATEGORY_CACHE_TTL bounds how
+    long a missed event can leave a worker stale.
+    """
+    
+    _version = 0
+    _snapshot = None  # (version, loaded_at, all entries by name, active entries, active by slug)
+    _lock = threading.Lock()
+    # Listing versions: stamp of the last change event per category, floored by the epoch
+    _listing_stamps = {}
+    _epoch = time.time_ns()
+    
+    @classmethod
+    def _current(cls):
+        snapshot = cls._snapshot
+        ttl = current_app.config.get('CATEGORY_CACHE_TTL', 300)
+        if snapshot is not None and snapshot[0] == cls._version and snapshot[1] > time.time() - ttl:
+            return snapshot
+        with cls._lock:
+            snapshot = cls._snapshot
+            if snapshot is not None and snapshot[0] == cls._version and snapshot[1] > time.time() - ttl:
+                return snapshot
+            # Tagged with the version from before the query, so an invalidation during it forces another load
+            version = cls._version
+            entries = tuple(
+                CategoryEntry(*row) for row in Category.query.with_entities(
+                    Category.id, Category.name, Category.slug, Category.description,
+                    Category.is_active, Category.article_count, Category.created_at
+                ).order_by(Category.name)
+            )
+            active = tuple(entry for entry in entries if entry.is_active)
+            cls._snapshot = (version, time.time(), entries, active, {entry.slug: entry for entry in active})
+            logger.debug(f"Loaded {len(entries)} categories (version {version})")
+            return cls._snapshot
+    
+    @classmethod
+    def all(cls):
+        """Every category, active or not, by name"""
+        return cls._current()[2]
+    
+    @classmethod
+    def active(cls):
+        """Active categories by name, for navigation and filters"""
+        return cls._current()[3]
+    
+    @classmethod
+    def get_by_slug(cls, slug):
+        """Active category with this slug, or None"""
+        return cls._current()[4].get(slug)
+    
+    @classmethod
+    def get_by_slug_or_404(cls, slug):
+        entry = cls.get_by_slug(slug)
+        if entry is None:
+            abort(404)
+        return entry
+    
+    @classmethod
+    def listing_version(cls, name):
+        """Changes whenever an article in category `name` is added, removed, moved or edited
+        
+        The stamps come from the change events, so every worker that heard the
+        same events agrees and ETags built from this revalidate on any of them.
+        A worker's epoch (its start, or its last resync after missed events)
+        floors every version, so a worker that may have missed events never
+        reports an older version, only a different one.
+        """
+        return max(cls._epoch, cls._listing_stamps.get(name, 0))
+    
+    @classmethod
+    def note_change(cls, change):
+        stamp = change.stamp or time.time_ns()
+        with cls._lock:
+            for name in change.categories:
+                cls._listing_stamps[name] = max(stamp, cls._listing_stamps.get(name, 0))
+    
+    @classmethod
+    def invalidate(cls):
+        with cls._lock:
+            cls._version += 1
+    
+    @classmethod
+    def resync(cls):
+        """Events may have been missed: reload and start every listing version afresh"""
+        with cls._lock:
+            cls._version += 1
+            cls._epoch = time.time_ns()
+
+def _reload_categories(change):
+    """Bus handler: new categories, article counts that moved, and listing versions"""
+    CategoryCache.note_change(change)
+    if change.kind in (CATEGORY_CREATED, COUNTS_RECONCILED) or change.listings:
+        CategoryCache.invalidate()
+
+invalidation_bus.register(_reload_categories, resync=CategoryCache.resync)
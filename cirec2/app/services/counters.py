@@ -0,0 +1,277 @@
+from collections import Counter, defaultdict
+from datetime import datetime
+from sqlalchemy import text
+from app.services.sketches import HeavyHitters, HyperLogLog
+from app.services.trending import Trending
+from app import db
+import threading
+import logging
+import atexit
+import os
+
+logger = logging.getLogger(__name__)
+
+class WriteBehindBuffer:
+    """Collects writes in memory and hands them to flush_fn in batches
+    
+    A daemon thread flushes every flush_interval seconds, or sooner once
+    max_pending items are waiting, and once more at interpreter exit.
+    Subclasses decide how items are accumulated via _add, _drain and _restore.
+    """
+    
+    def __init__(self, flush_fn, flush_interval=5.0, max_pending=500, name='buffer', config_prefix=None):
+        self.flush_fn = flush_fn
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.name = name
+        self.config_prefix = config_prefix
+        self.app = None
+        self._atexit_registered = False
+        self._reset()
+    
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending_events = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = os.getpid()
+        self._clear()
+    
+    def init_app(self, app):
+        """Flush inside this app's context and take the interval/threshold from its config"""
+        self.app = app
+        if self.config_prefix:
+            self.flush_interval = app.config.get(f'{self.config_prefix}_FLUSH_INTERVAL', self.flush_interval)
+            self.max_pending = app.config.get(f'{self.config_prefix}_FLUSH_EVENTS', self.max_pending)
+    
+    def _submit(self, *args):
+        self._ensure_started()
+        with self._lock:
+            self._pending_events += self._add(*args)
+            due = self._pending_events >= self.max_pending
+        if due:
+            self._wake.set()
+    
+    def flush(self):
+        """Write everything buffered so far; returns the number of items written"""
+        with self._flush_lock:
+            with self._lock:
+                batch = self._drain()
+                events, self._pending_events = self._pending_events, 0
+            if not batch:
+                return 0
+            
+            try:
+                if self.app is not None:
+                    with self.app.app_context():
+                        try:
+                            self.flush_fn(batch)
+                        finally:
+                            db.session.remove()
+                else:
+                    self.flush_fn(batch)
+            except Exception as e:
+                # Put the batch back so the next flush retries it
+                with self._lock:
+                    self._restore(batch)
+                    self._pending_events += events
+                logger.error(f"Flushing {events} buffered {self.name} failed: {str(e)}")
+                return 0
+            
+            return events
+    
+    def stop(self):
+        """Stop the flush thread and write whatever is left"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join()
+        self._thread = None
+        return self.flush()
+    
+    def _ensure_started(self):
+        if self._pid != os.getpid():
+            # Forked child: the parent's lock state and flush thread did not come along
+            self._reset()
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f'{self.name}-flush', daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.stop)
+                self._atexit_registered = True
+    
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+class CounterBuffer(WriteBehindBuffer):
+    """Write-behind buffer for hot counters
+    
+    Increments are summed per key and flushed as {key: {field: delta}}. Each
+    process keeps its own buffer; because only deltas are written, several
+    processes (or threads flushing concurrently) add up to the correct totals.
+    """
+    
+    def increment(self, key, field, amount=1):
+        self._submit(key, field, amount)
+    
+    def pending(self, key, field):
+        """Increments for key/field not yet written"""
+        with self._lock:
+            return self._pending[key][field] if key in self._pending else 0
+    
+    def _clear(self):
+        self._pending = defaultdict(Counter)
+    
+    def _add(self, key, field, amount):
+        self._pending[key][field] += amount
+        return amount
+    
+    def _drain(self):
+        batch, self._pending = self._pending, defaultdict(Counter)
+        return batch
+    
+    def _restore(self, batch):
+        for key, fields in batch.items():
+            self._pending[key].update(fields)
+
+class RowBuffer(WriteBehindBuffer):
+    """Write-behind buffer for append-only rows, flushed as a list of dicts"""
+    
+    def append(self, row):
+        self._submit(row)
+    
+    def _clear(self):
+        self._rows = []
+    
+    def _add(self, row):
+        self._rows.append(row)
+        return 1
+    
+    def _drain(self):
+        batch, self._rows = self._rows, []
+        return batch
+    
+    def _restore(self, batch):
+        self._rows[:0] = batch
+
+class SketchBuffer(WriteBehindBuffer):
+    """Write-behind buffer of HyperLogLog sketches, flushed as {key: sketch}
+    
+    Memory is bounded by the number of distinct keys (4 KB each), however
+    many items are added between flushes.
+    """
+    
+    def add(self, key, item):
+        self._submit(key, item)
+    
+    def _clear(self):
+        self._sketches = {}
+    
+    def _add(self, key, item):
+        sketch = self._sketches.get(key)
+        if sketch is None:
+            sketch = self._sketches[key] = HyperLogLog()
+        sketch.add(item)
+        return 1
+    
+    def _drain(self):
+        batch, self._sketches = self._sketches, {}
+        return batch
+    
+    def _restore(self, batch):
+        for key, sketch in batch.items():
+            if key in self._sketches:
+                self._sketches[key].merge(sketch)
+            else:
+                self._sketches[key] = sketch
+
+class HeavyHitterBuffer(WriteBehindBuffer):
+    """Write-behind top-k tracker: each flush window's heavy hitters are handed over as a HeavyHitters
+    
+    Memory stays fixed at `capacity` tracked items plus the Count-Min table
+    however many distinct items arrive; rare items simply never get flushed.
+    """
+    
+    def __init__(self, flush_fn, capacity=200, **kwargs):
+        self.capacity = capacity
+        super().__init__(flush_fn, **kwargs)
+    
+    def init_app(self, app):
+        super().init_app(app)
+        if self.config_prefix:
+            self.capacity = app.config.get(f'{self.config_prefix}_CAPACITY', self.capacity)
+    
+    def add(self, item):
+        self._submit(item)
+    
+    def _clear(self):
+        self._tracker = HeavyHitters(self.capacity)
+    
+    def _add(self, item):
+        self._tracker.add(item)
+        return 1
+    
+    def _drain(self):
+        batch, self._tracker = self._tracker, HeavyHitters(self.capacity)
+        return batch
+    
+    def _restore(self, batch):
+        for item, estimate, _ in batch.top():
+            self._tracker.add(item, estimate)
+
+def _flush_article_counters(batch):
+    """Apply buffered article counter deltas with one UPDATE ... FROM (VALUES ...)
+    
+    The same statement log-adds each article's decayed weight into
+    trending_score (see Trending), so the trending order is maintained
+    incrementally with no recomputation pass. The new scores are returned
+    so trending leaderboards are only rebuilt when their order changes.
+    """
+    from app.services.leaderboards import Leaderboards
+    
+    now = datetime.utcnow()
+    values = []
+    params = {}
+    for i, (article_id, fields) in enumerate(batch.items()):
+        views = fields.get('view_count', 0)
+        downloads = fields.get('download_count', 0)
+        values.append(f"(:id_{i}, :views_{i}, :downloads_{i}, CAST(:trend_{i} AS double precision))")
+        params[f'id_{i}'] = article_id
+        params[f'views_{i}'] = views
+        params[f'downloads_{i}'] = downloads
+        weight = Trending.event_weight(views, downloads)
+        params[f'trend_{i}'] = Trending.log_increment(weight, now) if weight > 0 else None
+    
+    # log(e^a + e^b) = max(a, b) + ln(1 + e^-|a - b|); skip the exp when it would underflow
+    updated = db.session.execute(text(
+        "UPDATE articles SET "
+        "view_count = COALESCE(articles.view_count, 0) + v.views, "
+        "download_count = COALESCE(articles.download_count, 0) + v.downloads, "
+        "trending_score = CASE "
+        "WHEN v.trend IS NULL THEN articles.trending_score "
+        "WHEN articles.trending_score IS NULL THEN v.trend "
+        "WHEN ABS(articles.trending_score - v.trend) > 50 THEN GREATEST(articles.trending_score, v.trend) "
+        "ELSE GREATEST(articles.trending_score, v.trend) "
+        "+ LN(1 + EXP(-ABS(articles.trending_score - v.trend))) END "
+        f"FROM (VALUES {', '.join(values)}) AS v(id, views, downloads, trend) "
+        "WHERE articles.id = v.id "
+        "RETURNING articles.id, articles.trending_score, articles.category, articles.is_published"
+    ), params).all()
+    db.session.commit()
+    
+    Leaderboards.note_scores('trending', {
+        article_id: (score, category) for article_id, score, category, is_published in updated if is_published
+    })
+
+# View/download counts for articles; flushed by init_app's app
+article_counters = CounterBuffer(_flush_article_counters, name='article counters', config_prefix='COUNTER')
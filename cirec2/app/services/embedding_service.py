@@ -5,14 +5,21 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_EMBEDDING_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+
 class EmbeddingService:
     _model = None
     
+    @classmethod
+    def model_name(cls):
+        """Identifier of the configured embedding model"""
+        return current_app.config.get('EMBEDDING_MODEL', DEFAULT_EMBEDDING_MODEL)
+    
     @classmethod
     def get_model(cls):
         """Lazy loading of the sentence transformer model"""
         if cls._model is None:
-            model_name = current_app.config.get('EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+            model_name = cls.model_name()
             try:
                 logger.info(f"Loading embedding model: {model_name}")
                 cls._model = SentenceTransformer(model_name)
@@ -66,6 +73,61 @@ class EmbeddingService:
             logger.error(f"Error generating batch embeddings: {e}")
             return [None] * len(texts) if texts else []
     
+    @classmethod
+    def embed_articles(cls, articles, fields=('title', 'content')):
+        """Generate embeddings for several articles in one batch and record their provenance"""
+        model_name = cls.model_name()
+        targets = []
+        texts = []
+        
+        for article in articles:
+            for field in fields:
+                text = getattr(article, f'{field}_embedding_text')
+                if not text or not text.strip():
+                    cls._set_article_embedding(article, field, None, None, None)
+                    continue
+                targets.append((article, field, text))
+                texts.append(text)
+        
+        embeddings = cls.generate_embeddings_batch(texts)
+        
+        updated = 0
+        for (article, field, text), embedding in zip(targets, embeddings):
+            if embedding is None:
+                continue
+            cls._set_article_embedding(
+                article, field, embedding, model_name, article.embedding_input_hash(text)
+            )
+            updated += 1
+        
+        return updated
+    
+    @classmethod
+    def embed_article(cls, article, fields=('title', 'content')):
+        """Generate embeddings for a single article and record their provenance"""
+        return cls.embed_articles([article], fields)
+    
+    @staticmethod
+    def _set_article_embedding(article, field, embedding, model_name, input_hash):
+        setattr(article, f'{field}_embedding', embedding)
+        setattr(article, f'{field}_embedding_model', model_name)
+        setattr(article, f'{field}_embedding_hash', input_hash)
+    
+    @classmethod
+    def provenance_weight(cls, article, field):
+        """Weight applied to an article's similarity score based on embedding freshness
+        
+        Vectors from another model live in an incompatible space and are ignored (0.0).
+        Vectors whose input text changed, or that predate provenance tracking, are
+        down-ranked by EMBEDDING_STALE_PENALTY.
+        """
+        state = article.embedding_state(field, cls.model_name())
+        if state == 'current':
+            return 1.0
+        if state in ('stale_input', 'unknown'):
+            return current_app.config.get('EMBEDDING_STALE_PENALTY', 0.8)
+        return 0.0
+    
     @classmethod
     def preprocess_text(cls, text, max_length=512):
         """Preprocess text before embedding generation"""
@@ -85,7 +147,10 @@ class EmbeddingService:
     def calculate_similarity(cls, embedding1, embedding2):
         """Calculate cosine similarity between two embeddings"""
         try:
-            if not embedding1 or not embedding2:
+            # pgvector returns numpy arrays, whose truth value is ambiguous
+            if embedding1 is None or embedding2 is None:
+                return 0.0
+            if len(embedding1) == 0 or len(embedding2) == 0:
                 return 0.0
             
             # Convert to numpy arrays
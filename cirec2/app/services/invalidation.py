@@ -0,0 +1,209 @@
+from collections import namedtuple
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from flask import current_app, has_app_context
+from app import db
+import threading
+import logging
+import select
+import socket
+import json
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+ARTICLE_CREATED = 'article.created'
+ARTICLE_UPDATED = 'article.updated'
+ARTICLE_DELETED = 'article.deleted'
+ARTICLE_PROCESSED = 'article.processed'
+ARTICLES_IMPORTED = 'articles.imported'
+CATEGORY_CREATED = 'category.created'
+COUNTS_RECONCILED = 'counts.reconciled'
+
+# categories: names whose pages and boards may show the change;
+# listings: whether the change adds, removes or moves an article in listings;
+# origin: host:pid of the process that made it;
+# stamp: time.time_ns() when it was published, the same in every worker
+ChangeEvent = namedtuple('ChangeEvent', 'kind article_id categories listings origin stamp', defaults=(None,))
+
+class InvalidationBus:
+    """Change events from write paths, applied to every worker's in-process caches
+    
+    publish() sends a Postgres NOTIFY inside the caller's transaction, so
+    other workers only hear about changes that committed, and queues the
+    event to be applied in this process right after the commit. Each
+    serving worker runs a listener thread (started on its first request)
+    that applies events from every other process to the registered caches.
+    Whenever the listener (re)connects it runs every cache's resync, since
+    events sent while it was not listening are lost.
+    """
+    
+    def __init__(self):
+        self._handlers = []  # (kinds or None, handler, resync)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self.app = None
+        self.received = 0
+        self.resyncs = 0
+    
+    def register(self, handler, kinds=None, resync=None):
+        """Call handler(event) for events of the given kinds (all when None), resync() on reconnects"""
+        self._handlers.append((frozenset(kinds) if kinds else None, handler, resync))
+    
+    def init_app(self, app):
+        self.app = app
+        if app.config.get('INVALIDATION_LISTEN', True):
+            app.before_request(self.ensure_listening)
+    
+    @staticmethod
+    def _channel():
+        return current_app.config.get('INVALIDATION_CHANNEL', 'cirec_invalidation')
+    
+    def publish(self, kind, article_id=None, categories=(), listings=False):
+        """Announce a change; delivered to everyone when the current transaction commits"""
+        categories = sorted({category for category in categories if category})
+        change = ChangeEvent(kind, article_id, categories, listings, self.origin, time.time_ns())
+        if db.session.get_bind().dialect.name == 'postgresql':
+            payload = json.dumps(change._asdict())
+            db.session.execute(text('SELECT pg_notify(:channel, :payload)'), {'channel': self._channel(), 'payload': payload})
+        db.session.info.setdefault('invalidation_events', []).append(change)
+        return change
+    
+    def dispatch(self, change):
+        """Apply one event to every registered cache; a failing handler does not stop the rest"""
+        for kinds, handler, _ in self._handlers:
+            if kinds is not None and change.kind not in kinds:
+                continue
+            try:
+                handler(change)
+            except Exception as e:
+                logger.error(f"Invalidation handler {handler.__qualname__} failed for {change}: {str(e)}")
+    
+    def resync(self):
+        """Drop everything the registered caches hold about articles and categories"""
+        self.resyncs += 1
+        for _, _, resync in self._handlers:
+            if resync is None:
+                continue
+            try:
+                resync()
+            except Exception as e:
+                logger.error(f"Invalidation resync {resync.__qualname__} failed: {str(e)}")
+    
+    @property
+    def origin(self):
+        return f"{socket.gethostname()}:{os.getpid()}"
+    
+    def is_local(self, change):
+        """Whether this process made the change (caches shared between workers only need it once)"""
+        return change.origin == self.origin
+    
+    def ensure_listening(self):
+        """Start this process's listener thread if it is not running (a before-request hook)"""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if db.engine.dialect.name != 'postgresql':
+                return
+            # Forked workers need a thread of their own; the parent's did not come along
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='invalidation-listener', daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+    
+    def _connect(self):
+        # A connection of its own, outside the pool, kept in autocommit so LISTEN takes effect
+        with self.app.app_context():
+            channel = self._channel()
+            connection = db.engine.raw_connection()
+            connection.detach()
+        dbapi_connection = connection.driver_connection
+        dbapi_connection.autocommit = True
+        with dbapi_connection.cursor() as cursor:
+            cursor.execute(f'LISTEN "{channel}"')
+        return dbapi_connection
+    
+    def _run(self):
+        with self.app.app_context():
+            ping_interval = current_app.config.get('INVALIDATION_PING_INTERVAL', 30)
+            max_backoff = current_app.config.get('INVALIDATION_MAX_BACKOFF', 60)
+        origin = self.origin
+        backoff = 1
+        while not self._stop.is_set():
+            connection = None
+            try:
+                connection = self._connect()
+                logger.info(f"Listening for cache invalidations as {origin}")
+                with self.app.app_context():
+                    self.resync()
+                backoff = 1
+                self._listen(connection, origin, ping_interval)
+            except Exception as e:
+                logger.warning(f"Invalidation listener lost its connection ({str(e)}); retrying in {backoff}s")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, max_backoff)
+            finally:
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+    
+    def _listen(self, connection, origin, ping_interval):
+        last_seen = time.monotonic()
+        while not self._stop.is_set():
+            readable, _, _ = select.select([connection], [], [], min(ping_interval, 5))
+            if readable:
+                connection.poll()
+                last_seen = time.monotonic()
+            elif time.monotonic() - last_seen >= ping_interval:
+                # select() cannot tell a quiet channel from a dead connection
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                last_seen = time.monotonic()
+            
+            while connection.notifies:
+                notify = connection.notifies.pop(0)
+                self._receive(notify.payload, origin)
+    
+    def _receive(self, payload, origin):
+        try:
+            change = ChangeEvent(**json.loads(payload))
+            if change.origin == origin:
+                return  # Already applied when our own transaction committed
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Ignoring malformed invalidation event {payload!r}: {str(e)}")
+            return
+        self.received += 1
+        with self.app.app_context():
+            self.dispatch(change)
+    
+    def stats(self):
+        return {
+            'origin': self.origin,
+            'listening': self._thread is not None and self._thread.is_alive() and self._pid == os.getpid(),
+            'handlers': len(self._handlers),
+            'received': self.received,
+            'resyncs': self.resyncs
+        }
+
+invalidation_bus = InvalidationBus()
+
+@event.listens_for(Session, 'after_commit')
+def _apply_committed_events(session):
+    changes = session.info.pop('invalidation_events', None)
+    if changes and has_app_context():
+        for change in changes:
+            invalidation_bus.dispatch(change)
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_rolled_back_events(session):
+    session.info.pop('invalidation_events', None)
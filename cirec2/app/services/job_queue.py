@@ -0,0 +1,273 @@
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_, text, update
+from flask import current_app
+from app.models import Job
+from app import db
+import multiprocessing
+import threading
+import logging
+import random
+import signal
+import socket
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+# Task name -> callable, filled by the @task decorator
+TASKS = {}
+
+def task(name):
+    """Register a function as a job handler; the job payload is passed as keyword arguments"""
+    def decorator(f):
+        TASKS[name] = f
+        return f
+    return decorator
+
+class JobQueue:
+    
+    @staticmethod
+    def enqueue(task_name, payload=None, priority=0, delay=0, max_attempts=None):
+        """Add a job to the queue and commit it"""
+        job = Job(
+            task=task_name,
+            payload=payload or {},
+            priority=priority,
+            max_attempts=max_attempts or current_app.config.get('JOB_MAX_ATTEMPTS', 5),
+            run_at=datetime.utcnow() + timedelta(seconds=delay)
+        )
+        db.session.add(job)
+        db.session.commit()
+        return job
+    
+    @staticmethod
+    def schedule_recurring(task_name, delay=0):
+        """Queue a self-rescheduling job unless one is already queued or running; None if it was
+        
+        Each run of such a job queues the next, so a second one would double
+        the schedule for good; scheduling on every deploy must be harmless.
+        """
+        if db.session.get_bind().dialect.name == 'postgresql':
+            # Held until enqueue() commits, so concurrent callers cannot both see none waiting
+            db.session.execute(text('SELECT pg_advisory_xact_lock(hashtext(:name))'),
+                               {'name': f'schedule:{task_name}'})
+        waiting = Job.query.filter(
+            Job.task == task_name,
+            Job.status.in_(['queued', 'running']),
+            Job.payload['reschedule'].as_boolean() == True
+        ).count()
+        if waiting:
+            db.session.commit()
+            return None
+        return JobQueue.enqueue(task_name, {'reschedule': True}, delay=delay)
+    
+    @staticmethod
+    def claim(worker_id, visibility_timeout=None):
+        """Lock and return the next runnable job, or None
+        
+        Runnable means queued and due, or running with an expired visibility
+        timeout (its worker died). SKIP LOCKED lets many workers poll the table
+        concurrently without blocking on each other's rows.
+        """
+        visibility_timeout = visibility_timeout or current_app.config.get('JOB_VISIBILITY_TIMEOUT', 600)
+        
+        while True:
+            now = datetime.utcnow()
+            job = Job.query.filter(
+                or_(
+                    and_(Job.status == 'queued', Job.run_at <= now),
+                    and_(Job.status == 'running', Job.locked_until < now)
+                )
+            ).order_by(
+                Job.priority.desc(),
+                Job.run_at
+            ).with_for_update(skip_locked=True).first()
+            
+            if job is None:
+                db.session.commit()
+                return None
+            
+            if job.attempts >= job.max_attempts:
+                # Its last attempt timed out without reporting back
+                job.status = 'dead'
+                job.last_error = job.last_error or 'Visibility timeout expired on final attempt'
+                job.finished_at = now
+                job.locked_by = None
+                job.locked_until = None
+                db.session.commit()
+                continue
+            
+            job.status = 'running'
+            job.attempts += 1
+            job.locked_by = worker_id
+            job.locked_until = now + timedelta(seconds=visibility_timeout)
+            job.started_at = now
+            db.session.commit()
+            return job
+    
+    @staticmethod
+    def complete(job):
+        job.status = 'done'
+        job.finished_at = datetime.utcnow()
+        job.locked_by = None
+        job.locked_until = None
+        job.last_error = None
+        db.session.commit()
+    
+    @staticmethod
+    def fail(job, error):
+        """Requeue with exponential backoff, or mark dead after max_attempts"""
+        job.last_error = error
+        job.locked_by = None
+        job.locked_until = None
+        
+        if job.attempts >= job.max_attempts:
+            job.status = 'dead'
+            job.finished_at = datetime.utcnow()
+            logger.error(f"Job {job.id} ({job.task}) is dead after {job.attempts} attempts: {error}")
+        else:
+            job.status = 'queued'
+            job.run_at = datetime.utcnow() + timedelta(seconds=JobQueue.backoff(job.attempts))
+            logger.warning(f"Job {job.id} ({job.task}) attempt {job.attempts} failed, retrying at {job.run_at}")
+        
+        db.session.commit()
+    
+    @staticmethod
+    def backoff(attempts):
+        """Seconds to wait before the next attempt: base * 2^(attempts-1), capped, with jitter"""
+        base = current_app.config.get('JOB_BACKOFF_BASE', 5)
+        cap = current_app.config.get('JOB_BACKOFF_MAX', 3600)
+        delay = min(cap, base * (2 ** max(attempts - 1, 0)))
+        return delay * random.uniform(0.8, 1.2)
+    
+    @staticmethod
+    def extend_lock(job_id, worker_id, visibility_timeout):
+        """Push a running job's visibility timeout forward (heartbeat)"""
+        with db.engine.begin() as conn:
+            conn.execute(
+                update(Job.__table__)
+                .where(Job.id == job_id, Job.locked_by == worker_id, Job.status == 'running')
+                .values(locked_until=datetime.utcnow() + timedelta(seconds=visibility_timeout))
+            )
+    
+    @staticmethod
+    def stats():
+        """Job counts by status"""
+        rows = db.session.query(Job.status, db.func.count(Job.id)).group_by(Job.status).all()
+        return {status: count for status, count in rows}
+
+class Worker:
+    """Polls the jobs table and runs claimed jobs one at a time"""
+    
+    def __init__(self, app, worker_id=None, poll_interval=None, visibility_timeout=None):
+        self.app = app
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.poll_interval = poll_interval or app.config.get('JOB_POLL_INTERVAL', 1.0)
+        self.visibility_timeout = visibility_timeout or app.config.get('JOB_VISIBILITY_TIMEOUT', 600)
+        self.stop_event = threading.Event()
+    
+    def _stop_on_sigterm(self):
+        """Stop claiming jobs on SIGTERM; the job in hand runs to completion first"""
+        def stop(signum, frame):
+            logger.info(f"Worker {self.worker_id} received SIGTERM; finishing its current job")
+            self.stop_event.set()
+        signal.signal(signal.SIGTERM, stop)
+    
+    def run(self, max_jobs=None):
+        """Process jobs until stopped (or until max_jobs have run)"""
+        # Importing the task modules registers their handlers; tasks then
+        # reuse this worker's app and engine instead of building their own
+        from app.services.background import set_runtime_app
+        from app.services import analytics, bulk_import, search_stats, site_stats  # noqa: F401
+        set_runtime_app(self.app)
+        if threading.current_thread() is threading.main_thread():
+            self._stop_on_sigterm()
+        
+        processed = 0
+        logger.info(f"Worker {self.worker_id} started")
+        
+        with self.app.app_context():
+            while not self.stop_event.is_set():
+                try:
+                    job = JobQueue.claim(self.worker_id, self.visibility_timeout)
+                except Exception as e:
+                    logger.error(f"Worker {self.worker_id} could not claim a job: {str(e)}")
+                    db.session.rollback()
+                    job = None
+                
+                if job is None:
+                    self.stop_event.wait(self.poll_interval)
+                    continue
+                
+                self.run_job(job)
+                processed += 1
+                if max_jobs and processed >= max_jobs:
+                    break
+        
+        logger.info(f"Worker {self.worker_id} stopped after {processed} jobs")
+        return processed
+    
+    def run_job(self, job):
+        handler = TASKS.get(job.task)
+        if handler is None:
+            JobQueue.fail(job, f"Unknown task {job.task}")
+            return
+        
+        heartbeat_stop = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat, args=(job.id, heartbeat_stop), daemon=True
+        )
+        heartbeat.start()
+        
+        started = time.perf_counter()
+        try:
+            handler(**(job.payload or {}))
+        except Exception as e:
+            db.session.rollback()
+            JobQueue.fail(job, str(e))
+        else:
+            JobQueue.complete(job)
+            logger.info(f"Job {job.id} ({job.task}) done in {time.perf_counter() - started:.2f}s")
+        finally:
+            heartbeat_stop.set()
+            heartbeat.join()
+    
+    def _heartbeat(self, job_id, stop):
+        with self.app.app_context():
+            while not stop.wait(self.visibility_timeout / 3):
+                try:
+                    JobQueue.extend_lock(job_id, self.worker_id, self.visibility_timeout)
+                except Exception as e:
+                    logger.warning(f"Heartbeat for job {job_id} failed: {str(e)}")
+
+def _run_worker_process(poll_interval):
+    """Entry point for spawned worker processes: each builds its own app and engine"""
+    from app import create_app
+    Worker(create_app(), poll_interval=poll_interval).run()
+
+def run_workers(app, concurrency=1, poll_interval=None):
+    """Run one worker in this process, or a supervised set of worker processes"""
+    if concurrency <= 1:
+        return Worker(app, poll_interval=poll_interval).run()
+    
+    context = multiprocessing.get_context('spawn')
+    processes = [
+        context.Process(target=_run_worker_process, args=(poll_interval,), name=f'worker-{i}')
+        for i in range(concurrency)
+    ]
+    for process in processes:
+        process.start()
+    
+    def stop_workers(signum, frame):
+        # Each worker finishes its current job and exits; join() below waits for them
+        logger.info("Received SIGTERM; stopping workers after their current jobs")
+        for process in processes:
+            if process.is_alive():
+                process.terminate()  # SIGTERM, which the workers handle
+    signal.signal(signal.SIGTERM, stop_workers)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
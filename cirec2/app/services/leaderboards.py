@@ -0,0 +1,150 @@
+from collections import OrderedDict
+from flask import current_app
+from app.models import Article
+from app.services.invalidation import invalidation_bus
+import threading
+import logging
+import json
+import time
+
+logger = logging.getLogger(__name__)
+
+# List name -> (extra filter, ORDER BY terms, score attribute for threshold checks)
+LEADERBOARDS = {
+    'popular': (None, Article.popularity_order, 'unique_view_count'),
+    'trending': (None, Article.trending_order, 'trending_score'),
+    'featured': (lambda query: query.filter_by(is_featured=True), lambda: (Article.created_at.desc(),), None),
+    'recent': (None, lambda: (Article.created_at.desc(),), None)
+}
+
+class Board:
+    """One materialized top-N list: ids, serialized rows and per-limit JSON bodies"""
+    
+    def __init__(self, entries, cutoff, scores):
+        self.entries = entries
+        self.ids = [entry['id'] for entry in entries]
+        self.cutoff = cutoff  # Score of the last entry; None while the list is not full
+        self.scores = scores
+        self.built_at = time.monotonic()
+        self._json = {}
+    
+    def json(self, limit):
+        body = self._json.get(limit)
+        if body is None:
+            body = self._json[limit] = json.dumps(self.entries[:limit])
+        return body
+
+class Leaderboards:
+    """Per-process top-N lists for the popular/trending/featured/recent widgets
+    
+    Boards are built on first use and then served from memory. They are
+    dropped when an article is published, edited, featured or deleted, when
+    a counter flush lifts an article over a board's cutoff, and after
+    LEADERBOARD_MAX_AGE seconds as a backstop for changes made by other
+    processes. At most LEADERBOARD_MAX_BOARDS are kept; the oldest built
+    goes first.
+    """
+    
+    _boards = OrderedDict()
+    _lock = threading.Lock()
+    
+    @classmethod
+    def get(cls, name, category=None):
+        key = (name, category or None)
+        max_age = current_app.config.get('LEADERBOARD_MAX_AGE', 300)
+        with cls._lock:
+            board = cls._boards.get(key)
+        if board is not None and time.monotonic() - board.built_at < max_age:
+            return board
+        
+        board = cls._build(name, category)
+        max_boards = current_app.config.get('LEADERBOARD_MAX_BOARDS', 256)
+        with cls._lock:
+            cls._boards.pop(key, None)
+            cls._boards[key] = board
+            while len(cls._boards) > max_boards:
+                cls._boards.popitem(last=False)
+        return board
+    
+    @classmethod
+    def entries(cls, name, limit, category=None):
+        """Serialized articles, as dicts, from the top of a board"""
+        return cls.get(name, category).entries[:cls._clamp(limit)]
+    
+    @classmethod
+    def json(cls, name, limit, category=None):
+        """Pre-serialized JSON array for the top `limit` entries of a board"""
+        return cls.get(name, category).json(cls._clamp(limit))
+    
+    @classmethod
+    def _clamp(cls, limit):
+        return max(1, min(limit, current_app.config.get('LEADERBOARD_SIZE', 50)))
+    
+    @classmethod
+    def _build(cls, name, category):
+        extra_filter, order, score_attr = LEADERBOARDS[name]
+        query = Article.query.filter_by(is_published=True)
+        if category:
+            query = query.filter_by(category=category)
+        if extra_filter:
+            query = extra_filter(query)
+        size = current_app.config.get('LEADERBOARD_SIZE', 50)
+        articles = query.order_by(*order()).limit(size).all()
+        
+        scores = {}
+        cutoff = None
+        if score_attr:
+            scores = {article.id: getattr(article, score_attr) or 0 for article in articles}
+            if len(articles) == size:
+                cutoff = scores[articles[-1].id]
+        return Board([article.to_dict() for article in articles], cutoff, scores)
+    
+    @classmethod
+    def invalidate(cls, name=None, category=None):
+        """Drop boards so the next read rebuilds them; no arguments drops every board"""
+        with cls._lock:
+            if name is None:
+                cls._boards.clear()
+                return
+            for key in [key for key in cls._boards if key[0] == name and (category is None or key[1] in (None, category))]:
+                del cls._boards[key]
+    
+    @classmethod
+    def note_scores(cls, name, scores):
+        """Drop boards an updated score would change: {article_id: (new score, category)}
+        
+        A board changes when an outside article passes its cutoff (or it is
+        not full yet), or when one of its own articles overtakes the entry above it.
+        """
+        stale = []
+        with cls._lock:
+            for key, board in cls._boards.items():
+                if key[0] != name:
+                    continue
+                for article_id, (score, category) in scores.items():
+                    if key[1] is not None and key[1] != category:
+                        continue
+                    if article_id in board.scores:
+                        position = board.ids.index(article_id)
+                        if position and score > board.scores[board.ids[position - 1]]:
+                            stale.append(key)
+                            break
+                    elif board.cutoff is None or score > board.cutoff:
+                        stale.append(key)
+                        break
+            for key in stale:
+                del cls._boards[key]
+        
+        if stale:
+            logger.debug(f"Leaderboards refreshed after score changes: {stale}")
+
+def _drop_changed_boards(change):
+    """Bus handler: boards that may list the changed articles, in this worker"""
+    if not change.categories:
+        Leaderboards.invalidate()
+        return
+    for name in LEADERBOARDS:
+        for category in change.categories:
+            Leaderboards.invalidate(name, category)
+
+invalidation_bus.register(_drop_changed_boards, resync=Leaderboards.invalidate)
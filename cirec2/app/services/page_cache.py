@@ -0,0 +1,175 @@
+from functools import wraps
+from flask import current_app, g, make_response, request, session
+from flask_login import current_user
+from app.services.cache import deserialize_response, get_cache, is_cacheable, serialize_response
+from app.services.invalidation import CATEGORY_CREATED, COUNTS_RECONCILED, invalidation_bus
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class PageCache:
+    """Rendered pages for anonymous visitors, on the 'pages' cache
+    
+    Entries are keyed on (path, query string, role) and tagged with surrogate
+    keys ('article:<id>', 'category:<name>', 'articles' for listings,
+    'categories' for the navigation on every page), so a write purges exactly
+    the pages that show what it changed. Size and LRU eviction come from the
+    configured cache backend (PAGE_CACHE_MAX_BYTES); PAGE_CACHE_TTL bounds
+    staleness from counters.
+    
+    An expired page is kept for PAGE_CACHE_STALE_TTL more seconds: the first
+    request re-renders it and everyone else is served the old copy until it
+    is done, so a busy page never has a stampede of renders.
+    """
+    
+    def __init__(self):
+        self.cache = get_cache('pages', max_bytes_setting='PAGE_CACHE_MAX_BYTES', ttl_setting='PAGE_CACHE_TTL')
+    
+    @staticmethod
+    def request_key():
+        """Cache key for the current request, or None when it must not be cached"""
+        if request.method != 'GET' or '_flashes' in session:
+            return None
+        if current_user.is_authenticated:
+            # Pages for logged-in users carry their name, entitlements and signed URLs
+            return None
+        return f"{request.path}?{request.query_string.decode('latin-1')}:anonymous"
+    
+    def store(self, key, response, tags, meta=None, rendered_at=None):
+        """Keep a complete 200 response; returns its bytes, or None if it was not cacheable
+        
+        rendered_at is time.time_ns() from before the view ran: a page whose
+        tags were purged while it rendered may show the old data, so it is
+        returned for this request but not kept.
+        """
+        if not is_cacheable(response):
+            return None
+        data = serialize_response(response, meta=meta or {})
+        stale_ttl = current_app.config.get('PAGE_CACHE_STALE_TTL', 0)
+        self.cache.set(key, data, tags=tags, label=request.endpoint, stale_ttl=stale_ttl, computed_at=rendered_at)
+        return data
+    
+    def render(self, key, view, on_hit=None):
+        """Response for a miss on key, rendering the view once for all concurrent misses
+        
+        Requests that arrive while another is rendering the page wait for it
+        (in this worker directly, in others behind the cache's cross-process
+        lock) and are answered with its copy, replaying on_hit like a hit.
+        """
+        own = []
+        
+        def render_once():
+            with self.cache.lock(key):
+                data, fresh = self.cache.lookup(key, label=False)
+                if fresh:
+                    return data
+                g.page_cache_tags = {'categories'}
+                g.page_cache_meta = {}
+                rendered_at = time.time_ns()
+                response = make_response(view())
+                own.append(response)
+                return self.store(key, response, g.page_cache_tags, g.page_cache_meta, rendered_at)
+        
+        data, _ = self.cache.flight.do(key, render_once, current_app.config.get('SINGLE_FLIGHT_TIMEOUT', 30))
+        if own:
+            return own[0]
+        if data is None:
+            # The page the leader rendered was not cacheable (an error or redirect)
+            return make_response(view())
+        
+        response, extra = deserialize_response(data)
+        if on_hit is not None:
+            on_hit(extra['meta'])
+        return response.make_conditional(request.environ)
+    
+    def purge(self, *tags):
+        """Drop every page tagged with any of the surrogate keys"""
+        self.cache.invalidate(*tags)
+        logger.debug(f"Purged cached pages for {tags}")
+    
+    def clear(self):
+        self.cache.clear()
+    
+    def stats(self):
+        return self.cache.stats()
+    
+    def serve(self):
+        """Cached response for the current request, if its endpoint is cacheable and present
+        
+        Runs as the first before-request hook, so a hit costs no queries; the
+        view's on_hit callback replays side effects such as view counting.
+        A stale page is served only while another request is re-rendering it;
+        otherwise this request falls through to the view and does that.
+        """
+        view = current_app.view_functions.get(request.endpoint)
+        if not getattr(view, 'page_cacheable', False):
+            return None
+        key = self.request_key()
+        if key is None:
+            return None
+        data, fresh = self.cache.lookup(key, label=request.endpoint)
+        if data is None or not (fresh or self.cache.flight.in_flight(key)):
+            return None
+        
+        response, extra = deserialize_response(data)
+        if view.page_cache_on_hit is not None:
+            view.page_cache_on_hit(extra['meta'])
+        return response.make_conditional(request.environ)
+
+page_cache = PageCache()
+
+def _purge_changed_pages(change):
+    """Bus handler: pages showing the changed article, and listings it entered or left
+    
+    A shared backend's tags are already bumped for every worker by the
+    process that made the change, so only its own event is applied there.
+    """
+    if page_cache.cache.shared and not invalidation_bus.is_local(change):
+        return
+    tags = [f'article:{change.article_id}'] if change.article_id else []
+    if change.listings:
+        tags += ['articles'] + [f'category:{category}' for category in change.categories]
+    if change.kind in (CATEGORY_CREATED, COUNTS_RECONCILED):
+        tags.append('categories')
+    if tags:
+        page_cache.purge(*tags)
+
+def _purge_all_pages():
+    if not page_cache.cache.shared:
+        page_cache.purge('categories')  # Carried by every page
+
+invalidation_bus.register(_purge_changed_pages, resync=_purge_all_pages)
+
+def tag_page(*tags):
+    """Add surrogate keys to the page being rendered (no-op outside a cached view)"""
+    page_tags = g.get('page_cache_tags')
+    if page_tags is not None:
+        page_tags.update(tags)
+
+def set_page_meta(**meta):
+    """Data kept with the cached page and passed to the view's on_hit callback"""
+    page_meta = g.get('page_cache_meta')
+    if page_meta is not None:
+        page_meta.update(meta)
+
+def cached_page(on_hit=None):
+    """Cache a view's rendered output for anonymous visitors
+    
+    Hits are answered by page_cache.serve() before the view runs; on_hit
+    receives the meta recorded with set_page_meta() on the original render,
+    and also runs for requests that shared another request's render.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            key = page_cache.request_key()
+            if key is None:
+                return f(*args, **kwargs)
+            
+            return page_cache.render(key, lambda: f(*args, **kwargs), on_hit)
+        
+        decorated_function.page_cacheable = True
+        decorated_function.page_cache_on_hit = on_hit
+        return decorated_function
+    return decorator
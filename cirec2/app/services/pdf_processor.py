@@ -1,76 +1,591 @@
 import PyPDF2
+import hashlib
+import json
 import os
 import re
+import shutil
+import time
+import uuid
+import signal
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
 from werkzeug.utils import secure_filename
-from flask import current_app
+from flask import current_app, has_app_context
+
+logger = logging.getLogger(__name__)
+
+# Precompiled once; the cleaning and preview pipeline runs these page by page
+UNSUPPORTED_CHARS_PATTERN = re.compile(r'[^\w\s\.\,\!\?\;\:\-\(\)]')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+SENTENCE_END_PATTERN = re.compile(r'[.!?]+')
+
+class PageTimeout(Exception):
+    """Raised when extracting a single page takes longer than the per-page timeout"""
+
+def _raise_page_timeout(signum, frame):
+    raise PageTimeout()
+
+def _page_alarm_available():
+    """Whether this thread can arm the per-page SIGALRM timer (only the main thread on POSIX)"""
+    return hasattr(signal, 'setitimer') and threading.current_thread() is threading.main_thread()
+
+def _iter_page_texts(pdf_reader, start, end, page_timeout=None, skipped_pages=None):
+    """Yield the raw text of pages [start, end) one page at a time
+    
+    Where a per-page alarm can be armed (main thread on POSIX), a page that
+    exceeds ``page_timeout`` yields '' and its 1-based number is appended to
+    ``skipped_pages``.
+    """
+    use_alarm = page_timeout and _page_alarm_available()
+    previous_handler = signal.signal(signal.SIGALRM, _raise_page_timeout) if use_alarm else None
+    
+    try:
+        for page_num in range(start, end):
+            try:
+                if use_alarm:
+                    signal.setitimer(signal.ITIMER_REAL, page_timeout)
+                page_text = pdf_reader.pages[page_num].extract_text() or ''
+            except PageTimeout:
+                logger.warning(f"Skipping page {page_num + 1}: extraction exceeded {page_timeout}s")
+                page_text = ''
+                if skipped_pages is not None:
+                    skipped_pages.append(page_num + 1)
+            finally:
+                if use_alarm:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+            yield page_text
+    finally:
+        if use_alarm:
+            signal.signal(signal.SIGALRM, previous_handler)
+
+def _extract_page_range(pdf_path, start, end, page_timeout=None):
+    """Extract and clean the text of pages [start, end) of a PDF
+    
+    Runs in pool workers as well as in-process. Returns one cleaned text per
+    page and the 1-based numbers of pages skipped by the timeout.
+    """
+    skipped_pages = []
+    with open(pdf_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        page_texts = [
+            PDFProcessor.clean_extracted_text(page_text)
+            for page_text in _iter_page_texts(pdf_reader, start, end, page_timeout, skipped_pages)
+        ]
+    return page_texts, skipped_pages
+
+_extraction_pool = None
+_extraction_pool_lock = threading.Lock()
+
+# Bytes of analyses this process wrote since it last pruned the analysis cache
+_analysis_written = 0
+_analysis_written_lock = threading.Lock()
+
+def _get_extraction_pool(workers):
+    """Process pool shared by all extractions in this process, created on first use"""
+    global _extraction_pool
+    with _extraction_pool_lock:
+        if _extraction_pool is None:
+            # spawn keeps workers free of the parent's DB connections and model threads
+            _extraction_pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context('spawn')
+            )
+        return _extraction_pool
+
+def _discard_extraction_pool(executor):
+    """Replace the shared pool and kill its workers
+    
+    A task that is already running cannot be cancelled, so a worker stuck
+    past its timeout would otherwise stay busy for good. Later extractions
+    get a fresh pool; tasks still in the old one fail with BrokenProcessPool.
+    """
+    global _extraction_pool
+    with _extraction_pool_lock:
+        if _extraction_pool is executor:
+            _extraction_pool = None
+    # No public way to stop a running worker before Python 3.14's terminate_workers()
+    processes = list((executor._processes or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
+class PreviewBuilder:
+    """Incrementally collect whole sentences into a preview of at most max_length characters
+    
+    Keeps only the unfinished trailing sentence between calls to ``feed``, so
+    memory stays bounded by the preview length plus one chunk.
+    """
+    
+    def __init__(self, max_length=500):
+        self.max_length = max_length
+        self.preview = ""
+        self.pending = ""
+        self.done = False
+    
+    def feed(self, chunk):
+        """Consume more text; returns True once the preview is complete"""
+        if self.done:
+            return True
+        
+        sentences = SENTENCE_END_PATTERN.split(self.pending + chunk)
+        # The last piece may continue in the next chunk
+        self.pending = sentences.pop()
+        
+        for sentence in sentences:
+            if self._add(sentence):
+                return True
+        
+        # The unfinished sentence can only grow, so stop once it cannot fit
+        if len(self.preview) + len(self.pending.strip()) >= self.max_length:
+            self.done = True
+        return self.done
+    
+    def finish(self):
+        """Flush the trailing sentence and return the preview"""
+        if not self.done:
+            self._add(self.pending)
+        self.pending = ""
+        self.done = True
+        return self.preview.strip()
+    
+    def _add(self, sentence):
+        sentence = sentence.strip()
+        if not sentence:
+            return False
+        if len(self.preview + sentence) < self.max_length:
+            self.preview += sentence + ". "
+            return False
+        self.done = True
+        return True
 
 class PDFProcessor:
     
     @staticmethod
-    def extract_text_from_pdf(pdf_path):
-        """Extract full text content from PDF file"""
+    def analyze_pdf(pdf_path, use_cache=True, parallel=None, workers=None, page_timeout=None,
+                    cache_dir=None):
+        """Parse a PDF once and return everything ingest needs from it
+        
+        The result holds the cleaned text of every page, their character
+        offsets in ``full_text``, the page count, document metadata and the
+        flattened outline. It is persisted under PDF_ANALYSIS_CACHE_DIR keyed by
+        the file's SHA-256 (or in ``cache_dir`` outside an app context), so
+        later steps never re-parse the same file.
+        
+        Large documents are split into page ranges and extracted in a process
+        pool. Each page gets ``page_timeout`` seconds; pages that exceed it are
+        skipped and listed in ``skipped_pages`` instead of hanging ingest.
+        """
         try:
+            settings = PDFProcessor._extraction_settings(workers, page_timeout)
+            file_hash = PDFProcessor.file_hash(pdf_path)
+            cache_path = PDFProcessor._analysis_cache_path(file_hash, cache_dir)
+            
+            if use_cache and cache_path:
+                analysis = PDFProcessor._load_analysis(cache_path)
+                if analysis is not None:
+                    return analysis
+            
             with open(pdf_path, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
-                text_content = ""
                 page_count = len(pdf_reader.pages)
                 
-                for page_num in range(page_count):
-                    page = pdf_reader.pages[page_num]
-                    text_content += page.extract_text() + "\n"
+                if parallel is None:
+                    parallel = page_count >= settings['parallel_min_pages']
                 
-                # Clean up the extracted text
-                cleaned_text = PDFProcessor.clean_extracted_text(text_content)
+                if parallel and settings['workers'] > 1 and page_count > 1:
+                    pages, skipped_pages = PDFProcessor._extract_pages_parallel(
+                        pdf_path, page_count, settings['workers'], settings['page_timeout']
+                    )
+                elif settings['page_timeout'] and not _page_alarm_available():
+                    # Ingest threads cannot arm the page timer, so the whole document goes to
+                    # one pool worker, where the timer works and a stuck page cannot hang us
+                    pages, skipped_pages = PDFProcessor._extract_pages_parallel(
+                        pdf_path, page_count, settings['workers'], settings['page_timeout'], pieces=1
+                    )
+                else:
+                    # Stream pages through cleaning so only one raw page is held at a time
+                    skipped_pages = []
+                    pages = list(PDFProcessor.iter_clean_pages(_iter_page_texts(
+                        pdf_reader, 0, page_count, settings['page_timeout'], skipped_pages
+                    )))
                 
-                return {
-                    'full_text': cleaned_text,
-                    'page_count': page_count,
-                    'success': True
-                }
+                metadata = PDFProcessor._read_metadata(pdf_reader)
+                outline = PDFProcessor._read_outline(pdf_reader)
+            
+            # Join the cleaned pages and build the preview in the same pass
+            full_text, preview_content = PDFProcessor.assemble_pages(pages)
+            
+            analysis = {
+                'file_hash': file_hash,
+                'page_count': page_count,
+                'pages': pages,
+                'page_offsets': PDFProcessor._page_offsets(pages),
+                'preview_content': preview_content,
+                'metadata': metadata,
+                'outline': outline,
+                'skipped_pages': skipped_pages
+            }
+            
+            if cache_path:
+                PDFProcessor._save_analysis(cache_path, analysis)
+            
+            analysis['full_text'] = full_text
+            analysis['success'] = True
+            return analysis
         
         except Exception as e:
             return {
                 'full_text': '',
+                'preview_content': '',
                 'page_count': 0,
+                'pages': [],
+                'page_offsets': [],
+                'metadata': {},
+                'outline': [],
+                'skipped_pages': [],
+                'success': False,
+                'error': str(e)
+            }
+    
+    @staticmethod
+    def extract_text_from_pdf(pdf_path, parallel=None, workers=None, page_timeout=None):
+        """Extract full text content from PDF file"""
+        return PDFProcessor.analyze_pdf(
+            pdf_path, parallel=parallel, workers=workers, page_timeout=page_timeout
+        )
+    
+    @staticmethod
+    def file_hash(pdf_path, chunk_size=1024 * 1024):
+        """SHA-256 of a file, read in chunks"""
+        digest = hashlib.sha256()
+        with open(pdf_path, 'rb') as file:
+            for chunk in iter(lambda: file.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    @staticmethod
+    def build_derivatives(pdf_path, output_dir, pages_per_fragment=10):
+        """Write a compressed copy and page-range fragments of a PDF for the viewer
+        
+        The copy has every page's content streams Flate-compressed and keeps
+        the outline; it is only kept when it is smaller than the original.
+        Fragments hold ``pages_per_fragment`` pages each, so a viewer can show
+        page one after fetching a fraction of the document. PyPDF2 cannot
+        linearize or write object streams, so fragments are what bound
+        time-to-first-page.
+        """
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+            original_size = os.path.getsize(pdf_path)
+            pdf_reader = PyPDF2.PdfReader(pdf_path)
+            page_count = len(pdf_reader.pages)
+            
+            writer = PyPDF2.PdfWriter()
+            writer.append(pdf_reader)
+            optimized_size = PDFProcessor._write_compressed(writer, os.path.join(output_dir, 'optimized.pdf'))
+            optimized_file = 'optimized.pdf'
+            if optimized_size >= original_size:
+                os.remove(os.path.join(output_dir, optimized_file))
+                optimized_file, optimized_size = None, original_size
+            
+            fragments = []
+            for start in range(0, page_count, pages_per_fragment):
+                end = min(start + pages_per_fragment, page_count)
+                writer = PyPDF2.PdfWriter()
+                writer.append(pdf_reader, pages=(start, end), import_outline=False)
+                filename = f'pages_{start + 1:04d}-{end:04d}.pdf'
+                fragments.append({
+                    'first_page': start + 1,
+                    'last_page': end,
+                    'file': filename,
+                    'size': PDFProcessor._write_compressed(writer, os.path.join(output_dir, filename))
+                })
+            
+            return {
+                'success': True,
+                'directory': output_dir,
+                'page_count': page_count,
+                'original_size': original_size,
+                'optimized_file': optimized_file,
+                'optimized_size': optimized_size,
+                'bytes_saved': original_size - optimized_size,
+                'pages_per_fragment': pages_per_fragment,
+                'fragments': fragments
+            }
+        
+        except Exception as e:
+            return {
                 'success': False,
                 'error': str(e)
             }
     
+    @staticmethod
+    def _write_compressed(writer, path):
+        """Compress the writer's page content streams, write it atomically and return the size"""
+        for page in writer.pages:
+            page.compress_content_streams()
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as out:
+            writer.write(out)
+        os.replace(tmp_path, path)
+        return os.path.getsize(path)
+    
+    @staticmethod
+    def _analysis_cache_path(file_hash, cache_dir=None):
+        if cache_dir is None and has_app_context():
+            cache_dir = current_app.config.get('PDF_ANALYSIS_CACHE_DIR')
+        if not cache_dir:
+            return None
+        return os.path.join(cache_dir, f'{file_hash}.json')
+    
+    @staticmethod
+    def _load_analysis(cache_path):
+        """A cached analysis, or None if there is none (or it was pruned or cut short)"""
+        try:
+            with open(cache_path) as f:
+                analysis = json.load(f)
+            os.utime(cache_path)  # Recently used entries are pruned last
+        except (OSError, ValueError):
+            return None
+        analysis['full_text'] = ' '.join(page for page in analysis['pages'] if page)
+        analysis['success'] = True
+        return analysis
+    
+    @staticmethod
+    def _save_analysis(cache_path, analysis):
+        global _analysis_written
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(analysis, f)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning(f"Could not persist PDF analysis {cache_path}: {e}")
+            return
+        
+        # Like the response cache: prune after writing a tenth of the budget
+        max_bytes = PDFProcessor._analysis_cache_limits()[0]
+        with _analysis_written_lock:
+            _analysis_written += size
+            due = _analysis_written > max_bytes // 10
+            if due:
+                _analysis_written = 0
+        if due:
+            PDFProcessor.prune_analysis_cache(os.path.dirname(cache_path))
+    
+    @staticmethod
+    def _analysis_cache_limits():
+        config = current_app.config if has_app_context() else {}
+        return (
+            config.get('PDF_ANALYSIS_CACHE_MAX_BYTES', 1024 ** 3),
+            config.get('PDF_ANALYSIS_CACHE_MAX_AGE', 30 * 86400)
+        )
+    
+    @staticmethod
+    def prune_analysis_cache(cache_dir=None):
+        """Drop analyses unused for PDF_ANALYSIS_CACHE_MAX_AGE, then the least recently used
+        until the cache is under 90% of PDF_ANALYSIS_CACHE_MAX_BYTES; returns how many went"""
+        if cache_dir is None and has_app_context():
+            cache_dir = current_app.config.get('PDF_ANALYSIS_CACHE_DIR')
+        if not cache_dir or not os.path.isdir(cache_dir):
+            return 0
+        max_bytes, max_age = PDFProcessor._analysis_cache_limits()
+        
+        files = []
+        with os.scandir(cache_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.json'):
+                    continue  # .tmp files are being written by another process
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        files.sort()
+        
+        total = sum(size for _, size, _ in files)
+        cutoff = time.time() - max_age
+        removed = 0
+        for mtime, size, path in files:
+            if mtime >= cutoff and total <= max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        if removed:
+            logger.info(f"Pruned {removed} cached PDF analyses from {cache_dir}")
+        return removed
+    
+    @staticmethod
+    def forget_analysis(pdf_path):
+        """Drop the cached analysis of a file, e.g. when its article is deleted
+        
+        Another article with byte-identical content shares the entry; it just
+        gets parsed again the next time it is needed.
+        """
+        cache_path = PDFProcessor._analysis_cache_path(PDFProcessor.file_hash(pdf_path))
+        if cache_path:
+            try:
+                os.remove(cache_path)
+            except OSError:
+                pass
+    
+    @staticmethod
+    def _page_offsets(pages):
+        """Character offset of each page's text within the space-joined full text"""
+        offsets = []
+        position = 0
+        for page in pages:
+            if page and position:
+                position += 1  # Separator between non-empty pages
+            offsets.append(position)
+            position += len(page)
+        return offsets
+    
+    @staticmethod
+    def _read_metadata(pdf_reader):
+        metadata = pdf_reader.metadata
+        if not metadata:
+            return {}
+        
+        return {
+            key: str(metadata.get(name) or '')
+            for key, name in (
+                ('title', '/Title'),
+                ('author', '/Author'),
+                ('subject', '/Subject'),
+                ('creator', '/Creator'),
+                ('producer', '/Producer'),
+                ('creation_date', '/CreationDate'),
+            )
+        }
+    
+    @staticmethod
+    def _read_outline(pdf_reader):
+        """Flatten the bookmark tree into [{'title', 'page', 'level'}] (1-based pages)"""
+        outline = []
+        
+        def walk(items, level):
+            for item in items:
+                if isinstance(item, list):
+                    walk(item, level + 1)
+                    continue
+                try:
+                    page = pdf_reader.get_destination_page_number(item) + 1
+                except Exception:
+                    page = None
+                outline.append({'title': str(item.title or ''), 'page': page, 'level': level})
+        
+        try:
+            walk(pdf_reader.outline, 0)
+        except Exception as e:
+            logger.warning(f"Could not read PDF outline: {e}")
+        return outline
+    
+    @staticmethod
+    def _extraction_settings(workers=None, page_timeout=None):
+        """Resolve extraction settings from arguments, then app config, then defaults"""
+        config = current_app.config if has_app_context() else {}
+        return {
+            'workers': workers or config.get('PDF_EXTRACTION_WORKERS') or min(4, os.cpu_count() or 1),
+            'page_timeout': page_timeout or config.get('PDF_PAGE_TIMEOUT', 10),
+            'parallel_min_pages': config.get('PDF_PARALLEL_MIN_PAGES', 50)
+        }
+    
+    @staticmethod
+    def _extract_pages_parallel(pdf_path, page_count, workers, page_timeout, pieces=None):
+        """Extract contiguous page ranges in the shared process pool and reassemble them in order
+        
+        The document is split into ``pieces`` ranges, one per worker by default.
+        """
+        chunk_size = -(-page_count // (pieces or workers))
+        ranges = [(start, min(start + chunk_size, page_count))
+                  for start in range(0, page_count, chunk_size)]
+        
+        def submit(start, end):
+            executor = _get_extraction_pool(workers)
+            return executor, executor.submit(_extract_page_range, pdf_path, start, end, page_timeout)
+        
+        submitted = [submit(start, end) for start, end in ranges]
+        
+        page_texts = []
+        skipped_pages = []
+        for (start, end), (executor, future) in zip(ranges, submitted):
+            # Backstop in case a worker is stuck outside the per-page timer
+            timeout = page_timeout * (end - start) + 30
+            try:
+                try:
+                    texts, skipped = future.result(timeout=timeout)
+                except BrokenProcessPool:
+                    # The pool was restarted (by this or another extraction) while the range waited in it
+                    executor, future = submit(start, end)
+                    texts, skipped = future.result(timeout=timeout)
+            except FutureTimeout:
+                logger.error(f"Extraction of pages {start + 1}-{end} of {pdf_path} timed out; "
+                             f"restarting the extraction pool")
+                _discard_extraction_pool(executor)
+                texts, skipped = [''] * (end - start), list(range(start + 1, end + 1))
+            except Exception as e:
+                logger.error(f"Extraction of pages {start + 1}-{end} of {pdf_path} failed: {e}")
+                texts, skipped = [''] * (end - start), list(range(start + 1, end + 1))
+            page_texts.extend(texts)
+            skipped_pages.extend(skipped)
+        
+        return page_texts, skipped_pages
+    
     @staticmethod
     def clean_extracted_text(text):
         """Clean and normalize extracted text"""
-        # Remove extra whitespaces and line breaks
-        text = re.sub(r'\s+', ' ', text)
+        # Replace special characters, then collapse whitespace and line breaks
+        text = UNSUPPORTED_CHARS_PATTERN.sub(' ', text)
+        text = WHITESPACE_PATTERN.sub(' ', text)
         
-        # Remove special characters and normalize
-        text = re.sub(r'[^\w\s\.\,\!\?\;\:\-\(\)]', ' ', text)
+        return text.strip()
+    
+    @staticmethod
+    def iter_clean_pages(page_texts):
+        """Clean raw page texts one page at a time"""
+        for page_text in page_texts:
+            yield PDFProcessor.clean_extracted_text(page_text)
+    
+    @staticmethod
+    def assemble_pages(cleaned_pages, max_preview_length=500):
+        """Join cleaned pages into the full text and build the preview as pages stream past
         
-        # Remove multiple spaces
-        text = re.sub(r' +', ' ', text)
+        Produces the same text as cleaning the whole document at once. The
+        preview stops consuming input as soon as it is complete.
+        """
+        preview = PreviewBuilder(max_preview_length)
+        parts = []
+        for page_text in cleaned_pages:
+            if not page_text:
+                continue
+            if not preview.done:
+                preview.feed(' ' + page_text if parts else page_text)
+            parts.append(page_text)
         
-        return text.strip()
+        return ' '.join(parts), preview.finish()
     
     @staticmethod
-    def generate_preview_content(full_text, max_length=500):
+    def generate_preview_content(full_text, max_length=500, chunk_size=4096):
         """Generate preview content from full text"""
         if not full_text:
             return ""
         
-        # Split into sentences
-        sentences = re.split(r'[.!?]+', full_text)
-        
-        preview = ""
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if not sentence:
-                continue
-                
-            if len(preview + sentence) < max_length:
-                preview += sentence + ". "
-            else:
+        # Feed the text in chunks so only its beginning is ever split into sentences
+        preview = PreviewBuilder(max_length)
+        for start in range(0, len(full_text), chunk_size):
+            if preview.feed(full_text[start:start + chunk_size]):
                 break
         
-        return preview.strip()
+        return preview.finish()
     
     @staticmethod
     def save_uploaded_pdf(file, upload_folder):
@@ -107,6 +622,24 @@ class PDFProcessor:
                 'error': str(e)
             }
     
+    @staticmethod
+    def store_pdf_stream(stream, filename, upload_folder):
+        """Copy a PDF from an open binary stream into storage under a unique name"""
+        os.makedirs(upload_folder, exist_ok=True)
+        
+        name, ext = os.path.splitext(secure_filename(os.path.basename(filename)) or 'document.pdf')
+        unique_filename = f"{name}_{int(time.time())}_{uuid.uuid4().hex[:8]}{ext or '.pdf'}"
+        file_path = os.path.join(upload_folder, unique_filename)
+        
+        with open(file_path, 'wb') as out:
+            shutil.copyfileobj(stream, out, length=1024 * 1024)
+        
+        return {
+            'filename': unique_filename,
+            'filepath': file_path,
+            'filesize': os.path.getsize(file_path)
+        }
+    
     @staticmethod
     def validate_pdf_file(file):
         """Validate uploaded PDF file"""
@@ -135,22 +668,5 @@ class PDFProcessor:
     @staticmethod
     def extract_metadata_from_pdf(pdf_path):
         """Extract metadata from PDF file"""
-        try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                metadata = pdf_reader.metadata
-                
-                extracted_metadata = {}
-                
-                if metadata:
-                    extracted_metadata['title'] = metadata.get('/Title', '')
-                    extracted_metadata['author'] = metadata.get('/Author', '')
-                    extracted_metadata['subject'] = metadata.get('/Subject', '')
-                    extracted_metadata['creator'] = metadata.get('/Creator', '')
-                    extracted_metadata['producer'] = metadata.get('/Producer', '')
-                    extracted_metadata['creation_date'] = metadata.get('/CreationDate', '')
-                
-                return extracted_metadata
-        
-        except Exception as e:
-            return {}
\ No newline at end of file
+        analysis = PDFProcessor.analyze_pdf(pdf_path)
+        return analysis['metadata'] if analysis['success'] else {}
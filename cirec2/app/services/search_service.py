@@ -9,6 +9,43 @@ logger = logging.getLogger(__name__)
 
 class SearchService:
     
+    @staticmethod
+    def rank_by_embedding(query_embedding, category_filter=None, articles=None, threshold=0.3):
+        """(article_id, similarity) pairs above threshold, best first
+        
+        Title similarity weighs 0.7 and content 0.3; stale vectors are ignored
+        or down-ranked. Pass preloaded articles to rank many queries against
+        the same candidates.
+        """
+        if articles is None:
+            base_query = Article.query.filter_by(is_published=True)
+            if category_filter:
+                base_query = base_query.filter_by(category=category_filter)
+            articles = base_query.filter(Article.title_embedding.isnot(None)).all()
+        
+        ranking = []
+        for article in articles:
+            title_similarity = 0
+            title_weight = EmbeddingService.provenance_weight(article, 'title')
+            if title_weight:
+                title_similarity = EmbeddingService.calculate_similarity(
+                    query_embedding, article.title_embedding
+                ) * title_weight
+            
+            content_similarity = 0
+            content_weight = EmbeddingService.provenance_weight(article, 'content')
+            if content_weight:
+                content_similarity = EmbeddingService.calculate_similarity(
+                    query_embedding, article.content_embedding
+                ) * content_weight
+            
+            combined_similarity = (title_similarity * 0.7) + (content_similarity * 0.3)
+            if combined_similarity > threshold:
+                ranking.append((article.id, float(combined_similarity)))
+        
+        ranking.sort(key=lambda item: item[1], reverse=True)
+        return ranking
+    
     @staticmethod
     def perform_text_search(query, category_filter=None, page=1, per_page=12):
         """Perform full-text search using PostgreSQL capabilities"""
@@ -51,7 +88,7 @@ class SearchService:
             # Order by relevance (approximate scoring)
             search_query = search_query.order_by(
                 Article.is_featured.desc(),
-                Article.view_count.desc(),
+                *Article.popularity_order(),
                 Article.created_at.desc()
             )
             
@@ -97,19 +134,21 @@ class SearchService:
             for article in articles:
                 max_similarity = 0
                 
-                # Check title embedding similarity
-                if article.title_embedding:
+                # Check title embedding similarity (stale vectors are ignored or down-ranked)
+                title_weight = EmbeddingService.provenance_weight(article, 'title')
+                if title_weight:
                     title_sim = EmbeddingService.calculate_similarity(
                         query_embedding, article.title_embedding
                     )
-                    max_similarity = max(max_similarity, title_sim * 1.2)  # Weight title higher
+                    max_similarity = max(max_similarity, title_sim * 1.2 * title_weight)  # Weight title higher
                 
                 # Check content embedding similarity
-                if article.content_embedding:
+                content_weight = EmbeddingService.provenance_weight(article, 'content')
+                if content_weight:
                     content_sim = EmbeddingService.calculate_similarity(
                         query_embedding, article.content_embedding
                     )
-                    max_similarity = max(max_similarity, content_sim)
+                    max_similarity = max(max_similarity, content_sim * content_weight)
                 
                 # Only include articles above similarity threshold
                 if max_similarity > 0.3:
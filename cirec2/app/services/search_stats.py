@@ -0,0 +1,199 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from flask import current_app
+from app.services.cache import get_cache
+from app.services.counters import HeavyHitterBuffer
+from app.services.embedding_service import EmbeddingService
+from app.services.invalidation import invalidation_bus
+from app.services.job_queue import JobQueue, task
+from app.services.search_service import SearchService
+from app.models import Article, SearchQueryStat
+from app import db
+import threading
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+QUERY_MAX_LENGTH = 200
+
+def normalize_query(query):
+    """Lowercased word tokens joined by single spaces, so trivially different spellings count together"""
+    return ' '.join(re.findall(r'\w+', (query or '').lower()))[:QUERY_MAX_LENGTH]
+
+def _flush_query_counts(tracker):
+    """Add one flush window's heavy hitters to search_query_stats"""
+    now = datetime.utcnow()
+    table = SearchQueryStat.__table__
+    statement = pg_insert(table).values([
+        {'query': query, 'count': estimate, 'first_seen': now, 'last_seen': now}
+        for query, estimate, _ in tracker.top()
+    ])
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[table.c.query],
+        set_={'count': table.c.count + statement.excluded.count, 'last_seen': statement.excluded.last_seen}
+    ))
+    db.session.commit()
+
+# Per-process Space-Saving/Count-Min tracker, persisted every flush window
+search_queries = HeavyHitterBuffer(_flush_query_counts, name='search queries', config_prefix='SEARCH_STATS')
+
+# Query text -> embedding, per process
+_embedding_cache = OrderedDict()
+_embedding_cache_lock = threading.Lock()
+
+def _drop_rankings(change=None):
+    """Bus handler: on-demand rankings may include, omit or misplace the changed articles"""
+    rankings = get_cache('search_rankings')
+    if rankings.shared and (change is None or not invalidation_bus.is_local(change)):
+        return  # A shared backend's tag was already bumped for every worker
+    rankings.invalidate('articles')
+
+invalidation_bus.register(_drop_rankings, resync=_drop_rankings)
+
+class SearchStats:
+    
+    @staticmethod
+    def record(query):
+        normalized = normalize_query(query)
+        if normalized:
+            search_queries.add(normalized)
+    
+    @staticmethod
+    def top_queries(limit=20):
+        return SearchQueryStat.query.order_by(SearchQueryStat.count.desc()).limit(limit).all()
+    
+    @staticmethod
+    def query_embedding(query):
+        """Embedding for a search query: process cache, then warmed row, then the model"""
+        normalized = normalize_query(query)
+        if not normalized:
+            return None
+        
+        model_name = EmbeddingService.model_name()
+        key = (model_name, normalized)
+        with _embedding_cache_lock:
+            if key in _embedding_cache:
+                _embedding_cache.move_to_end(key)
+                return _embedding_cache[key]
+        
+        stat = db.session.get(SearchQueryStat, normalized)
+        if stat is not None and stat.embedding is not None and stat.embedding_model == model_name:
+            embedding = [float(value) for value in stat.embedding]
+        else:
+            embedding = EmbeddingService.generate_embedding(normalized)
+        
+        if embedding:
+            with _embedding_cache_lock:
+                _embedding_cache[key] = embedding
+                while len(_embedding_cache) > current_app.config.get('SEARCH_EMBEDDING_CACHE_SIZE', 1024):
+                    _embedding_cache.popitem(last=False)
+        return embedding
+    
+    @staticmethod
+    def cached_ranking(query):
+        """Precomputed semantic ranking for a warmed top query, if still fresh"""
+        normalized = normalize_query(query)
+        if not normalized:
+            return None
+        
+        stat = db.session.get(SearchQueryStat, normalized)
+        if stat is None or stat.result_ranking is None or stat.results_computed_at is None:
+            return None
+        if stat.embedding_model != EmbeddingService.model_name():
+            return None
+        ttl = current_app.config.get('SEARCH_RESULT_CACHE_TTL', 900)
+        if stat.results_computed_at < datetime.utcnow() - timedelta(seconds=ttl):
+            return None
+        return [(article_id, similarity) for article_id, similarity in stat.result_ranking]
+    
+    @staticmethod
+    def ranking(query, category_filter=None):
+        """Semantic ranking for a query, or None if it cannot be embedded
+        
+        Warmed top queries come from their precomputed row; anything else is
+        scored against every published article, so the result is cached for
+        SEARCH_RANKING_TTL and concurrent searches for the same query share
+        one scoring pass instead of each running their own.
+        """
+        ranking = None if category_filter else SearchStats.cached_ranking(query)
+        if ranking is not None:
+            return ranking
+        
+        normalized = normalize_query(query)
+        if not normalized:
+            return None
+        
+        def compute():
+            query_embedding = SearchStats.query_embedding(normalized)
+            if not query_embedding:
+                return None
+            return SearchService.rank_by_embedding(query_embedding, category_filter)
+        
+        key = f"{EmbeddingService.model_name()}:{category_filter or ''}:{normalized}"
+        return get_cache('search_rankings').get_or_compute_object(
+            key, compute, ttl=current_app.config.get('SEARCH_RANKING_TTL', 300), tags=('articles',), label='semantic_search'
+        )
+    
+    @staticmethod
+    def warm(limit=None):
+        """Embed the top queries and precompute their semantic rankings"""
+        limit = limit or current_app.config.get('SEARCH_WARM_TOP', 50)
+        model_name = EmbeddingService.model_name()
+        top = SearchStats.top_queries(limit)
+        
+        missing = [stat for stat in top if stat.embedding is None or stat.embedding_model != model_name]
+        if missing:
+            vectors = EmbeddingService.generate_embeddings_batch([stat.query_text for stat in missing])
+            for stat, vector in zip(missing, vectors):
+                if vector is not None:
+                    stat.embedding = vector
+                    stat.embedding_model = model_name
+        
+        # Load the candidate articles once and rank every query against them
+        articles = Article.query.filter(
+            Article.is_published == True,
+            Article.title_embedding.isnot(None)
+        ).all()
+        result_limit = current_app.config.get('SEARCH_RESULT_CACHE_SIZE', 240)
+        now = datetime.utcnow()
+        ranked = 0
+        for stat in top:
+            if stat.embedding is None or stat.embedding_model != model_name:
+                continue
+            ranking = SearchService.rank_by_embedding(
+                [float(value) for value in stat.embedding], articles=articles
+            )
+            stat.result_ranking = [[article_id, round(similarity, 5)] for article_id, similarity in ranking[:result_limit]]
+            stat.results_computed_at = now
+            ranked += 1
+        
+        db.session.commit()
+        logger.info(f"Warmed search cache for {ranked}/{len(top)} top queries")
+        return {'success': True, 'queries': len(top), 'embedded': len(missing), 'ranked': ranked}
+    
+    @staticmethod
+    def prune(keep=None, max_age_days=30):
+        """Forget queries outside the top `keep` that have not been seen recently"""
+        keep = keep or current_app.config.get('SEARCH_STATS_KEEP', 5000)
+        deleted = db.session.execute(text(
+            "DELETE FROM search_query_stats WHERE last_seen < :cutoff AND query NOT IN ("
+            "SELECT query FROM search_query_stats ORDER BY count DESC LIMIT :keep)"
+        ), {'cutoff': datetime.utcnow() - timedelta(days=max_age_days), 'keep': keep}).rowcount
+        db.session.commit()
+        return deleted
+
+@task('warm_search_cache')
+def warm_search_cache_job(limit=None, reschedule=False):
+    """Job handler: warm embeddings and rankings for the top queries, then prune the long tail"""
+    from app.services.background import task_scope
+    
+    with task_scope():
+        result = SearchStats.warm(limit)
+        SearchStats.prune()
+        if reschedule:
+            JobQueue.enqueue('warm_search_cache', {'reschedule': True},
+                             delay=current_app.config.get('SEARCH_WARM_INTERVAL', 600))
+        return result
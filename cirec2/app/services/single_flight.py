@@ -0,0 +1,167 @@
+from contextlib import contextmanager
+from flask import current_app
+import hashlib
+import threading
+import logging
+import struct
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+LOCK_MODES = ('none', 'file', 'advisory')
+
+class _Call:
+    """One in-progress computation and the callers waiting on it"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Collapse concurrent computations of the same key into one
+    
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is running wait and get the same result, or the same
+    exception. Nothing is remembered afterwards: caching the result is the
+    caller's job, this only stops a cold or expired key from being computed
+    once per concurrent request.
+    """
+    
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+    
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._calls
+    
+    def do(self, key, fn, timeout=None):
+        """(result, shared): shared is True when another caller computed it
+        
+        A follower that waits longer than timeout seconds stops waiting and
+        computes the value itself, so a stuck leader cannot stall a route.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        
+        if not leader:
+            if call.done.wait(timeout):
+                if call.error is not None:
+                    raise call.error
+                return call.result, True
+            logger.warning(f"Gave up waiting for {key!r} after {timeout}s; computing it again")
+            return fn(), False
+        
+        try:
+            call.result = fn()
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+def lock_mode():
+    """SINGLE_FLIGHT_LOCK, with 'auto' resolved against the cache backend
+    
+    Waiting on another worker only helps when its result lands somewhere this
+    worker can read, so 'auto' locks across processes (with a lock file) only
+    for the shared filesystem and shm backends.
+    """
+    mode = current_app.config.get('SINGLE_FLIGHT_LOCK', 'auto')
+    if mode == 'auto':
+        return 'file' if current_app.config.get('CACHE_BACKEND') in ('filesystem', 'shm') else 'none'
+    if mode not in LOCK_MODES:
+        logger.warning(f"Unknown SINGLE_FLIGHT_LOCK {mode!r}; not locking across processes")
+        return 'none'
+    return mode
+
+@contextmanager
+def cross_process_lock(name, timeout=None):
+    """Hold a host- or cluster-wide lock on name while the block runs
+    
+    Yields True when the lock is held and False when it timed out (or
+    locking is off), in which case the block should go ahead anyway: the
+    lock only saves duplicate work, it never guards correctness.
+    """
+    mode = lock_mode()
+    timeout = current_app.config.get('SINGLE_FLIGHT_TIMEOUT', 30) if timeout is None else timeout
+    if mode == 'file':
+        with _file_lock(name, timeout) as acquired:
+            yield acquired
+    elif mode == 'advisory':
+        with _advisory_lock(name, timeout) as acquired:
+            yield acquired
+    else:
+        yield False
+
+def _lock_id(name):
+    # Advisory locks take a signed 64-bit key
+    (lock_id,) = struct.unpack('>q', hashlib.blake2b(name.encode('utf-8'), digest_size=8).digest())
+    return lock_id
+
+def _poll(try_acquire, timeout):
+    deadline = time.monotonic() + timeout
+    delay = 0.01
+    while not try_acquire():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(delay)
+        delay = min(delay * 2, 0.25)
+    return True
+
+@contextmanager
+def _file_lock(name, timeout):
+    import fcntl
+    
+    directory = os.path.join(current_app.config['CACHE_DIR'], 'locks')
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, hashlib.sha256(name.encode('utf-8')).hexdigest() + '.lock')
+    
+    with open(path, 'a') as f:
+        def try_acquire():
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                return False
+        
+        acquired = _poll(try_acquire, timeout)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+@contextmanager
+def _advisory_lock(name, timeout):
+    from sqlalchemy import text
+    from app import db
+    
+    # A connection of its own, so the lock is not tied to the request's transaction
+    lock_id = _lock_id(name)
+    try:
+        connection = db.engine.connect()
+    except Exception as e:
+        logger.warning(f"Could not take advisory lock for {name!r}: {e}")
+        yield False
+        return
+    try:
+        def try_acquire():
+            return connection.execute(text('SELECT pg_try_advisory_lock(:id)'), {'id': lock_id}).scalar()
+        
+        acquired = _poll(try_acquire, timeout)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                connection.execute(text('SELECT pg_advisory_unlock(:id)'), {'id': lock_id})
+    finally:
+        connection.close()
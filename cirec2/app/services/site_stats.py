@@ -0,0 +1,88 @@
+from sqlalchemy import text
+from flask import current_app
+from app.services.invalidation import COUNTS_RECONCILED, invalidation_bus
+from app.services.job_queue import JobQueue, task
+from app.models import SiteStat
+from app import db
+import logging
+
+logger = logging.getLogger(__name__)
+
+STAT_NAMES = ('articles', 'published_articles', 'featured_articles', 'users')
+
+# What each site_stats row should hold, counted from scratch
+_ACTUAL_COUNTS = """
+    SELECT 'articles' AS name, count(*) AS value FROM articles
+    UNION ALL SELECT 'published_articles', count(*) FROM articles WHERE is_published
+    UNION ALL SELECT 'featured_articles', count(*) FROM articles WHERE is_published AND is_featured
+    UNION ALL SELECT 'users', count(*) FROM users
+"""
+
+class SiteStats:
+    """Site-wide counts kept by database triggers (see the site_stats migration)
+    
+    The triggers adjust site_stats and categories.article_count in the same
+    transaction as every insert, delete, publish, unpublish, feature and
+    category change, whichever code path makes it (ORM, bulk import or raw
+    SQL), so reading a count is a primary-key lookup instead of a COUNT(*).
+    reconcile() recounts everything and repairs drift left by anything the
+    triggers cannot see, such as a TRUNCATE or a manual restore.
+    """
+    
+    @staticmethod
+    def counts():
+        """{name: value} for every stat; missing rows read as 0 until the next reconcile"""
+        values = dict(db.session.query(SiteStat.name, SiteStat.value))
+        return {name: int(values.get(name, 0)) for name in STAT_NAMES}
+    
+    @staticmethod
+    def reconcile():
+        """Recount site_stats and categories.article_count, fixing rows that drifted"""
+        # Holds off writes to articles and users for the recount, so none lands between the count and the fix
+        db.session.execute(text('LOCK TABLE articles, users IN SHARE MODE'))
+        
+        stats_fixed = db.session.execute(text(f"""
+            INSERT INTO site_stats (name, value)
+            SELECT actual.name, actual.value FROM ({_ACTUAL_COUNTS}) AS actual
+            ON CONFLICT (name) DO UPDATE SET value = excluded.value
+            WHERE site_stats.value IS DISTINCT FROM excluded.value
+            RETURNING name, value
+        """)).all()
+        
+        categories_fixed = db.session.execute(text("""
+            UPDATE categories SET article_count = actual.article_count
+            FROM (
+                SELECT categories.id, count(articles.id) AS article_count
+                FROM categories
+                LEFT JOIN articles ON articles.category = categories.name AND articles.is_published
+                GROUP BY categories.id
+            ) AS actual
+            WHERE categories.id = actual.id
+              AND categories.article_count IS DISTINCT FROM actual.article_count
+            RETURNING categories.name, categories.article_count
+        """)).all()
+        if categories_fixed:
+            # Category counts are served from every worker's CategoryCache
+            invalidation_bus.publish(COUNTS_RECONCILED, categories=[name for name, _ in categories_fixed])
+        db.session.commit()
+        
+        if stats_fixed or categories_fixed:
+            logger.warning(f"Reconciled drifted counts: site stats {dict(stats_fixed)}, "
+                           f"categories {dict(categories_fixed)}")
+        return {
+            'success': True,
+            'stats_fixed': dict(stats_fixed),
+            'categories_fixed': dict(categories_fixed)
+        }
+
+@task('reconcile_counts')
+def reconcile_counts_job(reschedule=False):
+    """Job handler: repair drifted counts, then run again after SITE_STATS_RECONCILE_INTERVAL"""
+    from app.services.background import task_scope
+    
+    with task_scope():
+        result = SiteStats.reconcile()
+        if reschedule:
+            JobQueue.enqueue('reconcile_counts', {'reschedule': True},
+                             delay=current_app.config.get('SITE_STATS_RECONCILE_INTERVAL', 3600))
+        return result
@@ -0,0 +1,181 @@
+import hashlib
+import math
+
+class HyperLogLog:
+    """Approximate distinct counter in 2^p one-byte registers
+    
+    With the default p=12 a sketch is 4 KB and counts any number of distinct
+    keys with ~1.6% standard error. Sketches of the same precision merge by
+    taking the register-wise maximum, so per-day or per-worker sketches can
+    be combined without re-reading the underlying keys.
+    """
+    
+    DEFAULT_PRECISION = 12
+    
+    def __init__(self, precision=DEFAULT_PRECISION, registers=None):
+        if not 4 <= precision <= 16:
+            raise ValueError(f"HyperLogLog precision must be 4-16, got {precision}")
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.size)
+        if len(self.registers) != self.size:
+            raise ValueError(f"Expected {self.size} registers, got {len(self.registers)}")
+    
+    @staticmethod
+    def hash_key(key):
+        """64-bit hash of a visitor key"""
+        if isinstance(key, str):
+            key = key.encode('utf-8')
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'big')
+    
+    def add(self, key):
+        """Add a key; returns True if a register changed"""
+        x = self.hash_key(key)
+        index = x >> (64 - self.precision)
+        remaining_bits = 64 - self.precision
+        w = x & ((1 << remaining_bits) - 1)
+        # Position of the leftmost 1-bit in the remaining bits (1-based)
+        rank = remaining_bits - w.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+    
+    def merge(self, other):
+        """Fold another sketch of the same precision into this one"""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+    
+    def count(self):
+        """Estimated number of distinct keys added"""
+        m = self.size
+        if m >= 128:
+            alpha = 0.7213 / (1 + 1.079 / m)
+        else:
+            alpha = {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction: linear counting over empty registers
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+    
+    def is_empty(self):
+        return not any(self.registers)
+    
+    def to_bytes(self):
+        return bytes(self.registers)
+    
+    @classmethod
+    def from_bytes(cls, data, precision=DEFAULT_PRECISION):
+        """Rebuild a sketch from to_bytes() output; empty data gives an empty sketch"""
+        if not data:
+            return cls(precision)
+        return cls(len(data).bit_length() - 1, registers=data)
+    
+    def __len__(self):
+        return self.count()
+    
+    def __repr__(self):
+        return f'<HyperLogLog p={self.precision} ~{self.count()}>'
+
+class CountMinSketch:
+    """Frequency estimates in depth x width counters; never underestimates
+    
+    With width w and depth d an estimate exceeds the true count by at most
+    2N/w (N = total count) with probability 1 - 2^-d.
+    """
+    
+    def __init__(self, width=2048, depth=4):
+        self.width = width
+        self.depth = depth
+        self.rows = [[0] * width for _ in range(depth)]
+        self.total = 0
+    
+    def _indexes(self, item):
+        # Kirsch-Mitzenmacher: d hash functions from two halves of one 128-bit hash
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+    
+    def add(self, item, count=1):
+        """Add count occurrences; returns the new estimate for item"""
+        self.total += count
+        estimate = None
+        for row, index in zip(self.rows, self._indexes(item)):
+            row[index] += count
+            estimate = row[index] if estimate is None else min(estimate, row[index])
+        return estimate
+    
+    def estimate(self, item):
+        return min(row[index] for row, index in zip(self.rows, self._indexes(item)))
+
+class SpaceSaving:
+    """Streaming top-k with a fixed number of counters (Metwally et al.)
+    
+    Every item whose true frequency exceeds N/capacity is guaranteed to be
+    tracked. A newcomer evicts the smallest counter and inherits its count,
+    recorded as error, so count - error is a lower bound on the true count.
+    """
+    
+    def __init__(self, capacity=200):
+        self.capacity = capacity
+        self.counters = {}  # item -> [count, error]
+    
+    def add(self, item, count=1):
+        entry = self.counters.get(item)
+        if entry is not None:
+            entry[0] += count
+        elif len(self.counters) < self.capacity:
+            self.counters[item] = [count, 0]
+        else:
+            victim = min(self.counters, key=lambda key: self.counters[key][0])
+            floor = self.counters.pop(victim)[0]
+            self.counters[item] = [floor + count, floor]
+    
+    def top(self, k=None):
+        """(item, count, error) tuples, most frequent first"""
+        ranked = sorted(
+            ((item, count, error) for item, (count, error) in self.counters.items()),
+            key=lambda entry: entry[1],
+            reverse=True
+        )
+        return ranked[:k] if k else ranked
+    
+    def __len__(self):
+        return len(self.counters)
+
+class HeavyHitters:
+    """Space-Saving for which items are heavy, Count-Min for how heavy
+    
+    Both structures overestimate, so the reported frequency is the smaller
+    of the two. Memory is fixed by capacity, width and depth.
+    """
+    
+    def __init__(self, capacity=200, width=2048, depth=4):
+        self.space_saving = SpaceSaving(capacity)
+        self.count_min = CountMinSketch(width, depth)
+    
+    def add(self, item, count=1):
+        self.count_min.add(item, count)
+        self.space_saving.add(item, count)
+    
+    def top(self, k=None):
+        """(item, estimated count, lower bound) tuples, most frequent first"""
+        ranked = []
+        for item, count, error in self.space_saving.top():
+            estimate = min(count, self.count_min.estimate(item))
+            ranked.append((item, estimate, max(count - error, 0)))
+        ranked.sort(key=lambda entry: entry[1], reverse=True)
+        return ranked[:k] if k else ranked
+    
+    @property
+    def total(self):
+        return self.count_min.total
+    
+    def __len__(self):
+        return len(self.space_saving)
@@ -0,0 +1,44 @@
+from datetime import datetime
+from flask import current_app
+import math
+
+# Fixed reference time for forward decay; scores are relative to it
+TRENDING_EPOCH = datetime(2025, 1, 1)
+
+class Trending:
+    """Exponentially decayed popularity, kept in log space (forward decay)
+    
+    An event of weight w at time t adds w * exp(rate * (t - epoch)) to an
+    article's score. Decaying every score by the same factor never changes
+    their order, so instead of decaying old events we boost new ones and
+    store log(score). The stored value only grows, is updated with one
+    log-add-exp per counter flush, and ORDER BY trending_score DESC is the
+    decayed ranking at any moment.
+    """
+    
+    @staticmethod
+    def decay_rate():
+        """Per-hour decay rate from the configured half-life"""
+        half_life = current_app.config.get('TRENDING_HALF_LIFE_HOURS', 24)
+        return math.log(2) / half_life
+    
+    @staticmethod
+    def event_weight(views=0, downloads=0):
+        return views + downloads * current_app.config.get('TRENDING_DOWNLOAD_WEIGHT', 3.0)
+    
+    @staticmethod
+    def log_increment(weight, at=None):
+        """log(weight * exp(rate * hours since epoch)): the term to log-add to a stored score"""
+        at = at or datetime.utcnow()
+        hours = (at - TRENDING_EPOCH).total_seconds() / 3600
+        return math.log(weight) + Trending.decay_rate() * hours
+    
+    @staticmethod
+    def current_value(score, at=None):
+        """Decayed weight of all events as of `at`, for display"""
+        if score is None:
+            return 0.0
+        at = at or datetime.utcnow()
+        hours = (at - TRENDING_EPOCH).total_seconds() / 3600
+        exponent = score - Trending.decay_rate() * hours
+        return math.exp(exponent) if exponent > -700 else 0.0
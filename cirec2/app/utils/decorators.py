@@ -93,37 +93,10 @@ def validate_json(required_fields=None):
         return decorated_function
     return decorator
 
-def cache_response(duration=300):
-    """Decorator to cache response (simple implementation)"""
-    def decorator(f):
-        cache = {}
-        
-        @wraps(f)
-        def decorated_function(*args, **kwargs):
-            # Simple cache key based on function name and args
-            cache_key = f"{f.__name__}_{hash(str(args) + str(sorted(request.args.items())))}"
-            now = time.time()
-            
-            # Check if cached response exists and is still valid
-            if cache_key in cache:
-                cached_response, timestamp = cache[cache_key]
-                if now - timestamp < duration:
-                    return cached_response
-            
-            # Generate new response
-            response = f(*args, **kwargs)
-            
-            # Cache the response
-            cache[cache_key] = (response, now)
-            
-            # Clean old entries (simple cleanup)
-            if len(cache) > 100:  # Limit cache size
-                oldest_key = min(cache.keys(), key=lambda k: cache[k][1])
-                del cache[oldest_key]
-            
-            return response
-        return decorated_function
-    return decorator
+def cache_response(duration=300, tags=()):
+    """Decorator to cache complete responses for anonymous visitors (see services.cache)"""
+    from app.services.cache import cache_response as cached
+    return cached(duration, tags)
 
 def log_activity(action_type):
     """Decorator to log user activity"""
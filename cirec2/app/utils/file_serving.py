@@ -0,0 +1,83 @@
+from flask import current_app, request, send_file
+from werkzeug.wrappers import Response
+from werkzeug.http import quote_header_value
+from urllib.parse import quote
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+SERVE_MODES = ('flask', 'x-sendfile', 'x-accel')
+
+def is_initial_transfer():
+    """False for revalidations and for byte ranges after the first, so a read is counted once"""
+    if request.if_none_match or request.if_modified_since:
+        return False
+    return request.range is None or request.range.ranges[0][0] == 0
+
+def send_pdf(path, download_name, as_attachment=False):
+    """Send a PDF the permission checks have already cleared
+    
+    PDF_SERVE_MODE picks who moves the bytes:
+      flask      - this worker, zero-copy under servers with a sendfile file_wrapper
+      x-sendfile - Apache mod_xsendfile / lighttpd, via an X-Sendfile header
+      x-accel    - nginx, via X-Accel-Redirect to an `internal` location that
+                   maps PDF_ACCEL_PREFIX onto PDF_STORAGE_ROOT
+    With a proxy mode the worker is free as soon as the headers are written,
+    and the proxy handles Range and conditional requests itself.
+    """
+    mode = current_app.config.get('PDF_SERVE_MODE', 'flask')
+    path = os.path.abspath(path)
+    
+    if mode == 'x-sendfile':
+        return _redirect_response('X-Sendfile', path, download_name, as_attachment)
+    if mode == 'x-accel':
+        root = os.path.abspath(current_app.config['PDF_STORAGE_ROOT'])
+        if os.path.commonpath([root, path]) == root:
+            prefix = current_app.config.get('PDF_ACCEL_PREFIX', '/protected-pdfs/')
+            location = prefix.rstrip('/') + '/' + quote(os.path.relpath(path, root).replace(os.sep, '/'))
+            return _redirect_response('X-Accel-Redirect', location, download_name, as_attachment)
+        logger.warning(f"{path} is outside PDF_STORAGE_ROOT; serving it from the worker")
+    elif mode != 'flask':
+        logger.warning(f"Unknown PDF_SERVE_MODE {mode!r}; serving from the worker")
+    
+    response = send_file(
+        path,
+        mimetype='application/pdf',
+        as_attachment=as_attachment,
+        download_name=download_name,
+        conditional=True
+    )
+    return _sendfile_range(response, path)
+
+def _redirect_response(header, target, download_name, as_attachment):
+    """Empty response that tells the front proxy which file to send"""
+    response = Response(mimetype='application/pdf')
+    response.headers[header] = target
+    disposition = 'attachment' if as_attachment else 'inline'
+    try:
+        download_name.encode('ascii')
+        response.headers['Content-Disposition'] = f'{disposition}; filename={quote_header_value(download_name)}'
+    except UnicodeEncodeError:
+        response.headers['Content-Disposition'] = f"{disposition}; filename*=UTF-8''{quote(download_name)}"
+    return response
+
+def _sendfile_range(response, path):
+    """Serve a 206 through the server's file_wrapper too, instead of werkzeug's chunked reader
+    
+    Gunicorn's file_wrapper calls os.sendfile from the file's current offset
+    for Content-Length bytes, so positioning a fresh handle at the start of
+    the range is enough for a zero-copy partial response. Other servers'
+    wrappers may send to EOF, so they keep the chunked reader.
+    """
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    if response.status_code != 206 or file_wrapper is None:
+        return response
+    if not request.environ.get('SERVER_SOFTWARE', '').startswith('gunicorn'):
+        return response
+    
+    file = open(path, 'rb')
+    file.seek(response.content_range.start)
+    response.response.close()
+    response.response = file_wrapper(file)
+    return response
@@ -0,0 +1,94 @@
+from datetime import timezone
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from werkzeug.wrappers import Response
+import hashlib
+import json
+import time
+
+def make_etag(*parts):
+    """Short stable hash of the values a response is derived from"""
+    digest = hashlib.blake2b(digest_size=12)
+    for part in parts:
+        digest.update(repr(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def viewer_key():
+    """The part of a page's ETag that depends on who is looking at it"""
+    if not current_user.is_authenticated:
+        return 'anonymous'
+    return f'user:{current_user.id}:{int(bool(current_user.is_admin))}:{int(bool(current_user.is_verified))}'
+
+def time_bucket(seconds):
+    """Index of the current `seconds`-long window, for ETags on data that changes continuously"""
+    return int(time.time() // max(seconds, 1))
+
+def _as_utc(value):
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc, microsecond=0)
+    return value
+
+def is_fresh(etag, last_modified=None):
+    """True if the client's cached copy (If-None-Match / If-Modified-Since) is still current"""
+    if request.method not in ('GET', 'HEAD') or '_flashes' in session:
+        # A pending flash message is rendered into the next page, so it must not be a 304
+        return False
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return _as_utc(last_modified) <= request.if_modified_since
+    return False
+
+def apply_cache_control(response, max_age=None, private=None):
+    """Cache-Control for the route and auth state
+    
+    Shared caches may only keep responses for anonymous visitors. Private
+    responses with no max_age are kept by the browser but revalidated on
+    every use, which is cheap once they carry an ETag.
+    """
+    if private is None:
+        private = current_user.is_authenticated
+    if max_age is None:
+        max_age = 0 if private else current_app.config.get('HTTP_CACHE_MAX_AGE', 60)
+    
+    response.cache_control.no_cache = None
+    if private:
+        response.cache_control.public = False
+        response.cache_control.private = True
+        if max_age:
+            response.cache_control.max_age = max_age
+        else:
+            response.cache_control.no_cache = True
+    else:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    response.vary.add('Cookie')
+    return response
+
+def apply_validators(response, etag, last_modified=None, max_age=None, private=None):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = _as_utc(last_modified)
+    return apply_cache_control(response, max_age, private)
+
+def conditional_response(etag, build, last_modified=None, max_age=None, private=None):
+    """304 if the client's copy matches, otherwise build() with validators set
+    
+    Everything expensive (queries, rendering) belongs in build, so a
+    revalidation only costs whatever was needed to compute the ETag.
+    """
+    if is_fresh(etag, last_modified):
+        response = Response(status=304)
+    else:
+        response = make_response(build())
+    return apply_validators(response, etag, last_modified, max_age, private)
+
+def json_response(payload, etag=None, max_age=None):
+    """Public JSON response validated by a hash of its body (or a precomputed ETag)"""
+    body = payload if isinstance(payload, str) else json.dumps(payload)
+    etag = etag or make_etag(body)
+    return conditional_response(
+        etag, lambda: Response(body, mimetype='application/json'),
+        max_age=max_age or current_app.config.get('HTTP_CACHE_API_MAX_AGE', 60), private=False
+    )
@@ -0,0 +1,71 @@
+from flask import current_app, url_for
+from app.utils.http_cache import time_bucket
+import base64
+import hashlib
+import hmac
+import os
+import time
+
+def _signing_key():
+    secret = current_app.config.get('PDF_URL_SECRET') or current_app.config['SECRET_KEY']
+    return hashlib.sha256(b'pdf-url:' + secret.encode('utf-8')).digest()
+
+def _signature(path, article_id, user_id, disposition, name, expires):
+    message = '\n'.join(str(part) for part in (path, article_id, user_id, disposition, name, expires))
+    digest = hmac.new(_signing_key(), message.encode('utf-8'), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:24]).decode('ascii')
+
+def signing_window():
+    """Current URL window; URLs issued in the same window are identical, so browsers can cache the PDF"""
+    return time_bucket(current_app.config.get('PDF_URL_TTL', 3600))
+
+def signed_pdf_url(article, user_id, as_attachment=False, file_path=None, download_name=None):
+    """Time-limited URL for an article's PDF, or None if the file is outside PDF_STORAGE_ROOT
+    
+    Downloads get the original file and inline viewing the compressed copy,
+    unless file_path names another of the article's files (a page fragment).
+    Everything the files blueprint needs (file, article, user, filename) is
+    in the URL and covered by the signature, so serving it needs no query.
+    A URL is valid for between PDF_URL_TTL and twice that.
+    """
+    if file_path is None:
+        file_path = article.pdf_path if as_attachment else article.viewer_pdf_path
+    root = os.path.abspath(current_app.config['PDF_STORAGE_ROOT'])
+    path = os.path.abspath(file_path)
+    if os.path.commonpath([root, path]) != root:
+        return None
+    
+    path = os.path.relpath(path, root).replace(os.sep, '/')
+    disposition = 'attachment' if as_attachment else 'inline'
+    name = download_name or f"{article.title}.pdf"
+    expires = (signing_window() + 2) * current_app.config.get('PDF_URL_TTL', 3600)
+    return url_for(
+        'files.signed_pdf', path=path,
+        a=article.id, u=user_id, d=disposition, n=name, e=expires,
+        s=_signature(path, article.id, user_id, disposition, name, expires)
+    )
+
+def verify_pdf_signature(path, args):
+    """The signed fields of a PDF URL as a dict, or None if the signature is bad or expired"""
+    try:
+        article_id = int(args['a'])
+        user_id = int(args['u'])
+        expires = int(args['e'])
+        disposition = args['d']
+        name = args['n']
+        signature = args['s']
+    except (KeyError, ValueError):
+        return None
+    
+    if expires < time.time():
+        return None
+    expected = _signature(path, article_id, user_id, disposition, name, expires)
+    if not hmac.compare_digest(expected, signature):
+        return None
+    return {
+        'article_id': article_id,
+        'user_id': user_id,
+        'as_attachment': disposition == 'attachment',
+        'download_name': name,
+        'expires': expires
+    }
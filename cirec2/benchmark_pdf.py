@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark PDF text extraction throughput (pages/sec)
+
+Generates a corpus of multi-hundred-page PDFs and extracts each one serially
+and with the process pool:
+
+    python benchmark_pdf.py --documents 5 --pages 400 --workers 4
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from PyPDF2 import PdfWriter, PageObject
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from app.services.pdf_processor import PDFProcessor
+
+LINES_PER_PAGE = 45
+
+def generate_pdf(path, page_count, seed=0):
+    """Write a PDF with page_count pages of plain Helvetica text"""
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/Type1'),
+        NameObject('/BaseFont'): NameObject('/Helvetica'),
+    }))
+
+    for page_num in range(page_count):
+        lines = [
+            f"({'Report %d page %d line %d: petrochemical capacity and market outlook.' % (seed, page_num + 1, line)}) Tj T*"
+            for line in range(LINES_PER_PAGE)
+        ]
+        content = DecodedStreamObject()
+        content.set_data(("BT /F1 10 Tf 14 TL 50 760 Td " + ' '.join(lines) + " ET").encode('latin-1'))
+
+        page = PageObject.create_blank_page(width=612, height=792)
+        page[NameObject('/Contents')] = writer._add_object(content)
+        page[NameObject('/Resources')] = DictionaryObject({
+            NameObject('/Font'): DictionaryObject({NameObject('/F1'): font})
+        })
+        writer.add_page(page)
+
+    with open(path, 'wb') as f:
+        writer.write(f)
+
+def run(paths, parallel, workers):
+    pages = 0
+    start = time.perf_counter()
+    for path in paths:
+        result = PDFProcessor.extract_text_from_pdf(path, parallel=parallel, workers=workers)
+        if not result['success']:
+            raise RuntimeError(f"Extraction failed for {path}: {result['error']}")
+        pages += result['page_count']
+    elapsed = time.perf_counter() - start
+    return pages, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--documents', type=int, default=5)
+    parser.add_argument('--pages', type=int, default=400)
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as corpus:
+        print(f"Generating {args.documents} PDFs x {args.pages} pages...")
+        paths = []
+        for i in range(args.documents):
+            path = os.path.join(corpus, f'report_{i}.pdf')
+            generate_pdf(path, args.pages, seed=i)
+            paths.append(path)
+
+        # Warm up the pool so process start-up is not billed to the first document
+        run(paths[:1], parallel=True, workers=args.workers)
+
+        for label, parallel in (('serial', False), (f'parallel x{args.workers}', True)):
+            pages, elapsed = run(paths, parallel, args.workers)
+            print(f"{label:>14}: {pages} pages in {elapsed:.2f}s = {pages / elapsed:.1f} pages/sec")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+"""Add article processing status
+
+Revision ID: 5d82b7c0e9f4
+Revises: a3c9e1f47b20
+Create Date: 2026-10-19 11:03:54.217560
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d82b7c0e9f4'
+down_revision = 'a3c9e1f47b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('processing_status', sa.String(length=20), nullable=True,
+                                      server_default='ready'))
+        batch_op.add_column(sa.Column('processing_error', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('processing_timings', sa.JSON(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_articles_processing_status'), ['processing_status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_articles_processing_status'))
+        batch_op.drop_column('processing_timings')
+        batch_op.drop_column('processing_error')
+        batch_op.drop_column('processing_status')
@@ -0,0 +1,32 @@
+"""Add embedding provenance
+
+Revision ID: a3c9e1f47b20
+Revises: 14b3fffd1053
+Create Date: 2026-10-19 09:12:31.482113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c9e1f47b20'
+down_revision = '14b3fffd1053'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('title_embedding_model', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('title_embedding_hash', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('content_embedding_model', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('content_embedding_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.drop_column('content_embedding_hash')
+        batch_op.drop_column('content_embedding_model')
+        batch_op.drop_column('title_embedding_hash')
+        batch_op.drop_column('title_embedding_model')
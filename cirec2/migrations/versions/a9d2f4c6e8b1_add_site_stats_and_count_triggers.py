@@ -0,0 +1,116 @@
+"""Add site_stats and triggers maintaining it and categories.article_count
+
+Revision ID: a9d2f4c6e8b1
+Revises: f7c3a5e1b9d4
+Create Date: 2026-10-19 23:12:37.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9d2f4c6e8b1'
+down_revision = 'f7c3a5e1b9d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('site_stats',
+    sa.Column('name', sa.String(length=40), nullable=False),
+    sa.Column('value', sa.BigInteger(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+    # Each row's contribution is taken away as it was and added back as it is,
+    # so publish, unpublish, feature, category moves and deletes all net out
+    op.execute("""
+        CREATE FUNCTION articles_maintain_counts() RETURNS trigger AS $$
+        DECLARE
+            old_published boolean := false;
+            new_published boolean := false;
+            old_featured boolean := false;
+            new_featured boolean := false;
+            old_category text;
+            new_category text;
+            articles_delta integer := 0;
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                old_published := coalesce(OLD.is_published, false);
+                old_featured := old_published AND coalesce(OLD.is_featured, false);
+                old_category := OLD.category;
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                new_published := coalesce(NEW.is_published, false);
+                new_featured := new_published AND coalesce(NEW.is_featured, false);
+                new_category := NEW.category;
+            END IF;
+            IF TG_OP = 'INSERT' THEN
+                articles_delta := 1;
+            ELSIF TG_OP = 'DELETE' THEN
+                articles_delta := -1;
+            END IF;
+
+            IF old_published AND NOT (new_published AND new_category IS NOT DISTINCT FROM old_category) THEN
+                UPDATE categories SET article_count = coalesce(article_count, 0) - 1 WHERE name = old_category;
+            END IF;
+            IF new_published AND NOT (old_published AND new_category IS NOT DISTINCT FROM old_category) THEN
+                UPDATE categories SET article_count = coalesce(article_count, 0) + 1 WHERE name = new_category;
+            END IF;
+
+            IF articles_delta <> 0 OR old_published <> new_published OR old_featured <> new_featured THEN
+                UPDATE site_stats SET value = value + CASE name
+                    WHEN 'articles' THEN articles_delta
+                    WHEN 'published_articles' THEN new_published::integer - old_published::integer
+                    ELSE new_featured::integer - old_featured::integer
+                END
+                WHERE name IN ('articles', 'published_articles', 'featured_articles');
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    # Counter flushes update other columns many times a minute; they must not fire this
+    op.execute("""
+        CREATE TRIGGER articles_maintain_counts
+        AFTER INSERT OR DELETE OR UPDATE OF is_published, is_featured, category ON articles
+        FOR EACH ROW EXECUTE FUNCTION articles_maintain_counts()
+    """)
+
+    op.execute("""
+        CREATE FUNCTION users_maintain_count() RETURNS trigger AS $$
+        BEGIN
+            UPDATE site_stats SET value = value + CASE WHEN TG_OP = 'INSERT' THEN 1 ELSE -1 END
+            WHERE name = 'users';
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER users_maintain_count
+        AFTER INSERT OR DELETE ON users
+        FOR EACH ROW EXECUTE FUNCTION users_maintain_count()
+    """)
+
+    # Starting values; from here on the triggers keep them
+    op.execute("""
+        INSERT INTO site_stats (name, value) VALUES
+            ('articles', (SELECT count(*) FROM articles)),
+            ('published_articles', (SELECT count(*) FROM articles WHERE is_published)),
+            ('featured_articles', (SELECT count(*) FROM articles WHERE is_published AND is_featured)),
+            ('users', (SELECT count(*) FROM users))
+    """)
+    op.execute("""
+        UPDATE categories SET article_count = (
+            SELECT count(*) FROM articles WHERE articles.category = categories.name AND articles.is_published
+        )
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER users_maintain_count ON users")
+    op.execute("DROP FUNCTION users_maintain_count()")
+    op.execute("DROP TRIGGER articles_maintain_counts ON articles")
+    op.execute("DROP FUNCTION articles_maintain_counts()")
+    op.drop_table('site_stats')
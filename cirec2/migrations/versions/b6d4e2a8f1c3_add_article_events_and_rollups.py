@@ -0,0 +1,65 @@
+"""Add day-partitioned article_events log and article_event_rollups
+
+Revision ID: b6d4e2a8f1c3
+Revises: 7e41a9d3c5b8
+Create Date: 2026-10-19 15:02:41.518334
+
+"""
+from datetime import datetime, timedelta
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6d4e2a8f1c3'
+down_revision = '7e41a9d3c5b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Declarative partitioning is not expressible through op.create_table
+    op.execute("""
+        CREATE TABLE article_events (
+            id BIGSERIAL NOT NULL,
+            occurred_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            article_id INTEGER NOT NULL,
+            event_type SMALLINT NOT NULL,
+            user_id INTEGER,
+            PRIMARY KEY (id, occurred_at)
+        ) PARTITION BY RANGE (occurred_at)
+    """)
+    op.execute("CREATE TABLE article_events_default PARTITION OF article_events DEFAULT")
+    op.execute("CREATE INDEX ix_article_events_occurred_at ON article_events (occurred_at)")
+
+    # First few daily partitions; the rollup job keeps creating them ahead of time
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    for offset in range(-1, 4):
+        day = today + timedelta(days=offset)
+        op.execute(
+            f"CREATE TABLE article_events_{day:%Y%m%d} PARTITION OF article_events "
+            f"FOR VALUES FROM ('{day:%Y-%m-%d}') TO ('{day + timedelta(days=1):%Y-%m-%d}')"
+        )
+
+    op.create_table('article_event_rollups',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('granularity', sa.String(length=5), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('article_id', sa.Integer(), nullable=False),
+    sa.Column('event_type', sa.SmallInteger(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['article_id'], ['articles.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('granularity', 'bucket_start', 'article_id', 'event_type', name='uq_article_event_rollups_bucket')
+    )
+    with op.batch_alter_table('article_event_rollups', schema=None) as batch_op:
+        batch_op.create_index('ix_article_event_rollups_article', ['article_id', 'granularity', 'bucket_start'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('article_event_rollups', schema=None) as batch_op:
+        batch_op.drop_index('ix_article_event_rollups_article')
+
+    op.drop_table('article_event_rollups')
+    # Dropping the parent drops every partition with it
+    op.execute("DROP TABLE article_events")
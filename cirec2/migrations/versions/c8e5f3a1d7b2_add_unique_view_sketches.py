@@ -0,0 +1,40 @@
+"""Add HyperLogLog unique-view sketches per article and per article-day
+
+Revision ID: c8e5f3a1d7b2
+Revises: b6d4e2a8f1c3
+Create Date: 2026-10-19 16:11:27.304518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8e5f3a1d7b2'
+down_revision = 'b6d4e2a8f1c3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('article_daily_uniques',
+    sa.Column('article_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('sketch', sa.LargeBinary(), nullable=False),
+    sa.Column('unique_visitors', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['article_id'], ['articles.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('article_id', 'day')
+    )
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('unique_view_count', sa.Integer(), server_default='0', nullable=True))
+        batch_op.add_column(sa.Column('unique_view_sketch', sa.LargeBinary(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_articles_unique_view_count'), ['unique_view_count'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_articles_unique_view_count'))
+        batch_op.drop_column('unique_view_sketch')
+        batch_op.drop_column('unique_view_count')
+
+    op.drop_table('article_daily_uniques')
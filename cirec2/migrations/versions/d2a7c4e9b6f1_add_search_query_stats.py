@@ -0,0 +1,40 @@
+"""Add search_query_stats for heavy-hitter queries and warmed results
+
+Revision ID: d2a7c4e9b6f1
+Revises: c8e5f3a1d7b2
+Create Date: 2026-10-19 17:20:54.662093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import pgvector.sqlalchemy
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a7c4e9b6f1'
+down_revision = 'c8e5f3a1d7b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('search_query_stats',
+    sa.Column('query', sa.String(length=200), nullable=False),
+    sa.Column('count', sa.BigInteger(), nullable=False),
+    sa.Column('first_seen', sa.DateTime(), nullable=True),
+    sa.Column('last_seen', sa.DateTime(), nullable=True),
+    sa.Column('embedding', pgvector.sqlalchemy.Vector(dim=384), nullable=True),
+    sa.Column('embedding_model', sa.String(length=255), nullable=True),
+    sa.Column('result_ranking', sa.JSON(), nullable=True),
+    sa.Column('results_computed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('query')
+    )
+    with op.batch_alter_table('search_query_stats', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_search_query_stats_count'), ['count'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('search_query_stats', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_search_query_stats_count'))
+
+    op.drop_table('search_query_stats')
@@ -0,0 +1,30 @@
+"""Add forward-decayed trending_score to articles
+
+Revision ID: e4b9d1f6a3c7
+Revises: d2a7c4e9b6f1
+Create Date: 2026-10-19 18:05:12.847190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b9d1f6a3c7'
+down_revision = 'd2a7c4e9b6f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('trending_score', sa.Float(), server_default='0', nullable=False))
+        batch_op.create_index('ix_articles_published_trending', ['is_published', 'trending_score'], unique=False)
+        batch_op.create_index('ix_articles_category_trending', ['category', 'is_published', 'trending_score'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.drop_index('ix_articles_category_trending')
+        batch_op.drop_index('ix_articles_published_trending')
+        batch_op.drop_column('trending_score')
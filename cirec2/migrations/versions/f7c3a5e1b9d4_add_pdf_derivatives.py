@@ -0,0 +1,26 @@
+"""Add pdf_derivatives (compressed copy and page fragments) to articles
+
+Revision ID: f7c3a5e1b9d4
+Revises: e4b9d1f6a3c7
+Create Date: 2026-10-19 20:41:37.206518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7c3a5e1b9d4'
+down_revision = 'e4b9d1f6a3c7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('pdf_derivatives', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.drop_column('pdf_derivatives')
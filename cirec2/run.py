@@ -1,8 +1,9 @@
 # cirec2/run.py
 
 import os
+import click
 from app import create_app, db
-from app.models import User, Article, Category
+from app.models import User, Article, Category, Job
 from flask_migrate import upgrade
 
 app = create_app()
@@ -13,7 +14,8 @@ def make_shell_context():
         'db': db, 
         'User': User, 
         'Article': Article, 
-        'Category': Category
+        'Category': Category,
+        'Job': Job
     }
 
 @app.cli.command()
@@ -69,5 +71,180 @@ def init_categories():
     db.session.commit()
     print('✅ Categories created!')
 
+@app.cli.command('migrate-embeddings')
+@click.option('--batch-size', type=int, default=None, help='Articles re-embedded per batch')
+@click.option('--pause', type=float, default=None, help='Seconds to sleep between batches')
+def migrate_embeddings(batch_size, pause):
+    """Re-embed articles whose vectors are missing or from another model"""
+    from app.services.background import EmbeddingMigrator
+    
+    migrator = EmbeddingMigrator(app, batch_size=batch_size, pause=pause)
+    progress = migrator.run()
+    
+    print(f"✅ Re-embedded {progress['processed']}/{progress['total']} articles "
+          f"with {progress['model']} ({progress['failed']} failed)")
+
+@app.cli.command('reprocess-embeddings')
+@click.option('--batch-size', type=int, default=64, help='Articles encoded per batch')
+@click.option('--workers', type=int, default=1, help='Encoder processes (1 = encode in this process)')
+@click.option('--restart', is_flag=True, help='Ignore any saved checkpoint and start from the first article')
+def reprocess_embeddings(batch_size, workers, restart):
+    """Regenerate embeddings for all published articles"""
+    from app.services.background import reprocess_all_embeddings
+    
+    success_count, total_count = reprocess_all_embeddings(
+        batch_size=batch_size, workers=workers, restart=restart
+    )
+    print(f'✅ Reprocessed {success_count}/{total_count} articles')
+
+@app.cli.command()
+@click.option('--concurrency', type=int, default=1, help='Number of worker processes')
+@click.option('--poll-interval', type=float, default=None, help='Seconds to wait when the queue is empty')
+def worker(concurrency, poll_interval):
+    """Run background job workers against the jobs table"""
+    from app.services.job_queue import run_workers
+    
+    print(f'👷 Starting {concurrency} worker(s)')
+    run_workers(app, concurrency=concurrency, poll_interval=poll_interval)
+
+@app.cli.command('import-pdfs')
+@click.argument('source', type=click.Path(exists=True))
+@click.option('--category', default=None, help='Category for files without one in metadata.csv')
+@click.option('--author', default=None, help='Author for files without one in metadata.csv or the PDF')
+@click.option('--tags', default='', help='Comma-separated tags for files without their own')
+@click.option('--publish', is_flag=True, help='Publish imported articles immediately')
+@click.option('--workers', type=int, default=None, help='PDF extraction processes')
+@click.option('--batch-size', type=int, default=32, help='Articles embedded and inserted per batch')
+@click.option('--user-email', default=None, help='Owner of the imported articles (default: first admin)')
+@click.option('--report', 'report_path', type=click.Path(), default=None, help='Write the JSON report to this file')
+def import_pdfs(source, category, author, tags, publish, workers, batch_size, user_email, report_path):
+    """Import a directory or zip archive of PDFs as articles"""
+    from app.services.bulk_import import BulkImporter, save_report
+    
+    if user_email:
+        owner = User.query.filter_by(email=user_email).first()
+    else:
+        owner = User.query.filter_by(is_admin=True).order_by(User.id).first()
+    if owner is None:
+        print('❌ No owner found; create an admin or pass --user-email')
+        return
+    
+    importer = BulkImporter(
+        owner.id,
+        defaults={'category': category, 'author': author, 'tags': tags},
+        publish=publish,
+        workers=workers,
+        batch_size=batch_size
+    )
+    report = importer.import_path(source)
+    
+    if report_path:
+        save_report(report, os.path.abspath(report_path))
+    for entry in report['files']:
+        if entry['status'] != 'imported':
+            print(f"⚠️ {entry['file']}: {entry['error']}")
+    print(f"✅ Imported {report['imported']}/{report['total']} PDFs in {report['elapsed_seconds']}s "
+          f"({report['documents_per_minute']} docs/min, {report['failed']} failed)")
+
+@app.cli.command('rollup-events')
+@click.option('--hours', type=int, default=None, help='Recompute rollups for this many past hours (default: the configured lookback)')
+@click.option('--schedule', is_flag=True, help='Queue a self-rescheduling rollup job for `flask worker`')
+def rollup_events_command(hours, schedule):
+    """Roll raw article events up into hourly and daily buckets"""
+    from datetime import datetime, timedelta
+    from app.services.analytics import (
+        drop_expired_event_partitions, ensure_event_partitions, rollup_events, schedule_rollup
+    )
+    
+    if schedule:
+        job = schedule_rollup(delay=0)
+        print(f'✅ Queued rollup job {job.id}' if job else 'Rollup job already scheduled')
+        return
+    
+    ensure_event_partitions()
+    result = rollup_events(since=datetime.utcnow() - timedelta(hours=hours) if hours else None)
+    dropped = drop_expired_event_partitions()
+    
+    if not result['success']:
+        print(f"❌ Rollup failed: {result['error']}")
+        return
+    print(f"✅ Rolled up {result['hourly_buckets']} hourly and {result['daily_buckets']} daily buckets "
+          f"since {result['since']} ({len(dropped)} expired partitions dropped)")
+
+@app.cli.command('warm-search-cache')
+@click.option('--limit', type=int, default=None, help='Number of top queries to warm')
+@click.option('--schedule', is_flag=True, help='Queue a self-rescheduling warm job for `flask worker`')
+def warm_search_cache(limit, schedule):
+    """Precompute embeddings and semantic rankings for the most frequent search queries"""
+    from app.services.job_queue import JobQueue
+    from app.services.search_stats import SearchStats
+    
+    if schedule:
+        job = JobQueue.schedule_recurring('warm_search_cache')
+        print(f'✅ Queued warm job {job.id}' if job else 'Warm job already scheduled')
+        return
+    
+    result = SearchStats.warm(limit)
+    pruned = SearchStats.prune()
+    print(f"✅ Warmed {result['ranked']}/{result['queries']} top queries "
+          f"({result['embedded']} newly embedded, {pruned} stale queries pruned)")
+
+@app.cli.command('reconcile-counts')
+@click.option('--schedule', is_flag=True, help='Queue a self-rescheduling reconcile job for `flask worker`')
+def reconcile_counts(schedule):
+    """Recount site stats and category article counts, repairing any drift from the triggers"""
+    from app.services.job_queue import JobQueue
+    from app.services.site_stats import SiteStats
+    
+    if schedule:
+        job = JobQueue.schedule_recurring('reconcile_counts')
+        print(f'✅ Queued reconcile job {job.id}' if job else 'Reconcile job already scheduled')
+        return
+    
+    result = SiteStats.reconcile()
+    if not result['stats_fixed'] and not result['categories_fixed']:
+        print('✅ All counts were already correct')
+        return
+    for name, value in result['stats_fixed'].items():
+        print(f'✅ site_stats {name} set to {value}')
+    for name, value in result['categories_fixed'].items():
+        print(f'✅ Category {name} set to {value} articles')
+
+@app.cli.command('optimize-pdfs')
+@click.option('--force', is_flag=True, help='Rebuild derivatives that already exist')
+@click.option('--limit', type=int, default=None, help='Process at most this many articles')
+def optimize_pdfs(force, limit):
+    """Build compressed copies and page fragments for articles that lack them"""
+    from app.services.background import build_pdf_derivatives
+    from sqlalchemy import Text, cast, or_
+    
+    query = Article.query.order_by(Article.id)
+    if not force:
+        # Rows written with a JSON null (older bulk imports) lack derivatives too
+        query = query.filter(or_(
+            Article.pdf_derivatives.is_(None), cast(Article.pdf_derivatives, Text) == 'null'
+        ))
+    if limit:
+        query = query.limit(limit)
+    
+    built = failed = saved = 0
+    for article in query.all():
+        if not os.path.exists(article.pdf_path):
+            print(f'⚠️  {article.id}: {article.pdf_path} is missing')
+            failed += 1
+            continue
+        result = build_pdf_derivatives(article)
+        if not result['success']:
+            print(f"❌ {article.id}: {result['error']}")
+            failed += 1
+            continue
+        db.session.commit()
+        built += 1
+        saved += result['bytes_saved']
+        print(f"   {article.id}: {result['original_size']} -> {result['optimized_size']} bytes "
+              f"({result['bytes_saved']} saved), {len(result['fragments'])} fragments")
+    
+    print(f'✅ Built derivatives for {built} articles ({failed} failed), {saved} bytes saved in total')
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=3000)
\ No newline at end of file
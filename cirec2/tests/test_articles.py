@@ -0,0 +1,66 @@
+from collections import Counter
+from app.services.counters import CounterBuffer
+import threading
+
+def _collecting_buffer(**kwargs):
+    """CounterBuffer whose flushes are summed into a Counter instead of the database"""
+    totals = Counter()
+    
+    def flush_fn(batch):
+        for key, fields in batch.items():
+            for field, delta in fields.items():
+                totals[(key, field)] += delta
+    
+    return CounterBuffer(flush_fn, **kwargs), totals
+
+def test_counter_buffer_totals_under_concurrent_load():
+    buffer, totals = _collecting_buffer(flush_interval=0.005, max_pending=50)
+    threads_count, increments = 8, 2000
+    start = threading.Barrier(threads_count)
+    
+    def hammer(thread_index):
+        start.wait()
+        for i in range(increments):
+            field = 'download_count' if i % 4 == 0 else 'view_count'
+            buffer.increment((thread_index + i) % 10, field)
+            if i % 500 == 0:
+                buffer.flush()  # Request threads may flush while the flush thread does too
+    
+    threads = [threading.Thread(target=hammer, args=(n,)) for n in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    buffer.stop()
+    
+    expected = Counter()
+    for thread_index in range(threads_count):
+        for i in range(increments):
+            field = 'download_count' if i % 4 == 0 else 'view_count'
+            expected[((thread_index + i) % 10, field)] += 1
+    
+    assert totals == expected
+    assert sum(totals.values()) == threads_count * increments
+    assert buffer.pending(0, 'view_count') == 0
+
+def test_counter_buffer_keeps_increments_when_flush_fails():
+    written = Counter()
+    failures = [True]
+    
+    def flaky_flush(batch):
+        if failures.pop() if failures else False:
+            raise RuntimeError('database unavailable')
+        for key, fields in batch.items():
+            written[key] += fields['view_count']
+    
+    buffer = CounterBuffer(flaky_flush, flush_interval=60, max_pending=10**6)
+    for _ in range(5):
+        buffer.increment(1, 'view_count')
+    
+    assert buffer.flush() == 0
+    assert buffer.pending(1, 'view_count') == 5
+    
+    buffer.increment(1, 'view_count')
+    buffer.stop()
+    assert written[1] == 6
+    assert buffer.pending(1, 'view_count') == 0
@@ -0,0 +1,51 @@
+from app import create_app, db
+from app.config import Config
+from app.models import Article, Category, SearchQueryStat, SiteStat, User
+from app.services.search_stats import SearchStats
+import pytest
+
+@pytest.fixture
+def app():
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = 'sqlite://'
+        INVALIDATION_LISTEN = False
+    
+    app = create_app(TestConfig)
+    with app.app_context():
+        # Only what the dashboard reads; the rest of the schema is Postgres-only
+        for model in (User, Article, Category, SiteStat, SearchQueryStat):
+            model.__table__.create(db.engine)
+        admin = User(email='admin@example.com', first_name='Ada', last_name='Min', is_admin=True)
+        admin.password_hash = 'x'
+        db.session.add(admin)
+        db.session.add_all([
+            SearchQueryStat(query_text='ethylene capacity', count=5),
+            SearchQueryStat(query_text='pvc prices', count=9)
+        ])
+        db.session.commit()
+        app.config['ADMIN_ID'] = admin.id
+    return app
+
+def _admin_client(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(app.config['ADMIN_ID'])
+        session['_fresh'] = True
+    return client
+
+def test_top_queries_most_frequent_first(app):
+    with app.app_context():
+        assert [stat.query_text for stat in SearchStats.top_queries(10)] == ['pvc prices', 'ethylene capacity']
+        assert [stat.query_text for stat in SearchStats.top_queries(1)] == ['pvc prices']
+
+def test_dashboard_lists_top_queries(app):
+    response = _admin_client(app).get('/admin/dashboard')
+    assert response.status_code == 200
+    assert b'pvc prices' in response.data
+    assert b'ethylene capacity' in response.data
+
+def test_top_queries_api(app):
+    response = _admin_client(app).get('/admin/search/top-queries?limit=5')
+    assert response.status_code == 200
+    assert [row['query'] for row in response.get_json()] == ['pvc prices', 'ethylene capacity']
@@ -0,0 +1,92 @@
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlencode, urlsplit
+from app import create_app
+from app.config import Config
+from app.utils import signed_urls
+from app.utils.signed_urls import signed_pdf_url
+import pytest
+import time
+import os
+
+PDF_BYTES = b'%PDF-1.4\n' + b'0123456789' * 100 + b'\n%%EOF\n'
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = 'sqlite://'
+        PDF_STORAGE_ROOT = str(tmp_path / 'pdfs')
+        PDF_SERVE_MODE = 'flask'
+        INVALIDATION_LISTEN = False
+    
+    os.makedirs(TestConfig.PDF_STORAGE_ROOT)
+    with open(os.path.join(TestConfig.PDF_STORAGE_ROOT, 'report.pdf'), 'wb') as f:
+        f.write(PDF_BYTES)
+    with open(tmp_path / 'outside.pdf', 'wb') as f:
+        f.write(PDF_BYTES)
+    return create_app(TestConfig)
+
+def _url(app, **kwargs):
+    article = SimpleNamespace(id=7, title='Report')
+    file_path = os.path.join(app.config['PDF_STORAGE_ROOT'], 'report.pdf')
+    with app.test_request_context():
+        return signed_pdf_url(article, 3, file_path=file_path, **kwargs)
+
+def _with_args(url, **overrides):
+    parts = urlsplit(url)
+    args = {key: values[0] for key, values in parse_qs(parts.query).items()}
+    args.update(overrides)
+    return f'{parts.path}?{urlencode(args)}'
+
+def test_signed_url_serves_the_pdf(app):
+    response = app.test_client().get(_url(app))
+    assert response.status_code == 200
+    assert response.data == PDF_BYTES
+    assert response.headers['Content-Disposition'].startswith('inline')
+
+def test_tampered_user_is_forbidden(app):
+    response = app.test_client().get(_with_args(_url(app), u='4'))
+    assert response.status_code == 403
+
+def test_expired_url_is_forbidden(app):
+    expires = int(time.time()) - 1
+    signature = signed_urls._signature
+    with app.test_request_context():
+        url = _with_args(_url(app), e=str(expires), s=signature('report.pdf', 7, 3, 'inline', 'Report.pdf', expires))
+    response = app.test_client().get(url)
+    assert response.status_code == 403
+
+def test_path_traversal_is_refused(app):
+    url = _url(app)
+    client = app.test_client()
+    # Another path under an existing signature fails the signature check
+    response = client.get(_with_args(url.replace('/report.pdf', '/../outside.pdf')))
+    assert response.status_code in (403, 404)
+    
+    # A path that escapes the storage root is refused even with a valid signature for it
+    expires = int(time.time()) + 60
+    with app.test_request_context():
+        signature = signed_urls._signature('../outside.pdf', 7, 3, 'inline', 'Report.pdf', expires)
+    path = urlsplit(url).path.replace('report.pdf', '..%2Foutside.pdf')
+    response = client.get(_with_args(path + '?' + urlsplit(url).query, e=str(expires), s=signature))
+    assert response.status_code == 404
+    
+    # And such a URL is never issued
+    article = SimpleNamespace(id=7, title='Report')
+    outside = os.path.join(app.config['PDF_STORAGE_ROOT'], '..', 'outside.pdf')
+    with app.test_request_context():
+        assert signed_pdf_url(article, 3, file_path=outside) is None
+
+def test_range_request_gets_partial_content(app):
+    response = app.test_client().get(_url(app), headers={'Range': 'bytes=0-9'})
+    assert response.status_code == 206
+    assert response.data == PDF_BYTES[:10]
+    assert response.headers['Content-Range'] == f'bytes 0-9/{len(PDF_BYTES)}'
+
+def test_x_accel_mode_hands_the_file_to_nginx(app):
+    app.config['PDF_SERVE_MODE'] = 'x-accel'
+    response = app.test_client().get(_url(app))
+    assert response.status_code == 200
+    assert response.headers['X-Accel-Redirect'] == '/protected-pdfs/report.pdf'
+    assert response.headers['Content-Disposition'] == 'inline; filename=Report.pdf'
+    assert response.data == b''
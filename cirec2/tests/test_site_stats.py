@@ -0,0 +1,184 @@
+from sqlalchemy import create_engine, delete, insert, inspect, select, text, update
+from sqlalchemy.exc import SQLAlchemyError
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from app.config import Config
+from app.models import Article, Category, SiteStat, User
+from app.services.site_stats import SiteStats
+from app import create_app, db
+import importlib.util
+import pytest
+import uuid
+import os
+
+MIGRATION = os.path.join(
+    os.path.dirname(__file__), '..', 'migrations', 'versions', 'a9d2f4c6e8b1_add_site_stats_and_count_triggers.py'
+)
+
+def _run_migration(engine, direction='upgrade'):
+    spec = importlib.util.spec_from_file_location('site_stats_migration', MIGRATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    with engine.begin() as conn:
+        with Operations.context(MigrationContext.configure(conn)):
+            getattr(module, direction)()
+
+@pytest.fixture
+def database():
+    """(url, schema, engine) for a throwaway schema holding the tables as they were before the site_stats migration
+    
+    Needs Postgres with pgvector at DATABASE_URL; skipped when it cannot be reached.
+    """
+    url = os.environ.get('DATABASE_URL') or Config.SQLALCHEMY_DATABASE_URI
+    if not url.startswith('postgresql'):
+        pytest.skip('the count triggers need Postgres')
+    schema = f'test_counts_{uuid.uuid4().hex[:12]}'
+    admin = create_engine(url)
+    try:
+        with admin.begin() as conn:
+            conn.execute(text('CREATE EXTENSION IF NOT EXISTS vector'))
+            conn.execute(text(f'CREATE SCHEMA {schema}'))
+    except SQLAlchemyError as e:
+        admin.dispose()
+        pytest.skip(f'Postgres with pgvector is not available at DATABASE_URL: {e}')
+    
+    engine = create_engine(url, connect_args={'options': f'-csearch_path={schema},public'})
+    try:
+        with engine.begin() as conn:
+            db.metadata.create_all(conn, tables=[
+                table for table in db.metadata.sorted_tables if table.name != SiteStat.__tablename__
+            ])
+        yield url, schema, engine
+    finally:
+        engine.dispose()
+        with admin.begin() as conn:
+            conn.execute(text(f'DROP SCHEMA {schema} CASCADE'))
+        admin.dispose()
+
+@pytest.fixture
+def engine(database):
+    _, _, engine = database
+    _run_migration(engine)
+    return engine
+
+def _add_user(conn, email='editor@example.com'):
+    return conn.execute(insert(User.__table__).values(
+        email=email, password_hash='x', first_name='Ed', last_name='Itor'
+    ).returning(User.__table__.c.id)).scalar()
+
+def _add_article(conn, user_id, category, is_published, is_featured=False):
+    articles = Article.__table__
+    return conn.execute(insert(articles).values(
+        title='Capacity outlook', description='d', author='a', category=category,
+        pdf_filename='a.pdf', pdf_path='/tmp/a.pdf', preview_content='p',
+        is_published=is_published, is_featured=is_featured, created_by=user_id
+    ).returning(articles.c.id)).scalar()
+
+def _add_categories(conn, article_count=0):
+    conn.execute(insert(Category.__table__), [
+        {'name': 'Olefins', 'slug': 'olefins', 'article_count': article_count},
+        {'name': 'Polymers', 'slug': 'polymers', 'article_count': article_count}
+    ])
+
+def _counts(conn):
+    stats = dict(conn.execute(select(SiteStat.name, SiteStat.value)).all())
+    categories = dict(conn.execute(select(Category.name, Category.article_count)).all())
+    return stats, categories
+
+def test_triggers_keep_counts_through_publish_move_and_delete(engine):
+    articles = Article.__table__
+    with engine.begin() as conn:
+        _add_categories(conn)
+        user_id = _add_user(conn)
+        article_id = _add_article(conn, user_id, 'Olefins', is_published=False, is_featured=True)
+    
+    def change(**values):
+        with engine.begin() as conn:
+            conn.execute(update(articles).where(articles.c.id == article_id).values(**values))
+            return _counts(conn)
+    
+    with engine.connect() as conn:
+        assert _counts(conn) == (
+            {'articles': 1, 'published_articles': 0, 'featured_articles': 0, 'users': 1},
+            {'Olefins': 0, 'Polymers': 0}
+        )
+    
+    assert change(is_published=True) == (
+        {'articles': 1, 'published_articles': 1, 'featured_articles': 1, 'users': 1},
+        {'Olefins': 1, 'Polymers': 0}
+    )
+    # Counter flushes touch other columns and must leave the counts alone
+    assert change(view_count=5)[1] == {'Olefins': 1, 'Polymers': 0}
+    assert change(category='Polymers') == (
+        {'articles': 1, 'published_articles': 1, 'featured_articles': 1, 'users': 1},
+        {'Olefins': 0, 'Polymers': 1}
+    )
+    assert change(is_published=False) == (
+        {'articles': 1, 'published_articles': 0, 'featured_articles': 0, 'users': 1},
+        {'Olefins': 0, 'Polymers': 0}
+    )
+    assert change(is_published=True, category='Olefins', is_featured=False) == (
+        {'articles': 1, 'published_articles': 1, 'featured_articles': 0, 'users': 1},
+        {'Olefins': 1, 'Polymers': 0}
+    )
+    
+    with engine.begin() as conn:
+        conn.execute(delete(articles).where(articles.c.id == article_id))
+        conn.execute(delete(User.__table__).where(User.__table__.c.id == user_id))
+        assert _counts(conn) == (
+            {'articles': 0, 'published_articles': 0, 'featured_articles': 0, 'users': 0},
+            {'Olefins': 0, 'Polymers': 0}
+        )
+
+def test_migration_seeds_counts_from_existing_rows(database):
+    _, _, engine = database
+    with engine.begin() as conn:
+        _add_categories(conn, article_count=7)  # Whatever was there before is replaced
+        user_id = _add_user(conn)
+        _add_user(conn, 'reader@example.com')
+        _add_article(conn, user_id, 'Olefins', is_published=True, is_featured=True)
+        _add_article(conn, user_id, 'Olefins', is_published=True)
+        _add_article(conn, user_id, 'Polymers', is_published=False, is_featured=True)
+    
+    _run_migration(engine)
+    with engine.connect() as conn:
+        assert _counts(conn) == (
+            {'articles': 3, 'published_articles': 2, 'featured_articles': 1, 'users': 2},
+            {'Olefins': 2, 'Polymers': 0}
+        )
+    
+    _run_migration(engine, 'downgrade')
+    with engine.begin() as conn:
+        assert not inspect(conn).has_table(SiteStat.__tablename__)
+        # Without the triggers, writes no longer touch the counts
+        _add_article(conn, user_id, 'Polymers', is_published=True)
+        categories = dict(conn.execute(select(Category.name, Category.article_count)).all())
+        assert categories == {'Olefins': 2, 'Polymers': 0}
+
+def test_reconcile_repairs_drift(database):
+    url, schema, engine = database
+    _run_migration(engine)
+    with engine.begin() as conn:
+        _add_categories(conn)
+        user_id = _add_user(conn)
+        _add_article(conn, user_id, 'Olefins', is_published=True)
+        # Drift the triggers cannot see, as a restore or a manual fix would leave
+        conn.execute(update(SiteStat.__table__).where(SiteStat.__table__.c.name == 'articles').values(value=40))
+        conn.execute(update(Category.__table__).where(Category.__table__.c.name == 'Polymers').values(article_count=3))
+    
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = url
+        SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'options': f'-csearch_path={schema},public'}}
+        INVALIDATION_LISTEN = False
+    
+    app = create_app(TestConfig)
+    with app.app_context():
+        try:
+            result = SiteStats.reconcile()
+            assert result['stats_fixed'] == {'articles': 1}
+            assert result['categories_fixed'] == {'Polymers': 0}
+            assert SiteStats.counts() == {'articles': 1, 'published_articles': 1, 'featured_articles': 0, 'users': 1}
+            assert SiteStats.reconcile()['stats_fixed'] == {}
+        finally:
+            db.session.remove()
+            db.engine.dispose()